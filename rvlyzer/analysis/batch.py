@@ -0,0 +1,236 @@
+"""
+This module provides the computation of register heatmaps for many compilation units at once.
+
+Every unit is analyzed from start to finish by a worker process: its `.text` sections are split into procedures, whose
+code is split into basic blocks, turned into local CFGs and analyzed by :func:`analysis.heatmaps.register_heatmap`.
+Sources are shipped to the workers in a compact encoding, made of a string table and tuples of integers, instead of
+pickling their statement objects one by one. Heatmaps travel back in their matrix form, so transferring them boils
+down to copying two arrays.
+
+A unit that cannot be analyzed does not interrupt the batch: its error is reported along with the results of the
+other units.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from json import load
+from os import cpu_count
+from typing import NamedTuple, Tuple, Optional, Union, Sequence, Callable, Iterator, List, Dict, Set
+
+import numpy as np
+
+from rep.base import Statement, Instruction, Directive, Register
+from rep.fragments import Source, load_src_from_maps
+from analysis.graphs import InvalidCodeError, basic_blocks, local_cfg
+from analysis.heatmaps import HeatMap, register_heatmap
+from analysis.procedures import procedure_views
+
+
+class EncodedSource(NamedTuple):
+    """
+    A compact, picklable encoding of a source.
+
+    Strings are stored once in a table and referred to by their index. Instructions are encoded as tuples made of their
+    opcode, family, labels, registers and immediate constant, while directives are encoded as tuples made of their name,
+    labels and arguments. Missing registers and symbols are encoded as -1.
+
+    :var strings: the table of the strings used by the statements
+    :var statements: the encoded statements
+    """
+
+    strings: Tuple[str, ...]
+    statements: Tuple[tuple, ...]
+
+
+def encode_source(src: Source) -> EncodedSource:
+    """
+    Encode a source into its compact representation.
+
+    :param src: the source to be encoded
+    :return: the encoded source
+    """
+
+    table: Dict[str, int] = {}
+
+    def string(s: str) -> int:
+        return table.setdefault(s, len(table))
+
+    def register(r: Optional[Register]) -> int:
+        return -1 if r is None else r.value
+
+    statements = []
+    for statement in src:
+        labels = tuple(string(lab) for lab in statement.labels)
+        if isinstance(statement, Instruction):
+            imm = statement.immediate
+            if imm is None:
+                symbol, value = -1, None
+            elif imm.symbol is not None:
+                symbol, value = string(imm.symbol), None
+            else:
+                symbol, value = -1, imm.int_val
+            statements.append((string(statement.opcode), string(statement.family), labels, register(statement.r1),
+                               register(statement.r2), register(statement.r3), symbol, value))
+        else:
+            statements.append((string(statement.name), labels, tuple(string(arg) for arg in statement.args)))
+
+    return EncodedSource(tuple(table), tuple(statements))
+
+
+def decode_source(encoded: EncodedSource) -> Source:
+    """
+    Rebuild a source out of its compact representation.
+
+    :param encoded: the encoded source
+    :return: a new source, equivalent to the encoded one
+    """
+
+    strings = encoded.strings
+
+    def register(r: int) -> Optional[Register]:
+        return None if r < 0 else Register(r)
+
+    statements: List[Statement] = []
+    for record in encoded.statements:
+        if len(record) == 3:
+            name, labels, args = record
+            statements.append(Directive(strings[name], [strings[lab] for lab in labels], [strings[a] for a in args]))
+        else:
+            opcode, family, labels, r1, r2, r3, symbol, value = record
+            statements.append(Instruction(strings[opcode], strings[family], [strings[lab] for lab in labels],
+                                          register(r1), register(r2), register(r3),
+                                          strings[symbol] if symbol >= 0 else value))
+
+    return Source(statements)
+
+
+Unit = Union[Source, EncodedSource, str]
+"""A compilation unit: either a source, an encoded source or the path of a JSON file holding the list of statement
+descriptions accepted by :func:`rep.fragments.load_src_from_maps`."""
+
+
+def load_unit(unit: Unit) -> Source:
+    """
+    Load a compilation unit.
+
+    :param unit: the compilation unit
+    :return: the unit's source
+    :raise OSError: when the unit's JSON file cannot be read
+    """
+
+    if isinstance(unit, str):
+        with open(unit) as file:
+            return load_src_from_maps(load(file))
+    elif isinstance(unit, EncodedSource):
+        return decode_source(unit)
+    else:
+        return unit
+
+
+def unit_heatmap(unit: Unit, max_heat: int, widening_delay: int = 2) -> HeatMap:
+    """
+    Compute the register heatmap of a compilation unit.
+
+    Every procedure found in the unit's `.text` sections is analyzed from its own entry-point, and the heatmaps of all
+    the procedures are joined together, so that lines are numbered from the beginning of the source.
+
+    :param unit: the compilation unit
+    :param max_heat: the maximum heat level a register can reach
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :return: the heatmap of the unit
+    :raise InvalidCodeError: when the unit has no procedure, or one of them is malformed
+    """
+
+    src = load_unit(unit)
+    maps = [register_heatmap(local_cfg(basic_blocks(view)), max_heat, widening_delay=widening_delay)
+            for _, view in procedure_views(src)]
+    if len(maps) == 0:
+        raise InvalidCodeError("No procedure to be analyzed")
+    if len(maps) == 1:
+        return maps[0]
+
+    lines = np.concatenate([m.lines for m in maps])
+    order = np.argsort(lines, kind='stable')
+    return HeatMap(lines[order], np.concatenate([m.heat for m in maps])[order])
+
+
+class UnitResult(NamedTuple):
+    """
+    The outcome of the analysis of a compilation unit.
+
+    :var index: the position of the unit in the batch
+    :var heatmap: the heatmap of the unit, or None if the analysis has failed
+    :var error: the error that made the analysis fail, if any
+    """
+
+    index: int
+    heatmap: Optional[HeatMap]
+    error: Optional[Exception]
+
+
+def iter_batch_heatmaps(units: Sequence[Unit],
+                        max_heat: int,
+                        widening_delay: int = 2,
+                        workers: Optional[int] = None,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Iterator[UnitResult]:
+    """
+    Compute the register heatmaps of many compilation units in parallel, yielding them as soon as they are ready.
+
+    Only a few units per worker are submitted at any time, so that encoded sources and heatmaps do not pile up in
+    memory while waiting for their turn. Any error raised while analyzing a unit, be it due to invalid code, to a file
+    that cannot be read or to a bug, makes only the affected unit fail.
+
+    :param units: the compilation units to be analyzed
+    :param max_heat: the maximum heat level a register can reach
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :param workers: the number of worker processes, defaulting to the number of processors
+    :param progress: a function called with the number of completed units and the total, every time a unit completes
+    :return: an iterator over the results of the units, in order of completion
+    """
+
+    workers = (cpu_count() or 1) if workers is None else workers
+    with ProcessPoolExecutor(workers) as executor:
+        limit = 4 * workers
+        pending: Dict[Future, int] = {}
+        submitted, completed = 0, 0
+
+        while completed < len(units):
+            while submitted < len(units) and len(pending) < limit:
+                unit = units[submitted]
+                if isinstance(unit, Source):
+                    unit = encode_source(unit)
+                pending[executor.submit(unit_heatmap, unit, max_heat, widening_delay)] = submitted
+                submitted += 1
+
+            done: Set[Future] = wait(pending, return_when=FIRST_COMPLETED).done
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                completed += 1
+                if progress is not None:
+                    progress(completed, len(units))
+                yield UnitResult(index, None if error is not None else future.result(), error)
+
+
+def batch_heatmaps(units: Sequence[Unit],
+                   max_heat: int,
+                   widening_delay: int = 2,
+                   workers: Optional[int] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> List[UnitResult]:
+    """
+    Compute the register heatmaps of many compilation units in parallel.
+
+    See :func:`iter_batch_heatmaps` for the details.
+
+    :param units: the compilation units to be analyzed
+    :param max_heat: the maximum heat level a register can reach
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :param workers: the number of worker processes, defaulting to the number of processors
+    :param progress: a function called with the number of completed units and the total, every time a unit completes
+    :return: the results of the units, in the same order as the units
+    """
+
+    results: List[Optional[UnitResult]] = [None] * len(units)
+    for result in iter_batch_heatmaps(units, max_heat, widening_delay, workers, progress):
+        results[result.index] = result
+
+    return results
@@ -0,0 +1,368 @@
+"""
+This module provides a content-addressed, on-disk cache for analysis results, backed by a SQLite database.
+
+Results are keyed by a structural digest of the code they were computed from, combined with the analysis parameters.
+The digest only depends on the statements of the code, not on its position inside the source, so that a procedure that
+has not changed between two builds keeps hitting the cache even if the code preceding it has grown or shrunk. Local
+graphs and heatmaps are stored relative to the first line of their code, and are rebased on the code at hand when they
+are retrieved.
+
+The cache is bounded in size: when a new entry pushes it over its limit, the least recently used entries are evicted.
+Entries written by a different format or analysis version are discarded when the cache is opened. Being a plain
+`MutableMapping`, the cache can also be handed to :class:`analysis.pipeline.Pipeline` to memoize stage outputs, and it
+can be shared among threads and processes.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from functools import partial
+from hashlib import blake2b
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from threading import Lock
+from time import time_ns
+from typing import NamedTuple, Any, Iterator, MutableMapping, List, Tuple, Dict, Hashable, Optional
+
+import numpy as np
+from networkx import DiGraph
+from networkx.utils import generate_unique_node
+
+from rep.fragments import CodeFragment, FragmentView
+from analysis.graphs import LocalGraph, ProcedureCall, basic_blocks, local_cfg
+from analysis.heatmaps import HeatMap, register_heatmap
+from analysis.pipeline import Stage
+from analysis.procedures import Procedure
+
+CACHE_FORMAT = 1
+"""The version of the format of the cache's entries, bumped whenever the way results are stored changes."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,
+                                    used INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);
+INSERT OR IGNORE INTO meta VALUES ('size', 0);
+INSERT OR IGNORE INTO meta VALUES ('version', NULL);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'size';
+END;
+"""
+
+
+def structural_digest(code: CodeFragment, *parameters: Any) -> str:
+    """
+    Compute a digest of some code's statements and of a set of analysis parameters.
+
+    The digest does not depend on the position of the code inside its source.
+
+    :param code: a code fragment
+    :param parameters: the parameters of the analysis, which must have a stable representation
+    :return: the hexadecimal digest
+    """
+
+    digest = blake2b(digest_size=16)
+    for statement in code:
+        digest.update(repr(statement).encode() + b'\n')
+    digest.update(b';' + repr(parameters).encode())
+    return digest.hexdigest()
+
+
+class CacheStats(NamedTuple):
+    """
+    The statistics of a cache, as observed by a single cache object.
+
+    :var hits: the number of lookups that found their entry
+    :var misses: the number of lookups that did not find their entry
+    :var writes: the number of entries written
+    :var evictions: the number of entries evicted to make room for new ones
+    """
+
+    hits: int
+    misses: int
+    writes: int
+    evictions: int
+
+
+class AnalysisCache(MutableMapping[str, Any]):
+    """
+    A size-bounded, on-disk mapping from keys to pickled analysis results, with least recently used eviction.
+
+    Cache objects can be used by multiple threads at once, and can be pickled to be sent to worker processes, which
+    reopen the database on their own. Statistics are kept separately by each object.
+
+    :ivar path: the path of the SQLite database
+    :ivar max_size: the maximum total size of the stored entries, in bytes
+    :ivar version: the version of the cached results, combined with the cache format version
+    """
+
+    path: str
+    max_size: int
+    version: str
+
+    def __init__(self, path: str, max_size: int = 1 << 30, version: str = ''):
+        """
+        Open a cache, creating it if needed.
+
+        If the cache holds entries of a different version, they are all discarded.
+
+        :param path: the path of the SQLite database
+        :param max_size: the maximum total size of the stored entries, in bytes
+        :param version: the version of the cached results, to be changed whenever the analyses producing them change
+        """
+
+        self.path = path
+        self.max_size = max_size
+        self.version = version
+        self._connect()
+
+    def _connect(self) -> None:
+        self._lock = Lock()
+        self._hits = self._misses = self._writes = self._evictions = 0
+        self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+
+        version = str(CACHE_FORMAT) + ':' + self.version
+        with self._lock:
+            self._db.executescript(_SCHEMA)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                stored, = self._db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+                if stored != version:
+                    self._db.execute("DELETE FROM entries")
+                    self._db.execute("UPDATE meta SET value = ? WHERE name = 'version'", (version,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'path': self.path, 'max_size': self.max_size, 'version': self.version}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._connect()
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        The statistics gathered by this cache object since it has been opened.
+        """
+
+        return CacheStats(self._hits, self._misses, self._writes, self._evictions)
+
+    @property
+    def size(self) -> int:
+        """
+        The total size of the stored entries, in bytes.
+        """
+
+        with self._lock:
+            return self._db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                raise KeyError(key)
+
+            self._hits += 1
+            self._db.execute("UPDATE entries SET used = ? WHERE key = ?", (time_ns(), key))
+
+        return loads(row[0])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        blob = dumps(value, HIGHEST_PROTOCOL)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.execute("INSERT INTO entries VALUES (?, ?, ?, ?)", (key, blob, len(blob), time_ns()))
+                self._writes += 1
+
+                excess = self._db.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0] - self.max_size
+                if excess > 0:
+                    # Evict the least recently used entries, the new one included if it is too big on its own
+                    evicted = []
+                    for old, size in self._db.execute("SELECT key, size FROM entries ORDER BY used"):
+                        evicted.append((old,))
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    self._db.executemany("DELETE FROM entries WHERE key = ?", evicted)
+                    self._evictions += len(evicted)
+
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            if self._db.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount == 0:
+                raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = [key for key, in self._db.execute("SELECT key FROM entries")]
+
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        """
+        Close the connection to the database.
+        """
+
+        self._db.close()
+
+    def __enter__(self) -> AnalysisCache:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class _StoredGraph(NamedTuple):
+    # A local graph detached from its code: nodes are numbered, and blocks are stored as line ranges relative to the
+    # beginning of the code
+    nodes: List[Tuple[Optional[Tuple[int, int]], List[str]]]
+    edges: List[Tuple[int, int, Dict[str, Any]]]
+    entries: List[int]
+    calls: List[Tuple[int, Hashable, int]]
+    terminals: List[int]
+
+
+def _store_graph(cfg: LocalGraph, code: CodeFragment) -> _StoredGraph:
+    index = {n: i for i, n in enumerate(cfg.graph)}
+    nodes = []
+    for n in cfg.graph:
+        block = cfg.graph.nodes[n].get('block')
+        lines = None if block is None else (block.begin - code.begin, block.end - code.begin)
+        nodes.append((lines, list(cfg.graph.nodes[n].get('labels', []))))
+
+    return _StoredGraph(nodes,
+                        [(index[u], index[v], dict(attributes)) for u, v, attributes in cfg.graph.edges(data=True)],
+                        [index[n] for n in cfg.entry_point_ids],
+                        [(index[c.caller], c.callee, index[c.confluence_point]) for c in cfg.external_calls],
+                        [index[n] for n in cfg.terminal_nodes_ids])
+
+
+def _load_graph(stored: _StoredGraph, code: CodeFragment) -> LocalGraph:
+    identifiers = [generate_unique_node() for _ in stored.nodes]
+    graph = DiGraph()
+    for identifier, (lines, labels) in zip(identifiers, stored.nodes):
+        if lines is None:
+            graph.add_node(identifier, labels=labels)
+        else:
+            head, tail = lines[0] + code.begin, lines[1] + code.begin
+            graph.add_node(identifier, labels=labels, block=FragmentView(code, head, tail, head))
+    graph.add_edges_from((identifiers[u], identifiers[v], attributes) for u, v, attributes in stored.edges)
+
+    return LocalGraph([identifiers[n] for n in stored.entries],
+                      graph,
+                      [ProcedureCall(identifiers[c], callee, identifiers[p]) for c, callee, p in stored.calls],
+                      [identifiers[n] for n in stored.terminals])
+
+
+def cached_cfg(cache: MutableMapping[str, Any], code: CodeFragment) -> LocalGraph:
+    """
+    Build the local graph of some code, or retrieve it from a cache.
+
+    :param cache: the cache
+    :param code: the code of a procedure, as accepted by :func:`analysis.graphs.basic_blocks`
+    :return: the local graph, whose blocks are views on the given code
+    :raise InvalidCodeError: when the code cannot be split into basic blocks
+    """
+
+    key = structural_digest(code, 'cfg')
+    stored = cache.get(key)
+    if stored is not None:
+        return _load_graph(stored, code)
+
+    cfg = local_cfg(basic_blocks(code))
+    cache[key] = _store_graph(cfg, code)
+    return cfg
+
+
+def cached_heatmap(cache: MutableMapping[str, Any],
+                   code: CodeFragment,
+                   max_heat: int,
+                   widening_delay: int = 2,
+                   cfg: Optional[LocalGraph] = None) -> HeatMap:
+    """
+    Draw the register heatmap of some code, or retrieve it from a cache.
+
+    :param cache: the cache
+    :param code: the code of a procedure, as accepted by :func:`analysis.graphs.basic_blocks`
+    :param max_heat: the maximum heat level a register can reach
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :param cfg: the local graph of the code, if already available, otherwise it is built or retrieved from the cache
+    :return: the heatmap, mapping the lines of the given code
+    :raise InvalidCodeError: when the code cannot be split into basic blocks
+    """
+
+    key = structural_digest(code, 'heat', max_heat, widening_delay)
+    stored = cache.get(key)
+    if stored is not None:
+        lines, heat = stored
+        return HeatMap(lines + code.begin, heat)
+
+    heatmap = register_heatmap(cached_cfg(cache, code) if cfg is None else cfg, max_heat,
+                               widening_delay=widening_delay)
+    cache[key] = (heatmap.lines - code.begin, np.asarray(heatmap.heat))
+    return heatmap
+
+
+def _cfg_item(cache: MutableMapping[str, Any], item: Tuple[Procedure, CodeFragment]) -> Tuple[Procedure, LocalGraph]:
+    procedure, code = item
+    return procedure, cached_cfg(cache, code)
+
+
+def _heat_item(cache: MutableMapping[str, Any], max_heat: int, widening_delay: int,
+               item: Tuple[Procedure, CodeFragment]) -> Tuple[Procedure, HeatMap]:
+    procedure, code = item
+    return procedure, cached_heatmap(cache, code, max_heat, widening_delay)
+
+
+def cfg_stage(cache: MutableMapping[str, Any]) -> Stage[Tuple[Procedure, CodeFragment], Tuple[Procedure, LocalGraph]]:
+    """
+    Define a pipeline stage building the local graph of a procedure through a cache.
+
+    :param cache: the cache
+    :return: the new stage, a drop-in replacement for :data:`analysis.pipeline.cfg`
+    """
+
+    return Stage('cfg', partial(_cfg_item, cache))
+
+
+def heat_stage(cache: MutableMapping[str, Any], max_heat: int, widening_delay: int = 2) \
+        -> Stage[Tuple[Procedure, CodeFragment], Tuple[Procedure, HeatMap]]:
+    """
+    Define a pipeline stage drawing the register heatmap of a procedure's code through a cache.
+
+    The local graph of the procedure is built, or retrieved from the cache, only when the heatmap is not cached.
+
+    :param cache: the cache
+    :param max_heat: the maximum heat level a register can reach
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :return: the new stage, taking the place of both the CFG and heatmap stages
+    """
+
+    return Stage('cached-heat(' + str(max_heat) + ',' + str(widening_delay) + ')',
+                 partial(_heat_item, cache, max_heat, widening_delay))
@@ -0,0 +1,187 @@
+"""
+This module provides call graphs, along with the scheduling of per-procedure analyses in call dependency order.
+
+Recursive procedures call each other in cycles, so call graphs are condensed into the DAG of their strongly connected
+components: each component holds a set of mutually recursive procedures, which must be analyzed together. Components
+are then sorted into levels. Bottom-up, a component's level is higher than those of all the components it calls, so
+that each component can be analyzed once the results of its callees are available; top-down, the opposite holds. The
+components found on the same level do not depend on each other, and are analyzed in parallel.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Mapping, Hashable, List, FrozenSet, Callable, Tuple, Dict, Any
+
+from networkx import DiGraph, condensation, topological_sort
+
+from analysis.graphs import LocalGraph, Transition
+from analysis.linking import Program
+
+ComponentAnalysis = Callable[[Tuple[Hashable, ...], Dict[Hashable, Any]], Mapping[Hashable, Any]]
+"""An analysis of a strongly connected component of a call graph, taking the component's procedures and the results of
+the procedures it depends on, and returning the result of each of its procedures."""
+
+
+class CallGraph:
+    """
+    A call graph, condensed into the DAG of its strongly connected components.
+
+    :ivar graph: the call graph, whose edges go from callers to callees, with undefined callees marked by an
+          `external` attribute set to True
+    :ivar condensation: the DAG of the strongly connected components, whose nodes are integers with a `members`
+          attribute holding the set of procedures of each component
+    """
+
+    graph: DiGraph
+    condensation: DiGraph
+
+    def __init__(self, graph: DiGraph):
+        """
+        Condense a call graph.
+
+        :param graph: the call graph, with edges going from callers to callees
+        """
+
+        self.graph = graph
+        self.condensation = condensation(graph)
+        self._components: Mapping[Hashable, int] = self.condensation.graph['mapping']
+
+    def component(self, procedure: Hashable) -> int:
+        """
+        Find the strongly connected component containing a procedure.
+
+        :param procedure: a node of the call graph
+        :return: the component's node in the condensation
+        """
+
+        return self._components[procedure]
+
+    def members(self, component: int) -> FrozenSet[Hashable]:
+        """
+        Return the procedures belonging to a strongly connected component.
+
+        :param component: a node of the condensation
+        :return: the component's procedures
+        """
+
+        return frozenset(self.condensation.nodes[component]['members'])
+
+    def is_recursive(self, procedure: Hashable) -> bool:
+        """
+        Check whether a procedure may call itself, directly or through other procedures.
+
+        :param procedure: a node of the call graph
+        :return: True if the procedure belongs to a cycle of calls, False otherwise
+        """
+
+        return len(self.condensation.nodes[self._components[procedure]]['members']) > 1 or \
+            self.graph.has_edge(procedure, procedure)
+
+    def _is_external(self, component: int) -> bool:
+        return all(self.graph.nodes[p].get('external', False) for p in self.condensation.nodes[component]['members'])
+
+    def levels(self, bottom_up: bool = True) -> List[List[int]]:
+        """
+        Sort the strongly connected components into levels of mutually independent components.
+
+        Components made of undefined callees only are left out.
+
+        :param bottom_up: whether callees should come before their callers, instead of the opposite
+        :return: the components of each level, in order of analysis
+        """
+
+        order = list(topological_sort(self.condensation))
+        dependencies = self.condensation.successors if bottom_up else self.condensation.predecessors
+        if bottom_up:
+            order.reverse()
+
+        level: Dict[int, int] = {}
+        for c in order:
+            level[c] = max((level[d] + 1 for d in dependencies(c) if not self._is_external(d)), default=0)
+
+        levels: List[List[int]] = []
+        for c in order:
+            if not self._is_external(c):
+                while len(levels) <= level[c]:
+                    levels.append([])
+                levels[level[c]].append(c)
+
+        return levels
+
+    def schedule(self, analysis: ComponentAnalysis, bottom_up: bool = True, workers: int = 0,
+                 processes: bool = False) -> Dict[Hashable, Any]:
+        """
+        Run an analysis on every strongly connected component, in dependency order.
+
+        Each component is analyzed as a whole, and receives the results of the procedures it depends on outside of
+        itself: its callees when going bottom-up, its callers when going top-down. Components on the same level are
+        analyzed in parallel when workers are available; the analysis function must then be picklable to run on
+        processes.
+
+        :param analysis: the analysis function, taking a component's procedures and the results of its dependencies
+        :param bottom_up: whether callees should be analyzed before their callers, instead of the opposite
+        :param workers: the number of workers, or 0 to run the analysis in the calling thread
+        :param processes: whether workers should be processes instead of threads
+        :return: the result of each procedure
+        """
+
+        results: Dict[Hashable, Any] = {}
+
+        def task(component: int) -> Tuple[Tuple[Hashable, ...], Dict[Hashable, Any]]:
+            members = tuple(self.condensation.nodes[component]['members'])
+            dependencies = {}
+            for p in members:
+                for d in (self.graph.successors(p) if bottom_up else self.graph.predecessors(p)):
+                    if d in results:
+                        dependencies[d] = results[d]
+            return members, dependencies
+
+        if workers <= 0:
+            for level in self.levels(bottom_up):
+                for c in level:
+                    results.update(analysis(*task(c)))
+            return results
+
+        with (ProcessPoolExecutor if processes else ThreadPoolExecutor)(workers) as executor:
+            for level in self.levels(bottom_up):
+                futures = [executor.submit(analysis, *task(c)) for c in level]
+                for future in futures:
+                    results.update(future.result())
+
+        return results
+
+
+def local_call_graph(cfgs: Mapping[Hashable, LocalGraph]) -> CallGraph:
+    """
+    Build the call graph of a collection of procedures, given their local graphs.
+
+    External calls are resolved against the procedures' identifiers, and left undefined when no procedure matches.
+    Internal calls of a local graph, i.e. recursive ones, become self-loops.
+
+    :param cfgs: a mapping from the identifiers of some procedures, usually their names, to their local graphs
+    :return: the call graph
+    """
+
+    graph = DiGraph()
+    graph.add_nodes_from(cfgs, external=False)
+    for procedure, cfg in cfgs.items():
+        for call in cfg.external_calls:
+            if call.callee not in cfgs:
+                graph.add_node(call.callee, external=True)
+            graph.add_edge(procedure, call.callee)
+        if any(k is Transition.CALL for _, _, k in cfg.graph.edges(data='kind')):
+            graph.add_edge(procedure, procedure)
+
+    return CallGraph(graph)
+
+
+def program_call_graph(program: Program) -> CallGraph:
+    """
+    Build the call graph of a linked program.
+
+    :param program: the program
+    :return: the call graph, whose procedures are identified by their symbols
+    """
+
+    return CallGraph(program.call_graph())
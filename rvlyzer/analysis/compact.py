@@ -0,0 +1,789 @@
+"""
+This module provides a compact, array-based representation of CFGs.
+
+NetworkX graphs store every node and edge as a dictionary of attributes, which is convenient but heavy when dealing with
+large programs. The :class:`CompactGraph` class stores the same information in compressed sparse row (CSR) form, using
+flat arrays for the adjacency structure and the edge kinds, and a string table for the callees' names.
+
+The functions contained here mirror the homonymous ones in :mod:`analysis.graphs`, but run natively on the compact
+representation. Whenever the NetworkX algorithms library is needed, a compact graph can be exported through its
+`to_networkx()` method.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from itertools import repeat
+from typing import List, Hashable, Optional, Iterable, Tuple, Mapping, Dict, FrozenSet, Union, Sequence, NamedTuple, \
+    Deque, Any
+
+from networkx import DiGraph
+from networkx.utils import generate_unique_node
+
+from rep.fragments import CodeFragment
+from analysis.graphs import BasicBlock, LocalGraph, ProcedureCall, Transition, ExpansionReport
+
+NO_CALLEE = -1
+"""Callee index used for edges that do not represent a procedure call."""
+
+CompactEdge = Tuple[int, int, Transition, Optional[str]]
+"""An edge in the format accepted by :meth:`CompactGraph.from_edges`: source, destination, kind and callee."""
+
+
+class CompactGraph:
+    """
+    A directed CFG stored in compressed sparse row form.
+
+    Nodes are addressed by their index, while their original identifiers, labels and blocks are kept in tables indexed
+    in the same way. The outgoing edges of node `i` occupy positions `offsets[i]` to `offsets[i + 1]` (excluded) of the
+    `targets`, `kinds` and `callees` arrays. Edge kinds are stored as the values of the corresponding `Transition`
+    members, while callees are stored as indices into the `symbols` string table, or as `NO_CALLEE`.
+
+    Compact graphs are not meant to be modified after construction. Reverse adjacency and in-degrees are computed
+    lazily, the first time they are requested.
+
+    :ivar node_ids: the original identifiers of the nodes
+    :ivar labels: the labels attached to each node
+    :ivar blocks: the code fragment contained in each node, if any
+    :ivar external: a flag for each node, marking those representing external code
+    :ivar offsets: the CSR row offsets, one for each node plus a final sentinel
+    :ivar targets: the destinations of the edges
+    :ivar kinds: the transition kind of each edge
+    :ivar callees: the index of each edge's callee inside the string table
+    :ivar symbols: the string table containing the callees' names
+    :ivar attributes: the attributes of the whole graph, as those of NetworkX graphs
+    """
+
+    node_ids: List[Hashable]
+    labels: List[List[str]]
+    blocks: List[Optional[CodeFragment]]
+    external: bytearray
+    offsets: array
+    targets: array
+    kinds: array
+    callees: array
+    symbols: List[str]
+    attributes: Dict[str, Any]
+
+    def __init__(self,
+                 node_ids: List[Hashable],
+                 labels: List[List[str]],
+                 blocks: List[Optional[CodeFragment]],
+                 external: bytearray,
+                 offsets: array,
+                 targets: array,
+                 kinds: array,
+                 callees: array,
+                 symbols: List[str]):
+        """
+        Construct a new compact graph from its raw tables.
+
+        No check is performed on the consistency of the supplied tables. Use :meth:`from_edges` or
+        :meth:`from_networkx` for a safer construction.
+        """
+
+        self.node_ids = node_ids
+        self.labels = labels
+        self.blocks = blocks
+        self.external = external
+        self.offsets = offsets
+        self.targets = targets
+        self.kinds = kinds
+        self.callees = callees
+        self.symbols = symbols
+        self.attributes = {}
+
+        self._index: Optional[Dict[Hashable, int]] = None
+        self._rev_offsets: Optional[array] = None
+        self._sources: Optional[array] = None
+
+    @classmethod
+    def from_edges(cls,
+                   node_ids: Sequence[Hashable],
+                   labels: Sequence[List[str]],
+                   blocks: Sequence[Optional[CodeFragment]],
+                   edges: Iterable[CompactEdge],
+                   external: Optional[Iterable[bool]] = None) -> CompactGraph:
+        """
+        Build a compact graph out of node tables and an edge list.
+
+        Edges are specified as tuples of source index, destination index, transition kind and callee name (or `None`),
+        in any order.
+
+        :param node_ids: the identifiers of the nodes
+        :param labels: the labels of each node
+        :param blocks: the code fragment of each node, if any
+        :param edges: an iterable over the graph's edges
+        :param external: an optional collection of flags marking external nodes
+        :return: the new compact graph
+        """
+
+        node_count = len(node_ids)
+        symbols: List[str] = []
+        symbol_index: Dict[str, int] = {}
+
+        sources, targets, kinds, callees = array('L'), array('L'), array('B'), array('l')
+        for src, dst, kind, callee in edges:
+            sources.append(src)
+            targets.append(dst)
+            kinds.append(kind.value)
+            if callee is None:
+                callees.append(NO_CALLEE)
+            else:
+                if callee not in symbol_index:
+                    symbol_index[callee] = len(symbols)
+                    symbols.append(callee)
+                callees.append(symbol_index[callee])
+
+        # Counting sort of the edges by source node
+        offsets = array('L', repeat(0, node_count + 1))
+        for src in sources:
+            offsets[src + 1] += 1
+        for i in range(node_count):
+            offsets[i + 1] += offsets[i]
+
+        edge_count = len(sources)
+        position = array('L', offsets[:-1])
+        sorted_targets = array('L', repeat(0, edge_count))
+        sorted_kinds = array('B', repeat(0, edge_count))
+        sorted_callees = array('l', repeat(NO_CALLEE, edge_count))
+        for e in range(edge_count):
+            p = position[sources[e]]
+            position[sources[e]] += 1
+            sorted_targets[p] = targets[e]
+            sorted_kinds[p] = kinds[e]
+            sorted_callees[p] = callees[e]
+
+        ext = bytearray(node_count) if external is None else bytearray(map(bool, external))
+
+        return cls(list(node_ids), list(labels), list(blocks), ext,
+                   offsets, sorted_targets, sorted_kinds, sorted_callees, symbols)
+
+    @classmethod
+    def from_networkx(cls, graph: DiGraph) -> CompactGraph:
+        """
+        Convert a NetworkX CFG into a compact graph.
+
+        Nodes are expected to carry the `labels`, `block` and (optionally) `external` attributes, while edges are
+        expected to carry the `kind` and (optionally) `callee` attributes. Any other attribute of nodes and edges is
+        discarded, while the attributes of the whole graph are copied.
+
+        :param graph: the CFG to be converted
+        :return: the equivalent compact graph
+        """
+
+        node_ids = list(graph.nodes)
+        index = {nid: i for i, nid in enumerate(node_ids)}
+        attributes = [graph.nodes[n] for n in node_ids]
+
+        compact = cls.from_edges(node_ids,
+                                 [a.get('labels', []) for a in attributes],
+                                 [a.get('block') for a in attributes],
+                                 ((index[u], index[v], d.get('kind', Transition.SEQ), d.get('callee'))
+                                  for u, v, d in graph.edges(data=True)),
+                                 (a.get('external', False) for a in attributes))
+        compact._index = index
+        compact.attributes.update(graph.graph)
+
+        return compact
+
+    def to_networkx(self) -> DiGraph:
+        """
+        Export this graph as a NetworkX DiGraph.
+
+        Labels lists and code blocks are not copied: the exported graph references the same objects held by this one.
+
+        :return: a NetworkX representation of this graph
+        """
+
+        graph = DiGraph(**self.attributes)
+        for i, nid in enumerate(self.node_ids):
+            if self.external[i]:
+                graph.add_node(nid, labels=self.labels[i], block=self.blocks[i], external=True)
+            else:
+                graph.add_node(nid, labels=self.labels[i], block=self.blocks[i])
+
+        for i, nid in enumerate(self.node_ids):
+            for e in self.out_edges(i):
+                if self.callees[e] == NO_CALLEE:
+                    graph.add_edge(nid, self.node_ids[self.targets[e]], kind=Transition(self.kinds[e]))
+                else:
+                    graph.add_edge(nid, self.node_ids[self.targets[e]], kind=Transition(self.kinds[e]),
+                                   callee=self.symbols[self.callees[e]])
+
+        return graph
+
+    def index(self, node_id: Hashable) -> int:
+        """
+        Return the index of the node with the given identifier.
+
+        :param node_id: a node identifier
+        :return: the index of the node
+        :raise KeyError: when no node has the specified identifier
+        """
+
+        if self._index is None:
+            self._index = {nid: i for i, nid in enumerate(self.node_ids)}
+
+        return self._index[node_id]
+
+    def number_of_edges(self) -> int:
+        return len(self.targets)
+
+    def out_edges(self, node: int) -> range:
+        """
+        Return the positions of the outgoing edges of a node inside the edge arrays.
+
+        :param node: a node index
+        :return: the range of edge positions
+        """
+
+        return range(self.offsets[node], self.offsets[node + 1])
+
+    def successors(self, node: int) -> array:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def out_degree(self, node: int) -> int:
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def edge_kind(self, edge: int) -> Transition:
+        return Transition(self.kinds[edge])
+
+    def edge_callee(self, edge: int) -> Optional[str]:
+        return None if self.callees[edge] == NO_CALLEE else self.symbols[self.callees[edge]]
+
+    def _build_reverse(self) -> None:
+        # Build the reverse CSR structure through another counting sort, this time by destination
+        node_count = len(self)
+        rev_offsets = array('L', repeat(0, node_count + 1))
+        for dst in self.targets:
+            rev_offsets[dst + 1] += 1
+        for i in range(node_count):
+            rev_offsets[i + 1] += rev_offsets[i]
+
+        position = array('L', rev_offsets[:-1])
+        sources = array('L', repeat(0, len(self.targets)))
+        for src in range(node_count):
+            for e in self.out_edges(src):
+                dst = self.targets[e]
+                sources[position[dst]] = src
+                position[dst] += 1
+
+        self._rev_offsets = rev_offsets
+        self._sources = sources
+
+    def predecessors(self, node: int) -> array:
+        if self._rev_offsets is None:
+            self._build_reverse()
+
+        return self._sources[self._rev_offsets[node]:self._rev_offsets[node + 1]]
+
+    def in_degree(self, node: int) -> int:
+        if self._rev_offsets is None:
+            self._build_reverse()
+
+        return self._rev_offsets[node + 1] - self._rev_offsets[node]
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __repr__(self):
+        return "CompactGraph(nodes=" + repr(len(self)) + ", edges=" + repr(self.number_of_edges()) + ")"
+
+
+class CompactLocalGraph:
+    """
+    The compact counterpart of :class:`analysis.graphs.LocalGraph`.
+
+    Entry-points, terminals and the callers/confluence points of external calls are expressed as node indices inside
+    the compact graph, rather than node identifiers.
+    """
+
+    entry_points: List[int]
+    graph: CompactGraph
+    external_calls: List[ProcedureCall]
+    terminals: List[int]
+
+    def __init__(self,
+                 entry_points: Iterable[int],
+                 graph: CompactGraph,
+                 calls: Iterable[ProcedureCall],
+                 terminals: Iterable[int]):
+        """
+        Construct a new compact local graph.
+
+        :param entry_points: a collection of node indices indicating the entry-points
+        :param graph: the local graph, as a compact graph
+        :param calls: a collection of purportedly external calls, with callers and confluence points given as indices
+        :param terminals: a collection of node indices indicating which are the terminal nodes
+        """
+
+        self.entry_points = list(entry_points)
+        self.graph = graph
+        self.external_calls = list(calls)
+        self.terminals = list(terminals)
+
+    @classmethod
+    def from_local_graph(cls, cfg: LocalGraph) -> CompactLocalGraph:
+        """
+        Convert a local graph into its compact counterpart.
+
+        :param cfg: the local graph to be converted
+        :return: the equivalent compact local graph
+        """
+
+        graph = CompactGraph.from_networkx(cfg.graph)
+        calls = (ProcedureCall(graph.index(c.caller), c.callee, graph.index(c.confluence_point))
+                 for c in cfg.external_calls)
+
+        return cls(map(graph.index, cfg.entry_point_ids), graph, calls, map(graph.index, cfg.terminal_nodes_ids))
+
+    def to_local_graph(self) -> LocalGraph:
+        """
+        Export this compact local graph as a NetworkX-based local graph.
+
+        :return: the equivalent local graph
+        """
+
+        ids = self.graph.node_ids
+        calls = (ProcedureCall(ids[c.caller], c.callee, ids[c.confluence_point]) for c in self.external_calls)
+
+        return LocalGraph((ids[ep] for ep in self.entry_points),
+                          self.graph.to_networkx(),
+                          calls,
+                          (ids[t] for t in self.terminals))
+
+    def get_symbol_table(self) -> Mapping[str, int]:
+        """
+        Return a mapping between entry labels and entry-points' node indices.
+
+        :return: a mapping from public labels to their entry-point indices
+        """
+
+        return {lab: ep for ep in self.entry_points for lab in self.graph.labels[ep]}
+
+
+def local_cfg(bbs: List[BasicBlock]) -> CompactLocalGraph:
+    """
+    Construct a compact local graph from a list of basic blocks.
+
+    This function behaves like :func:`analysis.graphs.local_cfg`, and is subject to the same assumptions. Nodes are
+    indexed following the order of the basic blocks in the supplied list.
+
+    :param bbs: the list of basic blocks of which the local graph is formed
+    :return: a CompactLocalGraph object representing the local graph
+    """
+
+    edges: List[CompactEdge] = []
+    local_symbol_table: Dict[str, int] = {}
+    pending_jumps: List[Tuple[int, str, Transition]] = []
+
+    terminal_nodes = []
+    calls = []
+
+    for i, bb in enumerate(bbs):
+        local_symbol_table.update((lab, i) for lab in bb.labels)
+
+        outgoing_transition, destination = bb.outgoing_flow
+        if outgoing_transition is Transition.RETURN:
+            terminal_nodes.append(i)
+        elif outgoing_transition is Transition.CALL:
+            # The subsequent block (if any) is the call's confluence point
+            if i + 1 < len(bbs):
+                calls.append(ProcedureCall(i, destination, i + 1))
+        else:
+            if (outgoing_transition is Transition.SEQ or outgoing_transition.branching) and i + 1 < len(bbs):
+                edges.append((i, i + 1, Transition.SEQ, None))
+
+            if outgoing_transition.resolve_symbol:
+                pending_jumps.append((i, destination, outgoing_transition))
+
+    # Resolve the internal symbolic jumps
+    edges.extend((jumper, local_symbol_table[dst], kind, None) for jumper, dst, kind in pending_jumps)
+    # Transform recursive calls into internal call arcs
+    edges.extend((c.caller, c.confluence_point, Transition.CALL, c.callee)
+                 for c in calls if c.callee in local_symbol_table)
+
+    graph = CompactGraph.from_edges([bb.identifier for bb in bbs],
+                                    [list(bb.labels) for bb in bbs],
+                                    [bb.code for bb in bbs],
+                                    edges)
+
+    return CompactLocalGraph([0],
+                             graph,
+                             (c for c in calls if c.callee not in local_symbol_table),
+                             terminal_nodes)
+
+
+def _preorder(graph: CompactGraph, source: int) -> List[int]:
+    # Iterative depth-first pre-order visit, emulating the order of a recursive one
+    visited = bytearray(len(graph))
+    order = []
+    stack = [source]
+    while len(stack) > 0:
+        node = stack.pop()
+        if visited[node]:
+            continue
+
+        visited[node] = True
+        order.append(node)
+        stack.extend(reversed(graph.successors(node)))
+
+    return order
+
+
+class _GraphBuffer:
+    # Growable node tables and edge list, used for assembling a new compact graph
+
+    def __init__(self):
+        self.node_ids = []
+        self.labels = []
+        self.blocks = []
+        self.external = []
+        self.edges = []
+
+    def add_node(self, node_id: Hashable, labels: List[str], block: Optional[CodeFragment], external: bool) -> int:
+        self.node_ids.append(node_id)
+        self.labels.append(labels)
+        self.blocks.append(block)
+        self.external.append(external)
+        return len(self.node_ids) - 1
+
+    def build(self) -> CompactGraph:
+        return CompactGraph.from_edges(self.node_ids, self.labels, self.blocks, self.edges, self.external)
+
+
+class _CompactTemplate(NamedTuple):
+    # The component visited from a procedure's entry-point, expressed in terms of positions inside the `nodes` list of
+    # node indices. The entry-point is always found at position 0. Call edges are kept apart, so that they can be
+    # expanded upon instantiation.
+
+    nodes: List[int]
+    edges: List[CompactEdge]
+    calls: List[Tuple[int, int, str]]
+    tails: List[int]
+
+
+# A call site waiting for expansion: callee, ignored calls, depth, caller and confluence point in the execution graph
+_PendingCall = Tuple[int, FrozenSet[str], int, int, int]
+
+
+class _CompactExpander:
+    # Scratchpad used by exec_graph() for building a compact execution graph, the counterpart of the one used by
+    # analysis.graphs.exec_graph()
+
+    def __init__(self,
+                 cfg: CompactLocalGraph,
+                 share_subgraphs: bool,
+                 max_nodes: Optional[int],
+                 max_edges: Optional[int],
+                 max_depth: Optional[int]):
+        self.cfg = cfg
+        self.symbols = cfg.get_symbol_table()
+        self.share_subgraphs = share_subgraphs
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+        self.max_depth = max_depth
+        self.out = _GraphBuffer()
+
+        self._templates: Dict[int, _CompactTemplate] = {}
+        self._closures: Dict[int, FrozenSet[str]] = {}
+        self._shared: Dict[Tuple[int, FrozenSet[str]], Tuple[int, List[int]]] = {}
+        # Nested instances are identified by this token, paired with an ever-increasing offset
+        self._token = generate_unique_node()
+        self._next_id = 0
+
+        self._expanded = 0
+        self._collapsed = 0
+        self._omitted_nodes = 0
+        self._omitted_edges = 0
+
+    @property
+    def report(self) -> ExpansionReport:
+        return ExpansionReport(self._expanded, self._collapsed, self._omitted_nodes, self._omitted_edges)
+
+    def _template(self, source: int) -> _CompactTemplate:
+        if source not in self._templates:
+            graph = self.cfg.graph
+            nodes = _preorder(graph, source)
+            position = {n: i for i, n in enumerate(nodes)}
+
+            edges, calls, tails = [], [], []
+            for i, n in enumerate(nodes):
+                if graph.out_degree(n) == 0:
+                    tails.append(i)
+
+                for e in graph.out_edges(n):
+                    if graph.kinds[e] == Transition.CALL.value:
+                        calls.append((i, position[graph.targets[e]], graph.symbols[graph.callees[e]]))
+                    else:
+                        edges.append((i, position[graph.targets[e]], graph.edge_kind(e), graph.edge_callee(e)))
+
+            self._templates[source] = _CompactTemplate(nodes, edges, calls, tails)
+
+        return self._templates[source]
+
+    def _closure(self, source: int) -> FrozenSet[str]:
+        # Collect the labels of all the procedures that may be reached through calls, starting from the source
+        if source not in self._closures:
+            labels = set()
+            visited = {source}
+            stack = [source]
+            while len(stack) > 0:
+                proc = stack.pop()
+                labels.update(self.cfg.graph.labels[proc])
+                for _, _, callee_label in self._template(proc).calls:
+                    callee = self.symbols[callee_label]
+                    if callee not in visited:
+                        visited.add(callee)
+                        stack.append(callee)
+
+            self._closures[source] = frozenset(labels)
+
+        return self._closures[source]
+
+    def _summarize(self, source: int) -> Tuple[int, List[int]]:
+        # The node will have a synthetic ID 'call{<call destination>, <unique ID>}', and will carry the original labels
+        graph = self.cfg.graph
+        summary = self.out.add_node('call{' + str(graph.node_ids[source]) + ', ' + generate_unique_node() + '}',
+                                    graph.labels[source], None, True)
+        return summary, [summary]
+
+    def _exceeds_limits(self, template: _CompactTemplate, depth: int) -> bool:
+        node_cost = len(template.nodes)
+        # Count the call edge and the return edges, too
+        edge_cost = len(template.edges) + 1 + len(template.tails)
+
+        return (self.max_depth is not None and depth > self.max_depth) or \
+               (self.max_nodes is not None and len(self.out.node_ids) + node_cost > self.max_nodes) or \
+               (self.max_edges is not None and len(self.out.edges) + edge_cost > self.max_edges)
+
+    def _attach(self,
+                source: int,
+                ignore_calls: FrozenSet[str],
+                depth: int,
+                pending: Deque[_PendingCall]) -> Tuple[int, List[int]]:
+        # Attach an instance of the source's execution sub-graph, returning the indices of its head and tails. The call
+        # sites found inside the instance are appended to the pending queue.
+        graph = self.cfg.graph
+        source_labels = graph.labels[source]
+
+        # If one of the entry-point's labels is in the ignore set, emit a node summarizing the call
+        if not ignore_calls.isdisjoint(source_labels):
+            return self._summarize(source)
+
+        if self.share_subgraphs:
+            # Only the ignored labels that may actually be encountered influence the shape of the instance
+            key = source, ignore_calls.intersection(self._closure(source))
+            if key in self._shared:
+                return self._shared[key]
+
+        template = self._template(source)
+        root = depth == 0
+        if not root and self._exceeds_limits(template, depth):
+            # Out of budget: collapse the call into a summary node
+            self._collapsed += 1
+            self._omitted_nodes += len(template.nodes)
+            self._omitted_edges += len(template.edges) + len(template.calls)
+            return self._summarize(source)
+
+        if root:
+            ids = [graph.node_ids[n] for n in template.nodes]
+        else:
+            # Instantiate the template by offsetting its positions
+            self._expanded += 1
+            base = self._next_id
+            self._next_id += len(template.nodes)
+            ids = [(self._token, base + i) for i in range(len(template.nodes))]
+
+        local = [self.out.add_node(ids[i], graph.labels[n], graph.blocks[n], graph.external[n])
+                 for i, n in enumerate(template.nodes)]
+        self.out.edges.extend((local[u], local[v], kind, callee) for u, v, kind, callee in template.edges)
+
+        instance = local[0], [local[t] for t in template.tails]
+        if self.share_subgraphs:
+            self._shared[key] = instance
+
+        nested_ignore = ignore_calls.union(source_labels)
+        pending.extend((self.symbols[callee], nested_ignore, depth + 1, local[caller], local[confluence])
+                       for caller, confluence, callee in template.calls)
+
+        return instance
+
+    def expand(self, source: int, ignore_calls: FrozenSet[str]) -> None:
+        # Calls are expanded breadth-first, so that the budget is spent on the shallowest ones
+        pending = deque()
+        self._attach(source, ignore_calls, 0, pending)
+
+        while len(pending) > 0:
+            callee, nested_ignore, depth, caller, confluence = pending.popleft()
+            # Connect the called procedure's component through call and return edges
+            head, tails = self._attach(callee, nested_ignore, depth, pending)
+            self.out.edges.append((caller, head, Transition.CALL, None))
+            self.out.edges.extend((t, confluence, Transition.RETURN, None) for t in tails)
+
+
+def exec_graph(cfg: CompactLocalGraph,
+               entry_point: Union[str, int],
+               ignore_calls: FrozenSet[str] = frozenset(),
+               share_subgraphs: bool = False,
+               max_nodes: Optional[int] = None,
+               max_edges: Optional[int] = None,
+               max_depth: Optional[int] = None) -> CompactGraph:
+    """
+    Given a compact local CFG and an entry-point, return the compact graph of the node visits performed by the
+    execution flow.
+
+    This function behaves like :func:`analysis.graphs.exec_graph`, sharing its options: calls are expanded
+    breadth-first, without recurring, and those exceeding the size or depth limits are collapsed into external summary
+    nodes. Nodes reached from the entry-point keep their original identifiers, while nodes of the attached sub-graphs
+    are identified by tuples made of a token, unique to the invocation, and an integer offset. A summary of the
+    performed expansions is stored in the returned graph's attributes, as an `ExpansionReport` under the `expansion`
+    key.
+
+    :param cfg: a compact CFG description of some code
+    :param entry_point: an entry-point specification for the CFG, either as a node index or as a symbolic label
+    :param ignore_calls: a set of calls that won't be expanded into sub-graphs
+    :param share_subgraphs: whether call sites should reference a single instance of each called procedure
+    :param max_nodes: the maximum number of nodes of the execution graph, or None for no limit
+    :param max_edges: the maximum number of edges of the execution graph, or None for no limit
+    :param max_depth: the maximum depth of the expanded calls, or None for no limit
+    :return: a compact graph representing the execution starting from the specified entry-point
+    """
+
+    source = entry_point if entry_point in cfg.entry_points else cfg.get_symbol_table()[entry_point]
+
+    expander = _CompactExpander(cfg, share_subgraphs, max_nodes, max_edges, max_depth)
+    expander.expand(source, ignore_calls)
+    graph = expander.out.build()
+    graph.attributes['expansion'] = expander.report
+
+    return graph
+
+
+def merge_points(cfg: CompactGraph) -> FrozenSet[Hashable]:
+    """
+    Find all the merge point in the compact CFG.
+
+    A merge point is a node on which multiple directed edges converge. As in :func:`analysis.graphs.merge_points`, the
+    node identified by 0 represents the calling environment and is excluded from the analysis.
+
+    :arg cfg: the compact CFG representing a program
+    :return: a frozen set containing the identifiers of all the merge points
+    """
+
+    return frozenset(nid for i, nid in enumerate(cfg.node_ids) if nid != 0 and cfg.in_degree(i) > 1)
+
+
+def _cyclic_nodes(cfg: CompactGraph, root: int, excluded: int) -> bytearray:
+    # Iterative Tarjan's algorithm over the nodes reachable from the root, marking all those belonging to a non-trivial
+    # SCC or to a self-loop
+    node_count = len(cfg)
+    index = array('l', repeat(-1, node_count))
+    low = array('l', repeat(0, node_count))
+    on_stack = bytearray(node_count)
+    cyclic = bytearray(node_count)
+    scc_stack = []
+    counter = 0
+
+    if root != excluded:
+        work = [(root, iter(cfg.out_edges(root)))]
+        index[root] = low[root] = counter
+        counter += 1
+        scc_stack.append(root)
+        on_stack[root] = True
+
+        while len(work) > 0:
+            node, edges = work[-1]
+            for e in edges:
+                succ = cfg.targets[e]
+                if succ == excluded:
+                    continue
+                if succ == node:
+                    cyclic[node] = True
+                if index[succ] == -1:
+                    index[succ] = low[succ] = counter
+                    counter += 1
+                    scc_stack.append(succ)
+                    on_stack[succ] = True
+                    work.append((succ, iter(cfg.out_edges(succ))))
+                    break
+                elif on_stack[succ]:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if len(work) > 0:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+
+                if low[node] == index[node]:
+                    # Pop the strongly connected component rooted here
+                    component = []
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        for member in component:
+                            cyclic[member] = True
+
+    return cyclic
+
+
+def loop_back_nodes(cfg: CompactGraph) -> FrozenSet[Hashable]:
+    """
+    Find all the nodes of a compact CFG that are exclusively part of a loop.
+
+    This is the compact counterpart of :func:`analysis.graphs.loop_back_nodes`, following the same conventions about
+    nodes 0 (the calling environment) and 1 (the entry-point). Instead of enumerating cycles and paths, nodes lying on
+    some cycle are found through strongly connected components, while nodes lying on an acyclic path from the entry to
+    the environment are found through reachability over the graph deprived of its DFS back edges. Nodes that cannot be
+    reached from the entry-point are ignored, as they are by :func:`analysis.graphs.loop_back_nodes`. The two approaches
+    agree on reducible CFGs.
+
+    :arg cfg: the compact CFG representation of a program
+    :return: a frozen set of the identifiers of all the loop-exclusive nodes
+    """
+
+    env, entry = cfg.index(0), cfg.index(1)
+    node_count = len(cfg)
+    cyclic = _cyclic_nodes(cfg, entry, env)
+
+    # Depth-first visit from the entry, marking back edges. The environment node terminates every path.
+    state = bytearray(node_count)  # 0: unvisited, 1: on the DFS stack, 2: finished
+    back = bytearray(cfg.number_of_edges())
+    state[entry] = 1
+    work = [(entry, iter(cfg.out_edges(entry)))]
+    while len(work) > 0:
+        node, edges = work[-1]
+        for e in edges:
+            succ = cfg.targets[e]
+            if state[succ] == 1:
+                back[e] = True
+            elif state[succ] == 0:
+                state[succ] = 1
+                if succ != env:
+                    work.append((succ, iter(cfg.out_edges(succ))))
+                    break
+                state[succ] = 2
+        else:
+            state[node] = 2
+            work.pop()
+
+    # Walk the forward edges backwards from the environment, collecting the nodes that can reach it
+    reaches_env = bytearray(node_count)
+    reaches_env[env] = True
+    frontier = [env]
+    while len(frontier) > 0:
+        node = frontier.pop()
+        for pred in cfg.predecessors(node):
+            if not reaches_env[pred] and state[pred] and pred != env and \
+                    any(cfg.targets[e] == node and not back[e] for e in cfg.out_edges(pred)):
+                reaches_env[pred] = True
+                frontier.append(pred)
+
+    return frozenset(cfg.node_ids[i] for i in range(node_count)
+                     if cyclic[i] and i != env and not (state[i] and reaches_env[i]))
@@ -0,0 +1,165 @@
+"""
+This module provides a generic engine for forward data-flow analyses over CFGs.
+
+An analysis is described by the values flowing into the entry-points, a transfer function computing a node's output
+from its input, and a meet operator combining the values reaching a node through multiple edges. The engine iterates
+over a worklist prioritized by reverse post-order, so that on acyclic regions every node is evaluated only after all
+its predecessors, and re-evaluates a node only when one of its inputs changes. The cost of an analysis is thus
+proportional to the number of nodes multiplied by the number of times loops have to be traversed before stabilizing.
+
+Termination is guaranteed when the transfer functions are monotone and the lattice of values has finite height. For
+analyses that do not satisfy these conditions, a widening operator can be supplied: after a node has been evaluated a
+given number of times, its new input is widened against the previous one, forcing the iteration to converge.
+
+An analysis can also be resumed from a previously computed fixpoint, after the transfer functions of some nodes have
+changed: only those nodes are evaluated at first, and changes are propagated only as long as the values keep differing.
+"""
+
+from heapq import heappush, heappop
+from operator import eq
+from typing import Hashable, Mapping, Callable, List, Optional, Iterable, Dict, NamedTuple, Any
+
+from networkx import DiGraph
+
+
+class DataflowResult(NamedTuple):
+    """
+    The fixpoint reached by a data-flow analysis.
+
+    Only the nodes reached by the analysis, i.e. those reachable from the entry-points, are present in the mappings.
+
+    :var inputs: the value flowing into each node
+    :var outputs: the value flowing out of each node
+    :var iterations: the number of times the transfer function has been evaluated
+    :var order: the reachable nodes, in the reverse post-order that has driven the iteration
+    """
+
+    inputs: Mapping[Hashable, Any]
+    outputs: Mapping[Hashable, Any]
+    iterations: int
+    order: List[Hashable]
+
+
+def reverse_postorder(graph: DiGraph, entries: Iterable[Hashable]) -> List[Hashable]:
+    """
+    Compute the reverse post-order of the nodes reachable from the entry-points.
+
+    :param graph: a directed graph
+    :param entries: the nodes from which the depth-first visit starts
+    :return: the list of the reachable nodes, in reverse post-order
+    """
+
+    postorder = []
+    visited = set()
+    for entry in entries:
+        if entry in visited:
+            continue
+
+        visited.add(entry)
+        stack = [(entry, iter(graph.adj[entry]))]
+        while len(stack) > 0:
+            node, successors = stack[-1]
+            succ = next(successors, None)
+            if succ is None:
+                postorder.append(node)
+                stack.pop()
+            elif succ not in visited:
+                visited.add(succ)
+                stack.append((succ, iter(graph.adj[succ])))
+
+    postorder.reverse()
+    return postorder
+
+
+def forward_dataflow(graph: DiGraph,
+                     boundary: Mapping[Hashable, Any],
+                     transfer: Callable[[Hashable, Any], Any],
+                     meet: Callable[[List[Any]], Any],
+                     edge_transfer: Optional[Callable[[Hashable, Hashable, Any], Any]] = None,
+                     widen: Optional[Callable[[Any, Any], Any]] = None,
+                     widening_delay: int = 2,
+                     initial: Optional[DataflowResult] = None,
+                     changed: Iterable[Hashable] = (),
+                     equal: Callable[[Any, Any], bool] = eq) -> DataflowResult:
+    """
+    Solve a forward data-flow problem through a worklist iteration.
+
+    The input of a node is the meet of the values flowing out of its predecessors, along with its boundary value if the
+    node is an entry-point. Predecessors that have not been evaluated yet are ignored, acting as the top element of the
+    lattice. Values are compared through equality to detect changes (or through a custom function, for types such as
+    NumPy arrays whose equality operator is not a predicate), so they should be immutable or, at least, never modified
+    in place by the supplied functions.
+
+    When a previous result is supplied, the iteration resumes from its fixpoint instead of starting from scratch. The
+    nodes whose transfer function has changed must be listed, and are the only ones evaluated at first. The graph's
+    structure and the boundary values must be the same used for computing the previous result, which is not modified.
+
+    :param graph: the CFG to be analyzed
+    :param boundary: a mapping from the entry-points to the values flowing into them from the outside
+    :param transfer: a function computing the output of a node, given the node and its input
+    :param meet: a function combining the non-empty list of values reaching a node
+    :param edge_transfer: a function transforming the value flowing along an edge, given the edge's endpoints and the
+                          origin's output
+    :param widen: a function combining a node's previous input and its new one, so that the iteration converges
+    :param widening_delay: the number of evaluations of a node after which its inputs are widened
+    :param initial: a previously computed fixpoint from which the iteration is resumed
+    :param changed: the nodes whose transfer function has changed since the previous fixpoint was computed
+    :param equal: the function used for comparing values
+    :return: the fixpoint of the analysis
+    """
+
+    order = reverse_postorder(graph, boundary.keys()) if initial is None else initial.order
+    priority = {n: i for i, n in enumerate(order)}
+
+    inputs: Dict[Hashable, Any] = {} if initial is None else dict(initial.inputs)
+    outputs: Dict[Hashable, Any] = {} if initial is None else dict(initial.outputs)
+    visits: Dict[Hashable, int] = {}
+    iterations = 0
+
+    # The worklist is a heap of reverse post-order indices, with a membership set preventing duplicates. Changed nodes
+    # are forced to be evaluated, even if their input is the same as before.
+    if initial is None:
+        worklist = list(range(len(order)))
+        forced = set()
+    else:
+        worklist = sorted({priority[n] for n in changed if n in priority})
+        forced = set(worklist)
+    queued = set(worklist)
+    while len(worklist) > 0:
+        index = heappop(worklist)
+        queued.remove(index)
+        node = order[index]
+
+        values = [boundary[node]] if node in boundary else []
+        for pred in graph.pred[node]:
+            if pred in outputs:
+                value = outputs[pred]
+                values.append(value if edge_transfer is None else edge_transfer(pred, node, value))
+
+        if len(values) == 0:
+            continue
+
+        value = meet(values)
+        if node in inputs:
+            if widen is not None and visits.get(node, 0) >= widening_delay:
+                value = widen(inputs[node], value)
+            if equal(value, inputs[node]) and index not in forced:
+                continue
+            forced.discard(index)
+
+        inputs[node] = value
+        visits[node] = visits.get(node, 0) + 1
+        iterations += 1
+
+        output = transfer(node, value)
+        if node in outputs and equal(output, outputs[node]):
+            continue
+
+        outputs[node] = output
+        for succ in graph.adj[node]:
+            succ_index = priority[succ]
+            if succ_index not in queued:
+                queued.add(succ_index)
+                heappush(worklist, succ_index)
+
+    return DataflowResult(inputs, outputs, iterations, order)
@@ -0,0 +1,448 @@
+"""
+This module provides a block-level diff between two versions of some code.
+
+Code is first reduced to a fingerprint: every statement is hashed, statements are grouped into blocks, cut at labels
+and after control transfer instructions much like basic blocks are, and every block gets a hash of its own. Fingerprints
+cover every line of the code, directives included, and can be computed once per version and diffed many times.
+
+Block hash sequences are aligned with the patience algorithm: blocks occurring exactly once in both versions, which are
+most of them since blocks usually start with a unique label, are matched first, and the gaps between them are aligned
+with Myers' algorithm. Runs of unmatched blocks are then reported as modified, inserted or deleted blocks, while matched
+blocks provide a mapping between the lines of the two versions.
+
+Statement hashes are computed through Python's `hash()`, whose value for strings changes from one interpreter to
+another: fingerprints can only be compared to fingerprints computed by the same process.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from enum import Enum
+from typing import NamedTuple, List, Tuple, Optional, Union, Sequence, Dict
+
+import numpy as np
+
+from rep.base import Statement, Instruction, Directive
+from rep.fragments import CodeFragment
+from analysis.graphs import jump_ops
+
+
+def statement_hash(statement: Statement) -> int:
+    """
+    Hash a statement based on its content, labels included.
+
+    :param statement: a statement
+    :return: the statement's hash
+    """
+
+    if type(statement) is Instruction:
+        imm = statement.immediate
+        return hash((statement.opcode, statement.r1, statement.r2, statement.r3,
+                     None if imm is None else (imm.symbol, imm.int_val), *statement.labels))
+    elif type(statement) is Directive:
+        return hash((statement.name, tuple(statement.labels), *statement.args))
+    else:
+        return hash(repr(statement))
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    # The SplitMix64 finalizer, applied to an array of unsigned integers
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class Fingerprint:
+    """
+    The hashes of the statements and blocks of some code.
+
+    :ivar begin: the first line of the code
+    :ivar hashes: the hash of each statement
+    :ivar starts: the first line of each block, followed by the line ending the code
+    :ivar blocks: the hash of each block
+    """
+
+    begin: int
+    hashes: np.ndarray
+    starts: np.ndarray
+    blocks: np.ndarray
+
+    def __init__(self, code: CodeFragment):
+        """
+        Compute the fingerprint of some code.
+
+        :param code: the code to be fingerprinted
+        """
+
+        hashes = []
+        cuts = []
+        cut = True
+        for i, statement in enumerate(code):
+            hashes.append(statement_hash(statement))
+            if cut or len(statement.labels) > 0:
+                cuts.append(i)
+            cut = isinstance(statement, Instruction) and statement.opcode in jump_ops
+
+        self.begin = code.begin
+        self.hashes = np.array(hashes, dtype=np.int64)
+        self.starts = np.array(cuts + [len(hashes)], dtype=np.int64) + self.begin
+
+        if len(hashes) == 0:
+            self.blocks = np.empty(0, dtype=np.int64)
+            return
+
+        # Blocks are hashed by combining the hashes of their statements, mixed with their position inside the block,
+        # and the blocks' lengths
+        cuts = np.array(cuts, dtype=np.int64)
+        lengths = np.diff(self.starts)
+        positions = np.arange(len(hashes), dtype=np.int64) - np.repeat(cuts, lengths)
+        mixed = _mix(self.hashes.view(np.uint64) ^ _mix(positions.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)))
+        self.blocks = (np.bitwise_xor.reduceat(mixed, cuts) ^ _mix(lengths.astype(np.uint64))).view(np.int64)
+
+    @property
+    def end(self) -> int:
+        """
+        The line ending the fingerprinted code.
+        """
+
+        return int(self.starts[-1])
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def block_range(self, block: int) -> Tuple[int, int]:
+        """
+        Return the range of lines spanned by a block.
+
+        :param block: the index of the block
+        :return: the block's first line and the line ending it
+        """
+
+        return int(self.starts[block]), int(self.starts[block + 1])
+
+    def block_at(self, line: int) -> int:
+        """
+        Find the block containing a line.
+
+        :param line: a line of the fingerprinted code
+        :return: the index of the block
+        :raise IndexError: when the line falls outside the code
+        """
+
+        if not self.begin <= line < self.end:
+            raise IndexError("Line out of range")
+
+        return int(np.searchsorted(self.starts, line, side='right')) - 1
+
+
+class ChangeKind(Enum):
+    """
+    The kind of change undergone by a block.
+    """
+
+    INSERTED = 0
+    DELETED = 1
+    MODIFIED = 2
+
+
+class BlockChange(NamedTuple):
+    """
+    A change between two versions of some code, involving a single block.
+
+    The range of an inserted block in the old version, and the range of a deleted block in the new one, are empty
+    ranges pointing at the position of the change.
+
+    :var kind: the kind of change
+    :var old: the range of lines spanned by the block in the old version, with the ending line excluded
+    :var new: the range of lines spanned by the block in the new version, with the ending line excluded
+    """
+
+    kind: ChangeKind
+    old: Tuple[int, int]
+    new: Tuple[int, int]
+
+
+def _myers(a: Sequence[int], b: Sequence[int], max_cost: int) -> Optional[List[Tuple[int, int]]]:
+    # Find the pairs of matching elements in a shortest edit script between two sequences with Myers' algorithm, or
+    # give up when the script would be longer than the maximum cost
+    n, m = len(a), len(b)
+    offset = n + m + 1
+    frontier = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(min(n + m, max_cost) + 1):
+        trace.append(frontier[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and frontier[offset + k - 1] < frontier[offset + k + 1]):
+                x = frontier[offset + k + 1]
+            else:
+                x = frontier[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x, y = x + 1, y + 1
+            frontier[offset + k] = x
+
+            if x >= n and y >= m:
+                # Walk the edit script backwards, collecting the diagonal moves
+                pairs = []
+                for e in range(d, 0, -1):
+                    # Only the diagonals reachable with e moves have been kept, starting from the (-e - 1)-th
+                    previous = trace[e]
+                    k = x - y
+                    if k == -e or (k != e and previous[k + e] < previous[k + e + 2]):
+                        k += 1
+                    else:
+                        k -= 1
+                    previous_x = previous[k + e + 1]
+                    previous_y = previous_x - k
+                    while x > previous_x and y > previous_y:
+                        x, y = x - 1, y - 1
+                        pairs.append((x, y))
+                    x, y = previous_x, previous_y
+                while x > 0 and y > 0:
+                    x, y = x - 1, y - 1
+                    pairs.append((x, y))
+
+                pairs.reverse()
+                return pairs
+
+    return None
+
+
+def _longest_increasing(values: Sequence[int]) -> List[int]:
+    # Find the indices of a longest strictly increasing subsequence
+    tails: List[int] = []
+    tail_indices: List[int] = []
+    parents = [-1] * len(values)
+    for i, value in enumerate(values):
+        position = bisect_left(tails, value)
+        if position == len(tails):
+            tails.append(value)
+            tail_indices.append(i)
+        else:
+            tails[position] = value
+            tail_indices[position] = i
+        parents[i] = tail_indices[position - 1] if position > 0 else -1
+
+    result = []
+    i = tail_indices[-1] if len(tail_indices) > 0 else -1
+    while i >= 0:
+        result.append(i)
+        i = parents[i]
+
+    result.reverse()
+    return result
+
+
+def _patience(a: List[int], b: List[int], max_cost: int) -> List[Tuple[int, int]]:
+    # Find the pairs of matching elements between two sequences, with patience diff and Myers' algorithm for the gaps
+    pairs: List[Tuple[int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while len(stack) > 0:
+        a_low, a_high, b_low, b_high = stack.pop()
+
+        # Match the common head and tail
+        head = []
+        while a_low < a_high and b_low < b_high and a[a_low] == b[b_low]:
+            head.append((a_low, b_low))
+            a_low, b_low = a_low + 1, b_low + 1
+        tail = []
+        while a_low < a_high and b_low < b_high and a[a_high - 1] == b[b_high - 1]:
+            a_high, b_high = a_high - 1, b_high - 1
+            tail.append((a_high, b_high))
+        pairs.extend(head)
+        pairs.extend(tail)
+
+        if a_low == a_high or b_low == b_high:
+            continue
+
+        # Match the elements occurring exactly once on both sides, keeping the longest consistent set of matches
+        counts: Dict[int, int] = {}
+        for value in a[a_low:a_high]:
+            counts[value] = counts.get(value, 0) + 1
+        positions: Dict[int, int] = {}
+        for j in range(b_low, b_high):
+            value = b[j]
+            if counts.get(value) == 1:
+                positions[value] = -1 if value in positions else j
+        unique = [(i, positions[a[i]]) for i in range(a_low, a_high) if positions.get(a[i], -1) >= 0]
+
+        if len(unique) == 0:
+            matched = _myers(a[a_low:a_high], b[b_low:b_high], max_cost)
+            if matched is not None:
+                pairs.extend((a_low + i, b_low + j) for i, j in matched)
+            continue
+
+        anchors = [unique[i] for i in _longest_increasing([j for _, j in unique])]
+        pairs.extend(anchors)
+        previous_i, previous_j = a_low, b_low
+        for i, j in anchors:
+            stack.append((previous_i, i, previous_j, j))
+            previous_i, previous_j = i + 1, j + 1
+        stack.append((previous_i, a_high, previous_j, b_high))
+
+    pairs.sort()
+    return pairs
+
+
+def _align(a: np.ndarray, b: np.ndarray, max_cost: int) -> np.ndarray:
+    # Find the pairs of matching elements between two long sequences: the elements occurring once on both sides are
+    # matched in bulk, then the gaps between them, which are usually short, are aligned one at a time
+    values_a, indices_a, counts_a = np.unique(a, return_index=True, return_counts=True)
+    values_b, indices_b, counts_b = np.unique(b, return_index=True, return_counts=True)
+    _, common_a, common_b = np.intersect1d(values_a[counts_a == 1], values_b[counts_b == 1], assume_unique=True,
+                                           return_indices=True)
+    positions_a = indices_a[counts_a == 1][common_a]
+    positions_b = indices_b[counts_b == 1][common_b]
+    order = np.argsort(positions_a)
+    positions_a, positions_b = positions_a[order], positions_b[order]
+
+    # Blocks are seldom moved around, so the matches are usually consistent already
+    if np.any(np.diff(positions_b) <= 0):
+        kept = _longest_increasing(positions_b.tolist())
+        positions_a, positions_b = positions_a[kept], positions_b[kept]
+
+    pairs = [np.stack((positions_a, positions_b), axis=1)]
+    lows_a = np.concatenate(([0], positions_a + 1))
+    lows_b = np.concatenate(([0], positions_b + 1))
+    lengths_a = np.concatenate((positions_a, [len(a)])) - lows_a
+    lengths_b = np.concatenate((positions_b, [len(b)])) - lows_b
+
+    # Gaps holding the same elements on both sides, such as repeated epilogues between two unique blocks, are matched
+    # in bulk as well
+    same = np.flatnonzero((lengths_a == lengths_b) & (lengths_a > 0))
+    if len(same) > 0:
+        lengths = lengths_a[same]
+        firsts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        steps = np.arange(lengths.sum()) - np.repeat(firsts, lengths)
+        indices_a = np.repeat(lows_a[same], lengths) + steps
+        indices_b = np.repeat(lows_b[same], lengths) + steps
+        equal = np.logical_and.reduceat(a[indices_a] == b[indices_b], firsts)
+        matched = np.repeat(equal, lengths)
+        pairs.append(np.stack((indices_a[matched], indices_b[matched]), axis=1))
+        lengths_a[same[equal]] = 0
+        lengths_b[same[equal]] = 0
+
+    for g in np.flatnonzero((lengths_a > 0) | (lengths_b > 0)).tolist():
+        low_a, high_a = int(lows_a[g]), int(lows_a[g] + lengths_a[g])
+        low_b, high_b = int(lows_b[g]), int(lows_b[g] + lengths_b[g])
+        gap = _patience(a[low_a:high_a].tolist(), b[low_b:high_b].tolist(), max_cost)
+        pairs.append(np.array(gap, dtype=np.int64).reshape(-1, 2) + np.array([low_a, low_b]))
+
+    pairs = np.concatenate(pairs).astype(np.int64)
+    return pairs[np.argsort(pairs[:, 0], kind='stable')]
+
+
+class SourceDiff:
+    """
+    The block-level differences between two versions of some code.
+
+    :ivar old: the fingerprint of the old version
+    :ivar new: the fingerprint of the new version
+    :ivar matches: the runs of matching blocks, one per row, made of the index of their first block in the old and in
+          the new version, and of their length
+    :ivar changes: the changes undergone by the blocks, in order of position
+    """
+
+    old: Fingerprint
+    new: Fingerprint
+    matches: np.ndarray
+    changes: List[BlockChange]
+
+    def __init__(self, old: Union[CodeFragment, Fingerprint], new: Union[CodeFragment, Fingerprint],
+                 max_cost: int = 1000):
+        """
+        Compute the differences between two versions of some code.
+
+        :param old: the old version, or its fingerprint
+        :param new: the new version, or its fingerprint
+        :param max_cost: the maximum number of changes sought between two matching blocks, beyond which all the blocks
+               in between are considered as changed
+        """
+
+        self.old = old if isinstance(old, Fingerprint) else Fingerprint(old)
+        self.new = new if isinstance(new, Fingerprint) else Fingerprint(new)
+        a, b = self.old.blocks, self.new.blocks
+
+        pairs = _align(a, b, max_cost)
+
+        # Group the matching pairs into runs
+        breaks = np.flatnonzero(np.any(np.diff(pairs, axis=0) != 1, axis=1)) + 1
+        run_starts = np.concatenate(([0], breaks)) if len(pairs) > 0 else np.empty(0, dtype=np.int64)
+        run_lengths = np.diff(np.concatenate((run_starts, [len(pairs)])))
+        self.matches = np.column_stack((pairs[run_starts], run_lengths)).astype(np.int64).reshape(-1, 3)
+
+        # Report the blocks between runs as changed
+        self.changes = []
+        previous_i, previous_j = 0, 0
+        for i, j, length in np.vstack((self.matches, [[len(a), len(b), 0]])).tolist():
+            deleted, inserted = i - previous_i, j - previous_j
+            for t in range(max(deleted, inserted)):
+                if t < deleted and t < inserted:
+                    self.changes.append(BlockChange(ChangeKind.MODIFIED, self.old.block_range(previous_i + t),
+                                                    self.new.block_range(previous_j + t)))
+                elif t < deleted:
+                    position = int(self.new.starts[j])
+                    self.changes.append(BlockChange(ChangeKind.DELETED, self.old.block_range(previous_i + t),
+                                                    (position, position)))
+                else:
+                    position = int(self.old.starts[i])
+                    self.changes.append(BlockChange(ChangeKind.INSERTED, (position, position),
+                                                    self.new.block_range(previous_j + t)))
+            previous_i, previous_j = i + length, j + length
+
+        # Index the matched lines and the changed ranges of the new version
+        self._old_lines = self.old.starts[self.matches[:, 0]]
+        self._new_lines = self.new.starts[self.matches[:, 1]]
+        self._old_ends = self.old.starts[self.matches[:, 0] + self.matches[:, 2]]
+        self._new_ends = self.new.starts[self.matches[:, 1] + self.matches[:, 2]]
+        self._changed_begins = np.array([c.new[0] - (c.kind is ChangeKind.DELETED) for c in self.changes],
+                                        dtype=np.int64)
+        self._changed_ends = np.maximum.accumulate(np.array([max(c.new[1], c.new[0] + 1) for c in self.changes],
+                                                            dtype=np.int64))
+
+    def map_line(self, line: int, reverse: bool = False) -> Optional[int]:
+        """
+        Map a line of the old version to the same line in the new one, or vice versa.
+
+        :param line: a line number
+        :param reverse: whether the line belongs to the new version, and should be mapped to the old one
+        :return: the mapped line, or None if the line belongs to a changed block or falls outside the code
+        """
+
+        begins, ends, targets = (self._new_lines, self._new_ends, self._old_lines) if reverse else \
+            (self._old_lines, self._old_ends, self._new_lines)
+        run = int(np.searchsorted(begins, line, side='right')) - 1
+        if run < 0 or line >= ends[run]:
+            return None
+
+        return int(line - begins[run] + targets[run])
+
+    def changed(self, begin: int, end: int) -> bool:
+        """
+        Check whether a range of lines of the new version has been affected by any change.
+
+        A deletion affects the ranges containing the lines right before and right after it.
+
+        :param begin: the first line of the range
+        :param end: the line ending the range, excluded
+        :return: True if any block inside the range has been inserted or modified, or if a block has been deleted from
+                 it, False otherwise
+        """
+
+        last = int(np.searchsorted(self._changed_begins, end, side='left')) - 1
+        return last >= 0 and bool(self._changed_ends[last] > begin)
+
+
+def diff(old: Union[CodeFragment, Fingerprint], new: Union[CodeFragment, Fingerprint], max_cost: int = 1000) \
+        -> SourceDiff:
+    """
+    Compute the block-level differences between two versions of some code.
+
+    :param old: the old version, or its fingerprint
+    :param new: the new version, or its fingerprint
+    :param max_cost: the maximum number of changes sought between two matching blocks, beyond which all the blocks in
+           between are considered as changed
+    :return: the differences
+    """
+
+    return SourceDiff(old, new, max_cost)
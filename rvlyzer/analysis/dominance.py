@@ -0,0 +1,357 @@
+"""
+This module provides dominance information for CFGs.
+
+A node `a` dominates a node `b` if every execution path going from the entry-point to `b` traverses `a`. Symmetrically,
+`a` post-dominates `b` if every path going from `b` to an exit traverses `a`. Dominator trees are computed through the
+iterative algorithm by Cooper, Harvey and Kennedy, which is near-linear on the kind of graphs produced by compilers, and
+are numbered by a depth-first visit so that dominance checks can be answered in constant time.
+
+Trees are cached on the graph they have been computed for, so that multiple analyses can share them. Cached trees hold
+no reference to their graph, which can thus be garbage-collected along with its trees. Since NetworkX graphs do not
+notify their modifications, the cache of a graph must be explicitly invalidated through :func:`invalidate_dominance`
+after altering its structure; graphs that are only analyzed once can skip the cache altogether.
+"""
+
+from __future__ import annotations
+
+from typing import Hashable, List, Optional, Mapping, FrozenSet, Iterable, Union, Callable, Iterator, Dict, Tuple, \
+    MutableMapping, Sequence
+from weakref import WeakKeyDictionary
+
+from networkx import DiGraph
+
+from analysis.graphs import LocalGraph
+
+
+class _VirtualNode:
+    # Singleton type of the node that joins multiple entry-points (or exits) under a single root
+
+    def __repr__(self):
+        return 'VIRTUAL_ROOT'
+
+    def __reduce__(self):
+        return 'VIRTUAL_ROOT'
+
+
+VIRTUAL_ROOT: Hashable = _VirtualNode()
+"""The synthetic root of dominator trees computed over multiple entry-points (or post-dominator trees over multiple
+exits)."""
+
+
+class DominatorTree:
+    """
+    A dominator (or post-dominator) tree.
+
+    Only nodes reachable from the root (or, for post-dominator trees, reaching some exit) take part in the tree. When
+    the tree has been computed starting from more than one node, these are connected to the synthetic `VIRTUAL_ROOT`
+    node, which becomes the root of the tree.
+
+    :ivar root: the root of the tree
+    :ivar idom: a mapping from each node to its immediate dominator, with the root mapped to None
+    :ivar post: whether this is a post-dominator tree
+    """
+
+    root: Hashable
+    idom: Mapping[Hashable, Optional[Hashable]]
+    post: bool
+
+    def __init__(self,
+                 root: Hashable,
+                 idom: Mapping[Hashable, Optional[Hashable]],
+                 predecessors: Mapping[Hashable, Sequence[Hashable]],
+                 post: bool):
+        """
+        Construct a dominator tree out of its immediate dominators.
+
+        :param root: the root of the tree
+        :param idom: the immediate dominators of all the nodes in the tree
+        :param predecessors: the predecessors of each node of the tree in the direction of the analysis, restricted to
+                             the tree's nodes, used for computing the dominance frontiers
+        :param post: whether the tree represents post-dominance
+        """
+
+        self.root = root
+        self.idom = idom
+        self.post = post
+        self._predecessors = predecessors
+        self._frontiers: Optional[Dict[Hashable, FrozenSet[Hashable]]] = None
+
+        self._children: Dict[Hashable, List[Hashable]] = {n: [] for n in idom}
+        for n, d in idom.items():
+            if d is not None:
+                self._children[d].append(n)
+
+        # Number the tree's nodes with a depth-first visit, so that a node's descendants fall inside its interval
+        self._pre: Dict[Hashable, int] = {}
+        self._last: Dict[Hashable, int] = {}
+        stack: List[Tuple[Hashable, Iterator[Hashable]]] = [(root, iter(self._children[root]))]
+        self._pre[root] = 0
+        counter = 1
+        while len(stack) > 0:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                self._last[node] = counter - 1
+                stack.pop()
+            else:
+                self._pre[child] = counter
+                counter += 1
+                stack.append((child, iter(self._children[child])))
+
+    def children(self, node: Hashable) -> List[Hashable]:
+        """
+        Return the nodes immediately dominated by the given one.
+
+        :param node: a node of the tree
+        :return: the node's children
+        """
+
+        return list(self._children[node])
+
+    def dominators(self, node: Hashable) -> Iterator[Hashable]:
+        """
+        Iterate over the dominators of a node, starting from the node itself and climbing up to the root.
+
+        :param node: a node of the tree
+        :return: an iterator over the node's dominators
+        """
+
+        while node is not None:
+            yield node
+            node = self.idom[node]
+
+    def dominates(self, a: Hashable, b: Hashable) -> bool:
+        """
+        Check whether `a` dominates `b`, in constant time.
+
+        Every node dominates itself. Nodes that are not part of the tree neither dominate nor are dominated.
+
+        :param a: the candidate dominator
+        :param b: the candidate dominated node
+        :return: True if a dominates b, False otherwise
+        """
+
+        if a not in self._pre or b not in self._pre:
+            return False
+
+        return self._pre[a] <= self._pre[b] <= self._last[a]
+
+    def strictly_dominates(self, a: Hashable, b: Hashable) -> bool:
+        return a != b and self.dominates(a, b)
+
+    def frontier(self, node: Hashable) -> FrozenSet[Hashable]:
+        """
+        Return the dominance frontier of a node.
+
+        The dominance frontier of `a` is the set of nodes `b` such that `a` dominates a predecessor of `b`, but does not
+        strictly dominate `b` itself. For post-dominator trees, this is the post-dominance frontier, i.e. the set of
+        nodes on which `a` is control-dependent.
+
+        All the frontiers are computed the first time one of them is requested.
+
+        :param node: a node of the tree
+        :return: the dominance frontier of the node
+        """
+
+        if self._frontiers is None:
+            frontiers: Dict[Hashable, set] = {n: set() for n in self.idom}
+            for n in self.idom:
+                preds = self._predecessors[n]
+                # Only join points can be part of a frontier. The root counts as one whenever it has a predecessor,
+                # since execution also enters it from the outside.
+                if len(preds) < 2 and (n != self.root or len(preds) == 0):
+                    continue
+
+                for p in preds:
+                    runner = p
+                    while runner != self.idom[n] and runner is not None:
+                        frontiers[runner].add(n)
+                        runner = self.idom[runner]
+
+            self._frontiers = {n: frozenset(f) for n, f in frontiers.items()}
+
+        return self._frontiers[node]
+
+    def __contains__(self, node: Hashable) -> bool:
+        return node in self.idom
+
+    def __len__(self) -> int:
+        return len(self.idom)
+
+    def __repr__(self):
+        return "DominatorTree(root=" + repr(self.root) + ", nodes=" + repr(len(self)) + \
+            ", post=" + repr(self.post) + ")"
+
+
+def _immediate_dominators(roots: List[Hashable],
+                          successors: Callable[[Hashable], Iterable[Hashable]],
+                          predecessors: Callable[[Hashable], Iterable[Hashable]]) \
+        -> Tuple[Hashable, Dict[Hashable, Optional[Hashable]], Dict[Hashable, List[Hashable]]]:
+    # Cooper-Harvey-Kennedy algorithm. A virtual root is introduced when multiple roots are supplied, so the adjacency
+    # functions are wrapped accordingly. The reachable predecessors of every reachable node are returned alongside the
+    # results, so that the graph needs not be consulted anymore.
+    if len(roots) == 1:
+        root = roots[0]
+        root_successors = successors
+    else:
+        root = VIRTUAL_ROOT
+
+        def root_successors(n: Hashable) -> Iterable[Hashable]:
+            return roots if n is VIRTUAL_ROOT else successors(n)
+
+    # Compute a post-order numbering through an iterative depth-first visit
+    postorder: List[Hashable] = []
+    number: Dict[Hashable, int] = {root: -1}
+    stack = [(root, iter(root_successors(root)))]
+    while len(stack) > 0:
+        node, succ = stack[-1]
+        nxt = next(succ, None)
+        if nxt is None:
+            number[node] = len(postorder)
+            postorder.append(node)
+            stack.pop()
+        elif nxt not in number:
+            number[nxt] = -1
+            stack.append((nxt, iter(root_successors(nxt))))
+
+    def root_predecessors(n: Hashable) -> Iterable[Hashable]:
+        if root is VIRTUAL_ROOT:
+            if n is VIRTUAL_ROOT:
+                return []
+            elif n in roots:
+                return [VIRTUAL_ROOT, *predecessors(n)]
+        return predecessors(n)
+
+    # Cache the reachable predecessors of every node, so that the iterations don't have to filter them again
+    reverse_postorder = postorder[-2::-1]
+    reachable_predecessors = {n: [p for p in root_predecessors(n) if p in number] for n in postorder}
+    preds = {n: [number[p] for p in reachable_predecessors[n]] for n in reverse_postorder}
+
+    doms: List[int] = [-1] * len(postorder)
+    doms[number[root]] = number[root]
+    changed = True
+    while changed:
+        changed = False
+        for n in reverse_postorder:
+            new_idom = -1
+            for p in preds[n]:
+                if doms[p] == -1:
+                    continue
+                if new_idom == -1:
+                    new_idom = p
+                else:
+                    # Intersect the two dominator chains, climbing up through post-order numbers
+                    f1, f2 = p, new_idom
+                    while f1 != f2:
+                        while f1 < f2:
+                            f1 = doms[f1]
+                        while f2 < f1:
+                            f2 = doms[f2]
+                    new_idom = f1
+
+            b = number[n]
+            if doms[b] != new_idom:
+                doms[b] = new_idom
+                changed = True
+
+    idom = {postorder[i]: postorder[d] for i, d in enumerate(doms)}
+    idom[root] = None
+
+    return root, idom, reachable_predecessors
+
+
+_trees_cache: MutableMapping[DiGraph, Dict[Tuple[bool, Tuple[Hashable, ...]], DominatorTree]] = WeakKeyDictionary()
+
+
+def _tree(graph: DiGraph, roots: List[Hashable], post: bool) -> DominatorTree:
+    if post:
+        successors, predecessors = graph.predecessors, graph.successors
+    else:
+        successors, predecessors = graph.successors, graph.predecessors
+
+    root, idom, tree_predecessors = _immediate_dominators(roots, successors, predecessors)
+    return DominatorTree(root, idom, tree_predecessors, post)
+
+
+def _cached_tree(graph: DiGraph, roots: List[Hashable], post: bool, cache: bool) -> DominatorTree:
+    if not cache:
+        return _tree(graph, roots, post)
+
+    trees = _trees_cache.setdefault(graph, {})
+    key = post, tuple(roots)
+    if key not in trees:
+        trees[key] = _tree(graph, roots, post)
+
+    return trees[key]
+
+
+def dominator_tree(cfg: Union[LocalGraph, DiGraph],
+                   entries: Optional[Iterable[Hashable]] = None,
+                   cache: bool = True) -> DominatorTree:
+    """
+    Compute (or retrieve from the cache) the dominator tree of a CFG.
+
+    If no entry-point is specified, the entry-points of a local graph, or the nodes of a digraph having no incoming
+    edges, are used.
+
+    :param cfg: a local graph or a NetworkX CFG
+    :param entries: the nodes from which execution starts
+    :param cache: whether the tree should be retrieved from, or stored into, the cache of the CFG
+    :return: the dominator tree of the CFG
+    :raise ValueError: when no entry-point can be found
+    """
+
+    graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+    if entries is None:
+        if isinstance(cfg, LocalGraph):
+            entries = cfg.entry_point_ids
+        else:
+            entries = (n for n in graph.nodes if graph.in_degree(n) == 0)
+
+    roots = list(entries)
+    if len(roots) == 0:
+        raise ValueError("No entry-point to start from")
+
+    return _cached_tree(graph, roots, False, cache)
+
+
+def post_dominator_tree(cfg: Union[LocalGraph, DiGraph],
+                        exits: Optional[Iterable[Hashable]] = None,
+                        cache: bool = True) -> DominatorTree:
+    """
+    Compute (or retrieve from the cache) the post-dominator tree of a CFG.
+
+    If no exit is specified, the terminal nodes of a local graph, or the nodes of a digraph having no outgoing edges,
+    are used.
+
+    :param cfg: a local graph or a NetworkX CFG
+    :param exits: the nodes from which execution leaves the CFG
+    :param cache: whether the tree should be retrieved from, or stored into, the cache of the CFG
+    :return: the post-dominator tree of the CFG
+    :raise ValueError: when no exit can be found
+    """
+
+    graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+    if exits is None:
+        if isinstance(cfg, LocalGraph):
+            exits = cfg.terminal_nodes_ids
+        else:
+            exits = (n for n in graph.nodes if graph.out_degree(n) == 0)
+
+    roots = list(exits)
+    if len(roots) == 0:
+        raise ValueError("No exit to start from")
+
+    return _cached_tree(graph, roots, True, cache)
+
+
+def invalidate_dominance(cfg: Union[LocalGraph, DiGraph]) -> None:
+    """
+    Discard the cached dominator and post-dominator trees of a CFG.
+
+    This function must be called after modifying the structure of a graph whose trees have already been computed.
+
+    :param cfg: a local graph or a NetworkX CFG
+    """
+
+    _trees_cache.pop(cfg.graph if isinstance(cfg, LocalGraph) else cfg, None)
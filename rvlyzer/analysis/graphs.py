@@ -1,14 +1,14 @@
 from __future__ import annotations
 
+from collections import deque
 from enum import Enum
 from itertools import chain, tee, repeat
 from operator import attrgetter
 from typing import FrozenSet, List, Tuple, Optional, Mapping, Hashable, Iterable, MutableMapping, \
-    NamedTuple, Dict, Union
+    NamedTuple, Dict, Union, Deque, Iterator, Callable, Set
 
-from networkx import DiGraph, simple_cycles, restricted_view, all_simple_paths, relabel_nodes, dfs_preorder_nodes, \
-    Graph
-from networkx.classes.graphviews import subgraph_view
+from networkx import DiGraph, restricted_view, relabel_nodes, dfs_preorder_nodes, Graph, \
+    strongly_connected_components, immediate_dominators
 from networkx.utils import generate_unique_node
 
 from rep.base import Instruction, to_line_iterator
@@ -331,9 +331,12 @@ def basic_blocks(code: CodeFragment) -> List[BasicBlock]:
     :raise InvalidCodeError: when the provided code fragment has no label or no outgoing jump
     """
 
-    # Identify the block boundaries, that is: those lines marked by a label or containing a control transfer instruction
-    block_boundaries = filter(lambda asl: isinstance(asl.statement, Instruction)
-                                          and (asl.statement.opcode in jump_ops or len(asl.statement.labels) > 0),
+    # Identify the block boundaries, that is: those lines marked by a label or containing a control transfer
+    # instruction. Labels may also be attached to directives, as it happens to the `.cfi_startproc` that follows a
+    # procedure's label.
+    block_boundaries = filter(lambda asl: len(asl.statement.labels) > 0
+                                          or (isinstance(asl.statement, Instruction)
+                                              and asl.statement.opcode in jump_ops),
                               # Use a line-oriented iterator, so that we can extract the line numbers
                               to_line_iterator(iter(code), code.begin))
 
@@ -342,7 +345,8 @@ def basic_blocks(code: CodeFragment) -> List[BasicBlock]:
     # TODO find a more elegant way to remove duplicates online
     cutoff_points = dict()
     for boundary in block_boundaries:
-        if len(boundary.statement.labels) > 0 and boundary.statement.opcode in jump_ops:
+        if len(boundary.statement.labels) > 0 and isinstance(boundary.statement, Instruction) \
+                and boundary.statement.opcode in jump_ops:
             # For a labeled line that also contains a jump, record two cut-points so that a single-line block can be
             # created.
             cutoff_points[boundary.number] = None
@@ -475,21 +479,243 @@ def internalize_calls(cfg: LocalGraph) -> LocalGraph:
     return cfg.merge(external)
 
 
+class _ProcedureTemplate(NamedTuple):
+    # The component visited from a procedure's entry-point, expressed in terms of positions inside the `nodes` list.
+    # The entry-point is always found at position 0. Call edges are kept apart, so that they can be expanded upon
+    # instantiation.
+
+    nodes: List[Hashable]
+    edges: List[Tuple[int, int, Dict]]
+    calls: List[Tuple[int, int, str]]
+    tails: List[int]
+
+
+class _ProcedureTemplates:
+    # A lazily-populated cache of the templates of a local graph's procedures, keyed by entry-point
+
+    def __init__(self, cfg: LocalGraph):
+        self.cfg = cfg
+        self.symbols = cfg.get_symbol_table()
+
+        self._templates: Dict[Hashable, _ProcedureTemplate] = {}
+        self._closures: Dict[Hashable, FrozenSet[str]] = {}
+
+    def template(self, source: Hashable) -> _ProcedureTemplate:
+        if source not in self._templates:
+            graph = self.cfg.graph
+            nodes = list(dfs_preorder_nodes(graph, source))
+            position = {n: i for i, n in enumerate(nodes)}
+
+            edges, calls, tails = [], [], []
+            for i, n in enumerate(nodes):
+                successors = graph.adj[n]
+                if len(successors) == 0:
+                    tails.append(i)
+
+                for m, data in successors.items():
+                    if data['kind'] == Transition.CALL:
+                        calls.append((i, position[m], data['callee']))
+                    else:
+                        edges.append((i, position[m], data))
+
+            self._templates[source] = _ProcedureTemplate(nodes, edges, calls, tails)
+
+        return self._templates[source]
+
+    def closure(self, source: Hashable) -> FrozenSet[str]:
+        # Collect the labels of all the procedures that may be reached through calls, starting from the source
+        if source not in self._closures:
+            labels = set()
+            visited = {source}
+            stack = [source]
+            while len(stack) > 0:
+                proc = stack.pop()
+                labels.update(self.cfg.graph.nodes[proc]['labels'])
+                for _, _, callee_label in self.template(proc).calls:
+                    callee = self.symbols[callee_label]
+                    if callee not in visited:
+                        visited.add(callee)
+                        stack.append(callee)
+
+            self._closures[source] = frozenset(labels)
+
+        return self._closures[source]
+
+
+class ExpansionReport(NamedTuple):
+    """
+    A summary of the call expansions performed while building an execution graph.
+
+    The omitted nodes and edges are those that the collapsed procedures would have contributed by themselves, without
+    accounting for their nested calls. Therefore, they represent a lower bound of the truncated portion of the graph.
+
+    :var expanded_calls: the number of calls whose procedure has been attached to the execution graph
+    :var collapsed_calls: the number of calls collapsed into a summary node because of the size or depth limits
+    :var omitted_nodes: the number of nodes belonging to the collapsed procedures
+    :var omitted_edges: the number of edges belonging to the collapsed procedures
+    """
+
+    expanded_calls: int
+    collapsed_calls: int
+    omitted_nodes: int
+    omitted_edges: int
+
+
+# A call site waiting for expansion: callee, ignored calls, depth, caller and confluence point in the execution graph
+_PendingCall = Tuple[Hashable, FrozenSet[str], int, Hashable, Hashable]
+
+
+class _CallExpander:
+    # Scratchpad used by exec_graph() for building an execution graph, caching procedure templates along the way
+
+    def __init__(self,
+                 cfg: LocalGraph,
+                 share_subgraphs: bool,
+                 max_nodes: Optional[int],
+                 max_edges: Optional[int],
+                 max_depth: Optional[int]):
+        self.cfg = cfg
+        self.procedures = _ProcedureTemplates(cfg)
+        self.share_subgraphs = share_subgraphs
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+        self.max_depth = max_depth
+        self.graph = DiGraph()
+
+        self._shared: Dict[Tuple[Hashable, FrozenSet[str]], Tuple[Hashable, List[Hashable]]] = {}
+        # Nested instances are identified by this token, paired with an ever-increasing offset
+        self._token = generate_unique_node()
+        self._next_id = 0
+
+        # NetworkX counts edges in linear time, so keep track of them here
+        self._edge_count = 0
+        self._expanded = 0
+        self._collapsed = 0
+        self._omitted_nodes = 0
+        self._omitted_edges = 0
+
+    @property
+    def report(self) -> ExpansionReport:
+        return ExpansionReport(self._expanded, self._collapsed, self._omitted_nodes, self._omitted_edges)
+
+    def _summarize(self, source: Hashable, truncated: bool) -> Tuple[Hashable, List[Hashable]]:
+        # The node will have a synthetic ID 'call{<call destination>, <unique ID>}', and will carry the original labels
+        summary = 'call{' + str(source) + ', ' + generate_unique_node() + '}'
+        if truncated:
+            self.graph.add_node(summary, labels=self.cfg.graph.nodes[source]['labels'], external=True, truncated=True)
+        else:
+            self.graph.add_node(summary, labels=self.cfg.graph.nodes[source]['labels'], external=True)
+
+        return summary, [summary]
+
+    def _exceeds_limits(self, template: _ProcedureTemplate, depth: int) -> bool:
+        node_cost = len(template.nodes)
+        # Count the call edge and the return edges, too
+        edge_cost = len(template.edges) + 1 + len(template.tails)
+
+        return (self.max_depth is not None and depth > self.max_depth) or \
+               (self.max_nodes is not None and len(self.graph) + node_cost > self.max_nodes) or \
+               (self.max_edges is not None and self._edge_count + edge_cost > self.max_edges)
+
+    def _attach(self,
+                source: Hashable,
+                ignore_calls: FrozenSet[str],
+                depth: int,
+                pending: Deque[_PendingCall]) -> Tuple[Hashable, List[Hashable]]:
+        # Attach an instance of the source's execution sub-graph, returning its head and tails. The call sites found
+        # inside the instance are appended to the pending queue.
+        source_labels = self.cfg.graph.nodes[source]['labels']
+
+        # If one of the entry-point's labels is in the ignore set, emit a node summarizing the call
+        if not ignore_calls.isdisjoint(source_labels):
+            return self._summarize(source, False)
+
+        if self.share_subgraphs:
+            # Only the ignored labels that may actually be encountered influence the shape of the instance
+            key = source, ignore_calls.intersection(self.procedures.closure(source))
+            if key in self._shared:
+                return self._shared[key]
+
+        template = self.procedures.template(source)
+        root = depth == 0
+        if not root and self._exceeds_limits(template, depth):
+            # Out of budget: collapse the call into a summary node
+            self._collapsed += 1
+            self._omitted_nodes += len(template.nodes)
+            self._omitted_edges += len(template.edges) + len(template.calls)
+            return self._summarize(source, True)
+
+        if root:
+            ids = template.nodes
+        else:
+            # Instantiate the template by offsetting its positions
+            self._expanded += 1
+            base = self._next_id
+            self._next_id += len(template.nodes)
+            ids = [(self._token, base + i) for i in range(len(template.nodes))]
+
+        graph = self.cfg.graph
+        self.graph.add_nodes_from((ids[i], graph.nodes[n]) for i, n in enumerate(template.nodes))
+        self.graph.add_edges_from((ids[u], ids[v], data) for u, v, data in template.edges)
+        self._edge_count += len(template.edges)
+
+        instance = ids[0], [ids[t] for t in template.tails]
+        if self.share_subgraphs:
+            self._shared[key] = instance
+
+        nested_ignore = ignore_calls.union(source_labels)
+        pending.extend((self.procedures.symbols[callee], nested_ignore, depth + 1, ids[caller], ids[confluence])
+                       for caller, confluence, callee in template.calls)
+
+        return instance
+
+    def expand(self, source: Hashable, ignore_calls: FrozenSet[str]) -> None:
+        # Calls are expanded breadth-first, so that the budget is spent on the shallowest ones
+        pending = deque()
+        self._attach(source, ignore_calls, 0, pending)
+
+        while len(pending) > 0:
+            callee, nested_ignore, depth, caller, confluence = pending.popleft()
+            # Connect the called procedure's component through call and return edges
+            head, tails = self._attach(callee, nested_ignore, depth, pending)
+            self.graph.add_edge(caller, head, kind=Transition.CALL)
+            self.graph.add_edges_from(zip(tails, repeat(confluence)), kind=Transition.RETURN)
+            self._edge_count += 1 + len(tails)
+
+
 def exec_graph(cfg: LocalGraph,
                entry_point: Union[str, Hashable],
-               ignore_calls: FrozenSet[str] = frozenset()) -> DiGraph:
+               ignore_calls: FrozenSet[str] = frozenset(),
+               share_subgraphs: bool = False,
+               max_nodes: Optional[int] = None,
+               max_edges: Optional[int] = None,
+               max_depth: Optional[int] = None) -> DiGraph:
     """
     Given a local CFG and an entry-point, return the graph of the node visits performed by the execution flow.
 
-    The procedure consists in a recursive, depth-first visit of sub-graphs, starting from the initial node and repeating
-    itself for every `CALL` arc encountered. Given their nasty nature, recursive calls are not expanded; instead, they
-    are represented by special nodes with IDs of the form `call{<call destination>, <unique ID>}`.
+    The procedure consists in a visit of sub-graphs, starting from the initial node and repeating itself for every
+    `CALL` arc encountered. Given their nasty nature, recursive calls are not expanded; instead, they are represented by
+    special nodes with IDs of the form `call{<call destination>, <unique ID>}`.
 
     The user can specify additional calls that mustn't be expanded.
 
-    Different calls to the same procedure result in differently-labeled sub-graphs being attached, so the resulting
-    graph is more a substantiation of the execution paths than a sub-graph of the original CFG. As a consequence, don't
-    expect a one-to-one correspondence between the CFG's nodes and the one in the execution graph.
+    Every procedure is visited only once: the visited component is memoized as a template and instantiated at each call
+    site. Different calls to the same procedure result in differently-labeled sub-graphs being attached, so the
+    resulting graph is more a substantiation of the execution paths than a sub-graph of the original CFG. As a
+    consequence, don't expect a one-to-one correspondence between the CFG's nodes and the one in the execution graph.
+    Nodes reached from the entry-point keep their original IDs, while nodes of the attached sub-graphs are identified by
+    tuples made of a token, unique to the invocation, and an integer offset.
+
+    When `share_subgraphs` is set, calls to the same procedure that would produce identical sub-graphs are all connected
+    to a single instance, whose terminal nodes return to every confluence point. The result is considerably smaller for
+    deep call trees, at the cost of merging the execution paths flowing through the shared procedures.
+
+    The size of the result can be bounded by specifying a maximum number of nodes and edges, and a maximum call depth.
+    Calls are expanded breadth-first, without recurring; those that would exceed the limits are collapsed into summary
+    nodes similar to the ones used for recursive calls, but also marked with a `truncated` attribute. Since summary
+    nodes are needed to keep the execution flow connected, the limits may be exceeded by one node and two edges for each
+    collapsed call. The component visited from the entry-point is always included. A summary of the performed expansions
+    is stored in the returned graph's attributes, as an `ExpansionReport` under the `expansion` key.
 
     Terminal nodes reachability is guaranteed only if the graph is well formed and any external call reached by the
     execution flow has been internalized, if not explicitly set as ignored.
@@ -497,49 +723,244 @@ def exec_graph(cfg: LocalGraph,
     :param cfg: a CFG description of some code
     :param entry_point: an entry-point specification for the CFG, either as a node ID or as a symbolic label
     :param ignore_calls: a set of calls that won't be expanded into sub-graphs
+    :param share_subgraphs: whether call sites should reference a single instance of each called procedure
+    :param max_nodes: the maximum number of nodes of the execution graph, or None for no limit
+    :param max_edges: the maximum number of edges of the execution graph, or None for no limit
+    :param max_depth: the maximum depth of the expanded calls, or None for no limit
     :return: a directed graph representing the execution starting from the specified entry-point
     """
 
     # Get the entry-point ID
     source = entry_point if entry_point in cfg.entry_point_ids else cfg.get_symbol_table()[entry_point]
-    source_labels = cfg.graph.nodes[source]['labels']
-
-    # If one of the entry-point's labels is in the ignore set, return a node summarizing the call
-    if not ignore_calls.isdisjoint(source_labels):
-        res = DiGraph()
-        # The node will have a synthetic ID 'call{<call destination>, <unique ID>}', and will carry the original labels.
-        res.add_node('call{' + str(source) + ', ' + generate_unique_node() + '}', labels=source_labels, external=True)
-        return res
-
-    # Traverse the subtree rooted at the entry-point and collect the visited nodes
-    visited_nodes = frozenset(dfs_preorder_nodes(cfg.graph, source))
-    # Produce a view of the visited component
-    visited_component: Graph = subgraph_view(cfg.graph, lambda n: n in visited_nodes)
-
-    # Initialize the returned graph with the contents of the visited component
-    res = DiGraph()
-    res.update(visited_component)
-
-    # Iterate over the CALL edges inside the visited component
-    for edge in filter(lambda e: visited_component.edges[e]['kind'] == Transition.CALL, visited_component.edges):
-        # Recursively compute the component of the called procedures
-        nested_component = exec_graph(cfg,
-                                      visited_component.edges[edge]['callee'],
-                                      ignore_calls.union(source_labels))
-        # Add the nested component to the result, avoiding ID clashes
-        relabel_nodes(nested_component, solve_graph_collision(res, nested_component), False)
-        res.update(nested_component)
-
-        # Take the root of the sub-component and its terminal nodes
-        head = next(filter(lambda n: nested_component.in_degree(n) == 0, nested_component.nodes))
-        tail = filter(lambda n: nested_component.out_degree(n) == 0, nested_component.nodes)
-
-        # Substitute the original edge with call and return edges toward/from the sub-component
-        res.remove_edge(*edge)
-        res.add_edge(edge[0], head, kind=Transition.CALL)
-        res.add_edges_from(zip(tail, repeat(edge[1])), kind=Transition.RETURN)
-
-    return res
+
+    expander = _CallExpander(cfg, share_subgraphs, max_nodes, max_edges, max_depth)
+    expander.expand(source, ignore_calls)
+    expander.graph.graph['expansion'] = expander.report
+
+    return expander.graph
+
+
+class ExecNode(NamedTuple):
+    """
+    A node of an execution flow, as produced by the streaming functions.
+
+    Execution nodes are identified by the CFG node they instantiate and by their calling context, i.e. the CFG IDs of
+    the callers that have been traversed to reach them, outermost first. Summary nodes stand for calls that have not
+    been expanded, and carry the ID of the called procedure's entry-point.
+
+    :var context: the chain of callers leading to this node
+    :var node: the ID of the instantiated CFG node
+    :var summary: whether this node summarizes a call that has not been expanded
+    """
+
+    context: Tuple[Hashable, ...]
+    node: Hashable
+    summary: bool = False
+
+
+class ExecEdge(NamedTuple):
+    """
+    An edge of an execution flow, as produced by the streaming functions.
+
+    :var source: the execution node from which the edge departs
+    :var target: the execution node the edge points at
+    :var kind: the transition kind represented by the edge
+    """
+
+    source: ExecNode
+    target: ExecNode
+    kind: Transition
+
+
+# A predicate deciding whether a call site, given its caller and the callee's name, should be expanded
+Descent = Callable[[ExecNode, str], bool]
+
+
+class _Descend(NamedTuple):
+    # Request for the streaming driver to enter a procedure instance
+
+    source: Hashable
+    context: Tuple[Hashable, ...]
+    ignore_calls: FrozenSet[str]
+
+
+def _instance_events(procedures: _ProcedureTemplates,
+                     source: Hashable,
+                     context: Tuple[Hashable, ...],
+                     ignore_calls: FrozenSet[str],
+                     descend: Optional[Descent]) -> Iterator[Union[ExecNode, ExecEdge, _Descend]]:
+    # Produce the nodes and edges of a procedure instance, requesting the descent into every expanded call
+    graph = procedures.cfg.graph
+    template = procedures.template(source)
+    nodes = [ExecNode(context, n) for n in template.nodes]
+
+    yield from nodes
+    for u, v, data in template.edges:
+        yield ExecEdge(nodes[u], nodes[v], data['kind'])
+
+    nested_ignore = ignore_calls.union(graph.nodes[source]['labels'])
+    for caller, confluence, callee in template.calls:
+        callee_entry = procedures.symbols[callee]
+        inner_context = context + (template.nodes[caller],)
+
+        if not nested_ignore.isdisjoint(graph.nodes[callee_entry]['labels']) or \
+                (descend is not None and not descend(nodes[caller], callee)):
+            summary = ExecNode(inner_context, callee_entry, True)
+            yield summary
+            yield ExecEdge(nodes[caller], summary, Transition.CALL)
+            yield ExecEdge(summary, nodes[confluence], Transition.RETURN)
+        else:
+            callee_template = procedures.template(callee_entry)
+            yield ExecEdge(nodes[caller], ExecNode(inner_context, callee_entry), Transition.CALL)
+            # The driver emits the whole callee instance before resuming here
+            yield _Descend(callee_entry, inner_context, nested_ignore)
+            for t in callee_template.tails:
+                yield ExecEdge(ExecNode(inner_context, callee_template.nodes[t]), nodes[confluence], Transition.RETURN)
+
+
+def _exec_events(cfg: LocalGraph,
+                 entry_point: Union[str, Hashable],
+                 ignore_calls: FrozenSet[str],
+                 descend: Optional[Descent]) -> Iterator[Union[ExecNode, ExecEdge]]:
+    procedures = _ProcedureTemplates(cfg)
+    source = entry_point if entry_point in cfg.entry_point_ids else procedures.symbols[entry_point]
+
+    if not ignore_calls.isdisjoint(cfg.graph.nodes[source]['labels']):
+        yield ExecNode((), source, True)
+        return
+
+    # Keep a stack of instance generators, one for every procedure being traversed
+    stack = [_instance_events(procedures, source, (), ignore_calls, descend)]
+    while len(stack) > 0:
+        event = next(stack[-1], None)
+        if event is None:
+            stack.pop()
+        elif isinstance(event, _Descend):
+            stack.append(_instance_events(procedures, event.source, event.context, event.ignore_calls, descend))
+        else:
+            yield event
+
+
+def exec_nodes(cfg: LocalGraph,
+               entry_point: Union[str, Hashable],
+               ignore_calls: FrozenSet[str] = frozenset(),
+               descend: Optional[Descent] = None) -> Iterator[ExecNode]:
+    """
+    Lazily produce the nodes of the execution flow starting at the given entry-point.
+
+    This is the streaming counterpart of :func:`exec_graph`: the same nodes are produced, one procedure instance at a
+    time, but nothing is retained once they have been handed over to the consumer. Calls are expanded only when the
+    iteration reaches them, and only if the optional `descend` predicate agrees; memory usage is proportional to the
+    depth of the call stack being traversed, plus the (cached) shape of the visited procedures.
+
+    :param cfg: a CFG description of some code
+    :param entry_point: an entry-point specification for the CFG, either as a node ID or as a symbolic label
+    :param ignore_calls: a set of calls that won't be expanded
+    :param descend: an optional predicate that decides, given the caller and the callee's name, whether a call should
+                    be expanded
+    :return: an iterator over the execution nodes
+    """
+
+    return filter(lambda ev: isinstance(ev, ExecNode), _exec_events(cfg, entry_point, ignore_calls, descend))
+
+
+def exec_edges(cfg: LocalGraph,
+               entry_point: Union[str, Hashable],
+               ignore_calls: FrozenSet[str] = frozenset(),
+               descend: Optional[Descent] = None) -> Iterator[ExecEdge]:
+    """
+    Lazily produce the edges of the execution flow starting at the given entry-point.
+
+    Edges are produced one procedure instance at a time. The `CALL` edge leading into an expanded procedure is
+    immediately followed by the callee's edges, and then by the `RETURN` edges that lead back to the confluence point.
+    See :func:`exec_nodes` for the meaning of the parameters.
+
+    :param cfg: a CFG description of some code
+    :param entry_point: an entry-point specification for the CFG, either as a node ID or as a symbolic label
+    :param ignore_calls: a set of calls that won't be expanded
+    :param descend: an optional predicate deciding whether a call should be expanded
+    :return: an iterator over the execution edges
+    """
+
+    return filter(lambda ev: isinstance(ev, ExecEdge), _exec_events(cfg, entry_point, ignore_calls, descend))
+
+
+def _call_site(graph: DiGraph, caller: Hashable) -> Tuple[str, Hashable]:
+    # Return the callee and the confluence point of the call performed by the given node
+    return next((data['callee'], dst) for dst, data in graph.adj[caller].items() if data['kind'] == Transition.CALL)
+
+
+def exec_paths(cfg: LocalGraph,
+               entry_point: Union[str, Hashable],
+               ignore_calls: FrozenSet[str] = frozenset(),
+               descend: Optional[Descent] = None) -> Iterator[List[ExecNode]]:
+    """
+    Lazily enumerate the call-expanded execution paths starting at the given entry-point.
+
+    Each path is a list of execution nodes leading from the entry-point to a node from which execution cannot progress
+    any further, traversing the called procedures as it goes. Paths are simple, so loops are never traversed twice in
+    the same calling context. Successors are computed on the fly, so that memory usage is proportional to the length
+    of the path being explored; be aware that the number of paths may grow exponentially with the size of the CFG.
+
+    See :func:`exec_nodes` for the meaning of the parameters.
+
+    :param cfg: a CFG description of some code
+    :param entry_point: an entry-point specification for the CFG, either as a node ID or as a symbolic label
+    :param ignore_calls: a set of calls that won't be expanded
+    :param descend: an optional predicate deciding whether a call should be expanded
+    :return: an iterator over execution paths
+    """
+
+    graph = cfg.graph
+    symbols = cfg.get_symbol_table()
+    source = entry_point if entry_point in cfg.entry_point_ids else symbols[entry_point]
+
+    if not ignore_calls.isdisjoint(graph.nodes[source]['labels']):
+        yield [ExecNode((), source, True)]
+        return
+
+    def successors(node: ExecNode, ignored: Tuple[FrozenSet[str], ...]) \
+            -> Iterator[Tuple[ExecNode, Tuple[FrozenSet[str], ...]]]:
+        # The ignored tuple holds the set of ignored calls for every level of the calling context
+        if node.summary or len(graph.adj[node.node]) == 0:
+            if len(node.context) > 0:
+                # Return to the confluence point of the innermost call
+                yield ExecNode(node.context[:-1], _call_site(graph, node.context[-1])[1]), ignored[:-1]
+            return
+
+        for dst, data in graph.adj[node.node].items():
+            if data['kind'] == Transition.CALL:
+                callee = symbols[data['callee']]
+                inner_context = node.context + (node.node,)
+                if not ignored[-1].isdisjoint(graph.nodes[callee]['labels']) or \
+                        (descend is not None and not descend(node, data['callee'])):
+                    yield ExecNode(inner_context, callee, True), ignored + (ignored[-1],)
+                else:
+                    yield ExecNode(inner_context, callee), ignored + (ignored[-1].union(graph.nodes[callee]['labels']),)
+            else:
+                yield ExecNode(node.context, dst), ignored
+
+    root = ExecNode((), source)
+    path = [root]
+    on_path = {root}
+    # Every frame holds the successors' iterator of a node in the path, and whether it produced anything at all
+    stack = [[successors(root, (ignore_calls.union(graph.nodes[source]['labels']),)), False]]
+    while len(stack) > 0:
+        frame = stack[-1]
+        step = next(frame[0], None)
+        if step is None:
+            if not frame[1]:
+                # The last node has no successor at all: a complete path has been found
+                yield list(path)
+
+            stack.pop()
+            on_path.remove(path.pop())
+        else:
+            frame[1] = True
+            if step[0] not in on_path:
+                path.append(step[0])
+                on_path.add(step[0])
+                stack.append([successors(*step), False])
 
 
 def merge_points(cfg: DiGraph) -> FrozenSet[int]:
@@ -556,18 +977,211 @@ def merge_points(cfg: DiGraph) -> FrozenSet[int]:
     return frozenset((n for n in cfg.nodes.keys() if n != 0 and cfg.in_degree(n) > 1))
 
 
+def retreating_edges(cfg: DiGraph, entries: Iterable[Hashable]) -> FrozenSet[Tuple[Hashable, Hashable]]:
+    """
+    Find the retreating edges of a CFG, i.e. the edges pointing to a node that is still being visited during a
+    depth-first visit starting from the entry-points.
+
+    Every cycle reachable from the entry-points contains at least one retreating edge.
+
+    :arg cfg: the CFG representation of a program
+    :arg entries: the nodes from which the visit starts
+    :return: a frozen set of the retreating edges
+    """
+
+    # Iterative depth-first visit, collecting the edges that point to a node on the current DFS stack
+    state: Dict[Hashable, bool] = {}  # True while on the stack, False once finished
+    retreating = set()
+    for entry in entries:
+        if entry in state:
+            continue
+
+        state[entry] = True
+        stack = [(entry, iter(cfg.adj[entry]))]
+        while len(stack) > 0:
+            node, successors = stack[-1]
+            succ = next(successors, None)
+            if succ is None:
+                state[node] = False
+                stack.pop()
+            elif succ not in state:
+                state[succ] = True
+                stack.append((succ, iter(cfg.adj[succ])))
+            elif state[succ]:
+                retreating.add((node, succ))
+
+    return frozenset(retreating)
+
+
+def _reach(cfg: DiGraph,
+           start: Hashable,
+           avoid: Mapping[Hashable, None],
+           stop: Hashable,
+           reverse: bool = False) -> Dict[Hashable, Optional[Hashable]]:
+    # Breadth-first visit avoiding some nodes and not going past the stop one, returning the parent of each reached node
+    adjacency = cfg.pred if reverse else cfg.adj
+    parents = {start: None}
+    queue = deque([start])
+    while len(queue) > 0:
+        node = queue.popleft()
+        if node == stop:
+            continue
+        for succ in adjacency[node]:
+            if succ not in parents and succ not in avoid:
+                parents[succ] = node
+                queue.append(succ)
+    return parents
+
+
+def _search_simple_paths(cfg: DiGraph, source: Hashable, target: Hashable, candidates: Iterable[Hashable]) -> Set:
+    # For each candidate not found yet, enumerate the simple paths from the source to the candidate, extending them only
+    # towards the nodes from which the candidate can be reached, and from whose candidate the target can be reached,
+    # without crossing the path. Return all the nodes found on complete paths.
+    found = set()
+    for candidate in candidates:
+        if candidate in found:
+            continue
+
+        path: Dict[Hashable, None] = {}
+
+        def complete(node: Hashable) -> bool:
+            tail = _reach(cfg, node, path, target)
+            if target not in tail:
+                return False
+            found.update(path)
+            step = target
+            while step is not None:
+                found.add(step)
+                step = tail[step]
+            return True
+
+        def viable(node: Hashable) -> bool:
+            if node in path or node == target or candidate not in _reach(cfg, node, path, target):
+                return False
+            path[node] = None
+            viable_node = target in _reach(cfg, candidate, path, target)
+            del path[node]
+            return viable_node
+
+        if candidate == source or not viable(source):
+            if candidate == source:
+                complete(source)
+            continue
+
+        path[source] = None
+        stack = [iter(cfg.adj[source])]
+        while len(stack) > 0:
+            succ = next(stack[-1], None)
+            if succ is None:
+                stack.pop()
+                path.popitem()
+            elif succ == candidate and succ not in path:
+                if complete(succ):
+                    break
+            elif viable(succ):
+                path[succ] = None
+                stack.append(iter(cfg.adj[succ]))
+
+    return found
+
+
+def simple_path_nodes(cfg: DiGraph,
+                      source: Hashable,
+                      target: Hashable,
+                      candidates: Iterable[Hashable]) -> FrozenSet[Hashable]:
+    """
+    Find which of some candidate nodes lie on a simple path going from a source node to a target node.
+
+    A simple path crosses the strongly connected components of the CFG in topological order, entering and leaving each
+    of them once, so each component can be examined on its own: a node lies on a simple path if it lies on a simple
+    path inside its component, going from a node with a predecessor outside of it to a node with a successor outside of
+    it. Such paths are searched depth-first, and extended only towards the nodes that can still lead to the candidate
+    and then to the exit of the component. Deciding whether a node lies on a simple path is NP-complete, so the cost
+    remains exponential in the size of the largest component in the worst case.
+
+    :arg cfg: the CFG representation of a program
+    :arg source: the node from which paths start
+    :arg target: the node at which paths end
+    :arg candidates: the nodes to be looked for
+    :return: a frozen set of the candidates lying on some simple path
+    """
+
+    candidates = frozenset(candidates)
+    if source not in cfg or target not in cfg:
+        return frozenset()
+    if source == target:
+        return candidates.intersection([source])
+
+    # Only the nodes reachable from the source and reaching the target can be part of a path
+    relevant = _reach(cfg, source, {}, target).keys() & _reach(cfg, target, {}, source, reverse=True).keys()
+    if len(relevant) == 0:
+        return frozenset()
+
+    found = {source, target}
+    inner = cfg.subgraph(relevant.difference([source, target]))
+    for component in strongly_connected_components(inner):
+        wanted = candidates.intersection(component)
+        if len(wanted) == 0:
+            continue
+        if len(component) == 1:
+            found.update(component)
+            continue
+
+        # Look for paths from a virtual source, preceding the component's entries, to a virtual sink, following its
+        # exits
+        entry, exit = object(), object()
+        graph = inner.subgraph(component).copy()
+        graph.add_edges_from((entry, n) for n in component if any(p in relevant and p not in component and p != target
+                                                                  for p in cfg.pred[n]))
+        graph.add_edges_from((n, exit) for n in component if any(s in relevant and s not in component and s != source
+                                                                 for s in cfg.adj[n]))
+        graph.add_nodes_from((entry, exit))
+        found.update(_search_simple_paths(graph, entry, exit, wanted))
+
+    return candidates.intersection(found)
+
+
 def loop_back_nodes(cfg: DiGraph) -> FrozenSet[int]:
     """
     Find all the nodes of a CFG that are exclusively part of a loop.
 
-    A node is exclusively part of a loop if it belongs only to those paths that traverse the back-loop of a cycle.
+    A node is exclusively part of a loop if it belongs only to those paths that traverse the back-loop of a cycle. Nodes
+    lying on some cycle are those sharing a strongly connected component with a retreating edge. When the CFG is
+    reducible, i.e. the destination of every retreating edge dominates its origin, nodes lying on an acyclic path are
+    those that can reach the exit without following any retreating edge, so the answer is found in near-linear time.
+    Irreducible CFGs break this property, and the acyclic paths going from the entry-point to the exit are searched by
+    :func:`simple_path_nodes` instead, in exponential time in the worst case. Nodes that cannot be reached from the
+    entry-point are ignored. The result is the same as that of :func:`analysis.loops.loop_exclusive_nodes`.
 
     :arg cfg: the CFG representation of a program
     :return: a frozen set of all the loop-exclusive nodes
     """
 
-    # Node 0 closes an improper loop over the CFG, so it must be ignored
-    cycle_nodes = frozenset(chain.from_iterable(simple_cycles(restricted_view(cfg, [0], []))))
-    return frozenset(cycle_nodes.difference(chain.from_iterable(
-        # For every path, its last component is node 0; therefore, we have to cut it.
-        map(lambda l: l[:-1], all_simple_paths(cfg, 1, 0)))))
+    # Node 0 closes an improper loop over the CFG, so it must be ignored: execution paths end on its predecessors
+    graph = restricted_view(cfg, [0], [])
+    retreating = retreating_edges(graph, [1])
+
+    edge_nodes = {n for edge in retreating for n in edge}
+    cyclic = {n for component in strongly_connected_components(graph) if not edge_nodes.isdisjoint(component)
+              for n in component}
+
+    idom = immediate_dominators(graph, 1) if len(retreating) > 0 else {}
+
+    def dominates(a: Hashable, b: Hashable) -> bool:
+        while b != a and idom[b] != b:
+            b = idom[b]
+        return b == a
+
+    if all(dominates(header, latch) for latch, header in retreating):
+        on_paths = set(cfg.predecessors(0))
+        stack = list(on_paths)
+        while len(stack) > 0:
+            node = stack.pop()
+            for pred in graph.pred[node]:
+                if pred not in on_paths and (pred, node) not in retreating:
+                    on_paths.add(pred)
+                    stack.append(pred)
+    else:
+        on_paths = simple_path_nodes(cfg, 1, 0, cyclic)
+
+    return frozenset(cyclic.difference(on_paths))
@@ -9,14 +9,129 @@ program can be calculated, resulting in a (potentially very big) map, linking in
 representation of the heat levels inside the register file.
 """
 
-from typing import List, Tuple, Mapping, MutableMapping
+from __future__ import annotations
 
-from networkx import DiGraph, all_simple_paths, restricted_view
+from abc import ABC, abstractmethod
+from heapq import heappush, heappop
+from itertools import chain, count
+from operator import attrgetter
+from typing import List, Tuple, Mapping, Union, Optional, Iterable, Hashable, NamedTuple, Sequence, Iterator, \
+    FrozenSet, Dict, Set, Any
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from networkx import DiGraph, restricted_view, condensation, topological_sort
 
 from rep.base import to_line_iterator, Instruction
 from rep.fragments import CodeFragment
 from rep.base import opcodes, Register
-from analysis.graphs import merge_points, loop_back_nodes
+from analysis.dataflow import forward_dataflow, DataflowResult, reverse_postorder
+from analysis.graphs import LocalGraph, Transition
+
+
+def heat_dtype(max_heat: int) -> np.dtype:
+    """
+    Return the smallest unsigned integer type able to represent the given maximum heat level.
+
+    :arg max_heat: the maximum heat level for a register
+    :return: a NumPy unsigned integer data type
+    """
+
+    return np.min_scalar_type(max_heat)
+
+
+class BlockWrites(NamedTuple):
+    """
+    The register writes performed by a basic block's instructions, as needed for computing its heat.
+
+    :var lines: the line numbers of the block's instructions
+    :var registers: the register written by each instruction, or -1 if the instruction writes none
+    :var last: the position of the last instruction writing each register, or -1 if the register is never written
+    """
+
+    lines: np.ndarray
+    registers: np.ndarray
+    last: np.ndarray
+
+
+def block_writes(node: dict) -> BlockWrites:
+    """
+    Collect the register writes performed by the instructions of a CFG node.
+
+    External nodes are treated as empty blocks.
+
+    :arg node: the CFG node to be inspected
+    :return: the writes performed by the node's block
+    """
+
+    lines = []
+    registers = []
+    if not node.get('external', False):
+        block: CodeFragment = node['block']
+        for line in to_line_iterator(iter(block), block.begin):
+            if isinstance(line.statement, Instruction):
+                lines.append(line.number)
+                registers.append(line.statement.r1.value if opcodes[line.statement.opcode][1] else -1)
+
+    return _block_writes(np.array(lines, dtype=np.int64), np.array(registers, dtype=np.int8))
+
+
+def _block_writes(lines: np.ndarray, registers: np.ndarray) -> BlockWrites:
+    last = np.full(len(Register), -1, dtype=np.int64)
+    written = np.flatnonzero(registers >= 0)
+    # Fancy assignment keeps the last value for repeated indices, i.e. the last write of each register
+    last[registers[written]] = written
+
+    return BlockWrites(lines, registers, last)
+
+
+def block_heat(writes: BlockWrites, max_heat: int, init: Sequence[int]) -> np.ndarray:
+    """
+    Calculate the heat of the register file after each instruction of a block, all at once.
+
+    Every instruction cools down all the registers by one level, and brings the register it writes (if any) to the
+    maximum level. Hence, the heat of a register after the i-th instruction only depends on the last write preceding
+    it: it is `max_heat - (i - last_write)` for written registers, and `init - (i + 1)` otherwise, without ever falling
+    below 0.
+
+    :arg writes: the writes performed by the block
+    :arg max_heat: the maximum heat level for a register
+    :arg init: the initial register file's heat
+    :return: a matrix holding the heat vector of each instruction line, in the smallest suitable unsigned type
+    """
+
+    steps = np.arange(len(writes.lines))
+    # Positions of the last write of each register, up to each line
+    last = np.full((len(steps), len(Register)), -1, dtype=np.int64)
+    written = np.flatnonzero(writes.registers >= 0)
+    last[written, writes.registers[written]] = written
+    np.maximum.accumulate(last, axis=0, out=last)
+
+    decayed = np.asarray(init, dtype=np.int64) - (steps[:, np.newaxis] + 1)
+    heat = np.where(last >= 0, max_heat - (steps[:, np.newaxis] - last), decayed)
+
+    return np.clip(heat, 0, None).astype(heat_dtype(max_heat))
+
+
+def final_heat(writes: BlockWrites, max_heat: int, init: Sequence[int]) -> List[int]:
+    """
+    Calculate the heat of the register file at the end of a block, without drawing the block's heatmap.
+
+    :arg writes: the writes performed by the block
+    :arg max_heat: the maximum heat level for a register
+    :arg init: the initial register file's heat
+    :return: the final heat of the register file
+    """
+
+    return _exit_heat(writes, max_heat, np.asarray(init)).tolist()
+
+
+def _exit_heat(writes: BlockWrites, max_heat: int, init: np.ndarray) -> np.ndarray:
+    # Works on single heat vectors, as well as on matrices having a heat vector per row
+    length = len(writes.lines)
+    heat = np.where(writes.last >= 0, max_heat - (length - 1 - writes.last), init - length)
+
+    return np.clip(heat, 0, None)
 
 
 def node_register_heat(node: dict,
@@ -36,24 +151,11 @@ def node_register_heat(node: dict,
     # If the node represents external code, pessimistically return an empty heatmap with a zeroed final heat vector.
     if node.get('external', False):
         return {}, [0] * len(Register)
-    else:
-        block: CodeFragment = node['block']
 
-    current_heat = list(init)
-    heatmap = dict()
-    for line in filter(lambda ln: isinstance(ln.statement, Instruction), to_line_iterator(iter(block), block.begin)):
-        for r in range(0, len(current_heat)):
-            # Don't let heat levels fall below 0
-            if current_heat[r] > 0:
-                current_heat[r] -= 1
+    writes = block_writes(node)
+    heat = block_heat(writes, max_heat, init)
 
-        # Set the heat value to max_heat only if the rd register is being written
-        if opcodes[line.statement.opcode][1]:
-            current_heat[line.statement.r1.value] = max_heat
-
-        heatmap[line.number] = list(current_heat)
-
-    return heatmap, current_heat
+    return dict(zip(writes.lines.tolist(), heat.tolist())), final_heat(writes, max_heat, init)
 
 
 def mediate_heat(heat_vector: List[List[int]]) -> List[int]:
@@ -78,101 +180,1121 @@ def mediate_heat(heat_vector: List[List[int]]) -> List[int]:
     return mean_vector
 
 
-def close_cycles(cfg: DiGraph, heatmap: MutableMapping[int, Tuple[Mapping[int, List[int]], List[int]]], max_heat: int):
+class HeatMap(Mapping[int, List[int]]):
     """
-    Given a CFG and its incomplete, node-keyed heatmap, extend the heatmap in-place over the loop-back nodes.
+    A register heatmap, stored as a dense matrix having a row for every mapped line and a column for every register.
 
-    Only relatively simple loops are properly supported, i.e. loops that do not contain other branching constructs. If a
-    loop is more complicated than this, then expect to have discontinuous heat coverage, since a proper heat mediation
-    between alternative paths in a loop would require more work.
+    Lines are kept sorted, so that each line's row is found through a binary search. For backward compatibility, heat
+    maps behave as read-only mappings from line numbers to heat vectors, with vectors returned as lists. In addition,
+    they can be sliced:
 
-    :param cfg: the CFG representation of a program
-    :param heatmap: a node-keyed scratchpad heatmap that contains map fragments for each node, and their final heat
-                    vectors
-    :param max_heat: the maximum heat level a register can reach
+    - `heatmap[begin:end]` is the heat map restricted to the lines in the given range, sharing the same storage;
+    - `heatmap[begin:end, register]` is the array of the heat levels of a register (or of a slice of registers) over
+      the lines in the given range.
+
+    Matrices can be saved to, and loaded from, ``.npy`` files, which are memory-mapped on loading so that maps bigger
+    than the available memory can be inspected. Besides the heat matrix, a second ``.lines.npy`` file holding the line
+    numbers is written alongside it.
+
+    :ivar lines: the sorted array of the mapped line numbers
+    :ivar heat: the heat matrix, with rows matching the line numbers
+    """
+
+    lines: np.ndarray
+    heat: np.ndarray
+
+    def __init__(self, lines: np.ndarray, heat: np.ndarray):
+        """
+        Construct a heat map out of its line numbers and heat matrix.
+
+        :param lines: the sorted array of the mapped line numbers
+        :param heat: a matrix holding a heat vector for each line
+        :raise ValueError: when the number of lines and the number of heat vectors differ
+        """
+
+        if len(lines) != len(heat):
+            raise ValueError("Mismatching number of lines and heat vectors")
+
+        self.lines = lines
+        self.heat = heat
+
+    def _row(self, line: int) -> int:
+        row = int(np.searchsorted(self.lines, line))
+        if row == len(self.lines) or self.lines[row] != line:
+            raise KeyError(line)
+
+        return row
+
+    def _rows(self, lines: slice) -> slice:
+        if lines.step is not None:
+            raise ValueError("Cannot specify stepping for line ranges")
+
+        begin = 0 if lines.start is None else int(np.searchsorted(self.lines, lines.start))
+        end = len(self.lines) if lines.stop is None else int(np.searchsorted(self.lines, lines.stop))
+        return slice(begin, end)
+
+    def __getitem__(self, key: Union[int, slice, Tuple[slice, Union[Register, int, slice]]]) \
+            -> Union[List[int], HeatMap, np.ndarray]:
+        if isinstance(key, tuple):
+            lines, register = key
+            if isinstance(register, Register):
+                register = register.value
+
+            return self.heat[self._rows(lines), register]
+        elif isinstance(key, slice):
+            rows = self._rows(key)
+            return HeatMap(self.lines[rows], self.heat[rows])
+        else:
+            return self.heat[self._row(key)].tolist()
+
+    def __contains__(self, line: object) -> bool:
+        try:
+            self._row(line)
+        except (KeyError, TypeError):
+            return False
+
+        return True
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.lines.tolist())
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __repr__(self):
+        return "HeatMap(lines=" + repr(len(self)) + ", dtype=" + str(self.heat.dtype) + ")"
+
+    @staticmethod
+    def _paths(path: str) -> Tuple[str, str]:
+        stem = path[:-4] if path.endswith('.npy') else path
+        return stem + '.npy', stem + '.lines.npy'
+
+    def save(self, path: str) -> None:
+        """
+        Save the heat map to disk.
+
+        :param path: the path of the ``.npy`` file holding the heat matrix
+        """
+
+        heat_path, lines_path = HeatMap._paths(path)
+        np.save(heat_path, self.heat)
+        np.save(lines_path, self.lines)
+
+    @staticmethod
+    def load(path: str, mmap: bool = True) -> HeatMap:
+        """
+        Load a heat map from disk.
+
+        :param path: the path of the ``.npy`` file holding the heat matrix
+        :param mmap: whether the heat matrix should be memory-mapped in read-only mode, instead of being read in memory
+        :return: the loaded heat map
+        """
+
+        heat_path, lines_path = HeatMap._paths(path)
+        return HeatMap(np.load(lines_path), np.load(heat_path, mmap_mode='r' if mmap else None))
+
+
+class HeatSummary(Mapping[int, List[int]]):
+    """
+    A compact register heatmap, storing just what is needed to compute the heat of any line on demand.
+
+    Within a basic block, the heat of the register file is fully determined by the heat entering the block and by the
+    positions of the writes performed by its instructions (see :func:`block_heat`). Summaries keep the entering heat
+    vector of each block and a sorted array of all the write events, so that their size grows with the number of
+    blocks and writes, plus a single line number for each instruction, instead of a whole heat vector per line.
+
+    Every query is answered through a constant number of binary searches, without expanding the map. Like
+    :class:`HeatMap`, summaries can be used as read-only mappings from line numbers to heat vectors.
+
+    :ivar max_heat: the maximum heat level of the summarized map
+    :ivar lines: the sorted array of the mapped line numbers
+    :ivar starts: the index inside `lines` of the first line of each block
+    :ivar entries: the heat vectors entering the blocks, one per row
+    :ivar events: the sorted keys of the write events, combining block, register and position inside the block
+    """
+
+    max_heat: int
+    lines: np.ndarray
+    starts: np.ndarray
+    entries: np.ndarray
+    events: np.ndarray
+
+    def __init__(self, max_heat: int, blocks: Iterable[Tuple[BlockWrites, Sequence[int]]]):
+        """
+        Summarize the heat of a set of blocks.
+
+        Blocks must not overlap, unless they cover the very same lines: in this case, the last one is retained.
+
+        :param max_heat: the maximum heat level for a register
+        :param blocks: the writes of each block, paired with the heat entering it
+        """
+
+        summarized = {}
+        for writes, entry in blocks:
+            if len(writes.lines) > 0:
+                summarized[int(writes.lines[0])] = writes, entry
+        ordered = [summarized[first] for first in sorted(summarized)]
+
+        lengths = np.array([len(writes.lines) for writes, _ in ordered], dtype=np.int64)
+        self.max_heat = max_heat
+        self.lines = np.concatenate([writes.lines for writes, _ in ordered] + [np.empty(0, dtype=np.int64)])
+        self.starts = np.cumsum(lengths) - lengths
+        self.entries = np.array([entry for _, entry in ordered], dtype=heat_dtype(max_heat)).reshape(-1, len(Register))
+
+        # Keying events by block, register and position lets a single binary search find the last write of a register
+        # preceding a position, which is the greatest key not exceeding the one of the position itself
+        self._stride = int(lengths.max(initial=0)) + 1
+        keys = [np.empty(0, dtype=np.int64)]
+        for block, (writes, _) in enumerate(ordered):
+            positions = np.flatnonzero(writes.registers >= 0)
+            registers = writes.registers[positions].astype(np.int64)
+            keys.append((block * len(Register) + registers) * self._stride + positions)
+        self.events = np.sort(np.concatenate(keys))
+
+    def _locate(self, line: int) -> Tuple[int, int]:
+        # Return the block containing a line and the line's position inside it
+        row = int(np.searchsorted(self.lines, line))
+        if row == len(self.lines) or self.lines[row] != line:
+            raise KeyError(line)
+
+        block = int(np.searchsorted(self.starts, row, side='right')) - 1
+        return block, row - int(self.starts[block])
+
+    def _heat(self, block: int, position: int, registers: np.ndarray) -> np.ndarray:
+        bases = (block * len(Register) + registers) * self._stride
+        found = np.searchsorted(self.events, bases + position, side='right') - 1
+        last = self.events[np.maximum(found, 0)] - bases if len(self.events) > 0 else np.full(len(registers), -1)
+        written = (found >= 0) & (last >= 0)
+
+        heat = np.where(written,
+                        self.max_heat - (position - last),
+                        self.entries[block, registers].astype(np.int64) - (position + 1))
+        return np.clip(heat, 0, None)
+
+    def heat(self, line: int, register: Union[Register, int]) -> int:
+        """
+        Return the heat level of a register at a given line.
+
+        :param line: a mapped line number
+        :param register: the register, either as a member of the enumeration or as its number
+        :return: the register's heat level after the line's instruction is executed
+        :raise KeyError: when the line is not mapped
+        """
+
+        block, position = self._locate(line)
+        register = register.value if isinstance(register, Register) else register
+        return int(self._heat(block, position, np.array([register], dtype=np.int64))[0])
+
+    def heat_vector(self, line: int) -> List[int]:
+        """
+        Return the heat vector of a given line.
+
+        :param line: a mapped line number
+        :return: the heat of the register file after the line's instruction is executed
+        :raise KeyError: when the line is not mapped
+        """
+
+        block, position = self._locate(line)
+        return self._heat(block, position, np.arange(len(Register))).tolist()
+
+    def expand(self) -> HeatMap:
+        """
+        Expand the summary into a dense heat map.
+
+        :return: the heat map represented by this summary
+        """
+
+        registers = np.full(len(self.lines), -1, dtype=np.int8)
+        blocks, positions = np.divmod(self.events, self._stride)
+        blocks, written = np.divmod(blocks, len(Register))
+        registers[self.starts[blocks] + positions] = written
+
+        matrix = np.empty((len(self.lines), len(Register)), dtype=heat_dtype(self.max_heat))
+        ends = np.append(self.starts[1:], len(self.lines))
+        for block, (start, end) in enumerate(zip(self.starts.tolist(), ends.tolist())):
+            writes = _block_writes(self.lines[start:end], registers[start:end])
+            matrix[start:end] = block_heat(writes, self.max_heat, self.entries[block])
+
+        return HeatMap(self.lines, matrix)
+
+    def __getitem__(self, line: int) -> List[int]:
+        return self.heat_vector(line)
+
+    def __contains__(self, line: object) -> bool:
+        try:
+            self._locate(line)
+        except (KeyError, TypeError):
+            return False
+
+        return True
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.lines.tolist())
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __repr__(self):
+        return "HeatSummary(lines=" + repr(len(self)) + ", blocks=" + repr(len(self.starts)) + ", writes=" + \
+               repr(len(self.events)) + ")"
+
+
+class HeatIndex:
+    """
+    An index answering queries about the coldest registers of a heat map, by line and over ranges of lines.
+
+    For every line, the registers are pre-sorted by increasing heat, so that the coldest register not belonging to an
+    excluded set, or all the registers colder than a threshold, are found without scanning the whole heat vector. Ties
+    are broken in favor of the lower register number.
+
+    Range queries consider the maximum heat reached by each register over the range's lines, so that the returned
+    registers are cold throughout the range. They are backed by a segment tree of per-register maxima, built the
+    first time one is performed, and take a logarithmic number of steps in the number of lines.
+
+    The zero register is hardwired and cannot hold any value, so it is never returned, whatever the excluded registers.
+
+    :ivar heatmap: the indexed heat map
+    """
+
+    heatmap: HeatMap
+
+    def __init__(self, heatmap: Union[HeatMap, HeatSummary]):
+        """
+        Index a heat map.
+
+        :param heatmap: the heat map to be indexed, either dense or summarized
+        """
+
+        self.heatmap = heatmap.expand() if isinstance(heatmap, HeatSummary) else heatmap
+        self._order = np.argsort(self.heatmap.heat, axis=1, kind='stable').astype(np.uint8)
+        self._sorted = np.take_along_axis(np.asarray(self.heatmap.heat), self._order.astype(np.intp), axis=1)
+        self._tree: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _excluded(exclude: Iterable[Union[Register, int]]) -> FrozenSet[int]:
+        return frozenset(chain((Register.ZERO.value,), (r.value if isinstance(r, Register) else r for r in exclude)))
+
+    def coldest(self, line: int, exclude: Iterable[Union[Register, int]] = ()) -> Optional[Register]:
+        """
+        Find the coldest register at a given line.
+
+        :param line: a mapped line number
+        :param exclude: the registers that must not be returned
+        :return: the coldest register not being excluded, or None if all of them are
+        :raise KeyError: when the line is not mapped
+        """
+
+        excluded = HeatIndex._excluded(exclude)
+        for r in self._order[self.heatmap._row(line)].tolist():
+            if r not in excluded:
+                return Register(r)
+
+        return None
+
+    def cold_registers(self, line: int, threshold: int, exclude: Iterable[Union[Register, int]] = ()) -> List[Register]:
+        """
+        Find the registers whose heat does not exceed a threshold at a given line.
+
+        :param line: a mapped line number
+        :param threshold: the maximum heat level of the returned registers
+        :param exclude: the registers that must not be returned
+        :return: the list of the cold enough registers, from the coldest to the hottest
+        :raise KeyError: when the line is not mapped
+        """
+
+        row = self.heatmap._row(line)
+        count = int(np.searchsorted(self._sorted[row], threshold, side='right'))
+        excluded = HeatIndex._excluded(exclude)
+
+        return [Register(r) for r in self._order[row, :count].tolist() if r not in excluded]
+
+    def range_heat(self, begin: Optional[int], end: Optional[int]) -> np.ndarray:
+        """
+        Compute the maximum heat level reached by each register over a range of lines.
+
+        :param begin: the first line of the range, or None to start from the first mapped line
+        :param end: the line at which the range ends, excluded, or None to extend it to the last mapped line
+        :return: the vector of the registers' maximum heat levels
+        :raise ValueError: when no mapped line falls inside the range
+        """
+
+        rows = self.heatmap._rows(slice(begin, end))
+        if rows.start >= rows.stop:
+            raise ValueError("Empty line range")
+
+        if self._tree is None:
+            # Leaves are padded to a power of two, so that every level of the tree can be built with a single operation
+            size = 1 << max(len(self.heatmap) - 1, 0).bit_length()
+            tree = np.zeros((2 * size, len(Register)), dtype=self.heatmap.heat.dtype)
+            tree[size:size + len(self.heatmap)] = self.heatmap.heat
+            high = size
+            while high > 1:
+                low = high // 2
+                np.maximum(tree[2 * low:2 * high:2], tree[2 * low + 1:2 * high:2], out=tree[low:high])
+                high = low
+            self._tree = tree
+
+        # Climb the tree from the range's boundaries, collecting the nodes that exactly cover it
+        size = len(self._tree) // 2
+        low, high = rows.start + size, rows.stop + size
+        heat = np.zeros(len(Register), dtype=self._tree.dtype)
+        while low < high:
+            if low & 1:
+                np.maximum(heat, self._tree[low], out=heat)
+                low += 1
+            if high & 1:
+                high -= 1
+                np.maximum(heat, self._tree[high], out=heat)
+            low //= 2
+            high //= 2
+
+        return heat
+
+    def coldest_in_range(self,
+                         begin: Optional[int],
+                         end: Optional[int],
+                         exclude: Iterable[Union[Register, int]] = ()) -> Optional[Register]:
+        """
+        Find the register that stays the coldest over a range of lines, i.e. the one whose maximum heat is the lowest.
+
+        :param begin: the first line of the range, or None to start from the first mapped line
+        :param end: the line at which the range ends, excluded, or None to extend it to the last mapped line
+        :param exclude: the registers that must not be returned
+        :return: the coldest register not being excluded, or None if all of them are
+        :raise ValueError: when no mapped line falls inside the range
+        """
+
+        heat = self.range_heat(begin, end)
+        excluded = HeatIndex._excluded(exclude)
+        for r in np.argsort(heat, kind='stable').tolist():
+            if r not in excluded:
+                return Register(r)
+
+        return None
+
+    def cold_in_range(self,
+                      begin: Optional[int],
+                      end: Optional[int],
+                      threshold: int,
+                      exclude: Iterable[Union[Register, int]] = ()) -> List[Register]:
+        """
+        Find the registers whose heat never exceeds a threshold over a range of lines.
+
+        :param begin: the first line of the range, or None to start from the first mapped line
+        :param end: the line at which the range ends, excluded, or None to extend it to the last mapped line
+        :param threshold: the maximum heat level of the returned registers
+        :param exclude: the registers that must not be returned
+        :return: the list of the cold enough registers, from the coldest to the hottest
+        :raise ValueError: when no mapped line falls inside the range
+        """
+
+        heat = self.range_heat(begin, end)
+        excluded = HeatIndex._excluded(exclude)
+
+        return [Register(r) for r in np.argsort(heat, kind='stable').tolist()
+                if heat[r] <= threshold and r not in excluded]
+
+
+def _heat_problem(cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]]) \
+        -> Tuple[DiGraph, Iterable[Hashable], bool]:
+    # Return the graph to be analyzed, its entry-points and whether its call edges cool down the register file,
+    # according to the conventions described in register_heatmap()
+    if isinstance(cfg, LocalGraph):
+        if entries is None:
+            entries = chain(cfg.entry_point_ids, map(attrgetter('confluence_point'), cfg.external_calls))
+        return cfg.graph, entries, True
+    elif entries is None and 0 in cfg:
+        # Node 0 represents the calling environment, which is replaced by the boundary heat of node 1
+        return restricted_view(cfg, [0], []), [1], False
+    else:
+        if entries is None:
+            entries = (n for n in cfg.nodes if cfg.in_degree(n) == 0)
+        return cfg, entries, False
+
+
+class HeatAnalysis:
+    """
+    The register heat analysis of a CFG, whose results can be updated after the code has been edited.
+
+    The analysis is carried out on construction. When the instructions of some blocks are edited, :meth:`update`
+    re-scans just those blocks and resumes the propagation of heat from the previous fixpoint, stopping as soon as the
+    heat leaving the blocks stops changing. Blocks whose lines have merely been shifted by edits performed elsewhere,
+    as it happens to fragment views, have their line numbers adjusted without being scanned again. The heat matrix of
+    each block is cached as well, and re-drawn only if the block's entering heat has changed.
+
+    Only edits that do not alter the structure of the CFG are supported. After any other change, perform a new analysis.
+    Also note that, since mean heat levels are rounded down, heat may stabilize on different levels inside loops
+    depending on the order of the propagation: updated results are always consistent with the edited code, but may not
+    be identical to those of a new analysis.
+
+    :ivar graph: the analyzed CFG
+    :ivar max_heat: the maximum heat level a register can reach
+    :ivar result: the fixpoint reached by the analysis
     """
 
-    cycle_nodes = list(loop_back_nodes(cfg))
-    while len(cycle_nodes) > 0:
-        curr = cycle_nodes.pop(0)
-        # Collect the current node's predecessors that have been properly mapped
-        mapped_predecessors = list(filter(lambda n: n in heatmap, cfg.predecessors(curr)))
+    graph: DiGraph
+    max_heat: int
+    result: DataflowResult
 
-        if len(mapped_predecessors) > 0:
-            # Pick the first mapped predecessor and use its final heat vector to calculate the current node's heat
-            heatmap[curr] = node_register_heat(cfg.nodes[curr], max_heat, heatmap[mapped_predecessors[0]][1])
+    def __init__(self,
+                 cfg: Union[LocalGraph, DiGraph],
+                 max_heat: int,
+                 entries: Optional[Iterable[Hashable]] = None,
+                 widening_delay: int = 2):
+        """
+        Analyze the register heat of a CFG.
+
+        See :func:`register_heatmap` for the details about how heat is propagated, and how entry-points are chosen.
+
+        :param cfg: the program's representation as a CFG
+        :param max_heat: the maximum heat level a register can reach
+        :param entries: the nodes from which execution starts
+        :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+        """
+
+        self._cold = [0] * len(Register)
+        self.graph, entries, cooling_calls = _heat_problem(cfg, entries)
+        self._edge_transfer = self._call_transfer if cooling_calls else None
+
+        self.max_heat = max_heat
+        self._boundary = {n: self._cold for n in entries}
+        self._widening_delay = widening_delay
+
+        # Blocks are scanned only once, since the transfer function just needs their last writes. Their first line is
+        # recorded, so that shifts can be detected.
+        self._writes: Dict[Hashable, BlockWrites] = {}
+        self._begins: Dict[Hashable, int] = {}
+        # Heat matrices of the blocks already drawn, and the nodes that need to be drawn again
+        self._drawn: Dict[Hashable, np.ndarray] = {}
+        self._stale: Set[Hashable] = set()
+
+        self.result = self._solve()
+
+    def _call_transfer(self, pred: Hashable, succ: Hashable, heat: List[int]) -> List[int]:
+        # Internal calls are not expanded, so the called procedure's effects are pessimistically accounted for
+        return self._cold if self.graph.edges[pred, succ]['kind'] == Transition.CALL else heat
+
+    def _scan(self, node: Hashable) -> None:
+        self._writes[node] = block_writes(self.graph.nodes[node])
+        self._begins[node] = self.graph.nodes[node]['block'].begin
+
+    def _transfer(self, node: Hashable, heat: List[int]) -> List[int]:
+        if self.graph.nodes[node].get('external', False):
+            return self._cold
+        if node not in self._writes:
+            self._scan(node)
+
+        self._stale.add(node)
+        return final_heat(self._writes[node], self.max_heat, heat)
+
+    def _solve(self, initial: Optional[DataflowResult] = None, changed: Iterable[Hashable] = ()) -> DataflowResult:
+        return forward_dataflow(self.graph,
+                                self._boundary,
+                                self._transfer,
+                                mediate_heat,
+                                self._edge_transfer,
+                                lambda old, new: list(map(min, old, new)),
+                                self._widening_delay,
+                                initial,
+                                changed)
+
+    def update(self, modified: Iterable[Hashable]) -> int:
+        """
+        Update the analysis after the instructions of some blocks have been edited.
+
+        Every node whose block has been edited must be listed, including all the nodes sharing the same block.
+
+        :param modified: the nodes whose blocks have been edited
+        :return: the number of nodes whose heat has been re-evaluated
+        """
+
+        modified = frozenset(modified)
+        for node in modified.intersection(self._writes):
+            self._scan(node)
+
+        # Shift the lines of the untouched blocks that have been moved by the edits
+        for node, begin in self._begins.items():
+            if node not in modified:
+                shift = self.graph.nodes[node]['block'].begin - begin
+                if shift != 0:
+                    self._writes[node] = self._writes[node]._replace(lines=self._writes[node].lines + shift)
+                    self._begins[node] = begin + shift
+
+        self.result = self._solve(self.result, modified)
+        return self.result.iterations
+
+    def _draw(self) -> List[Hashable]:
+        # Draw the stale nodes, and return all the drawn ones in the order in which they should be laid down
+        for node in self._stale.intersection(self.result.inputs):
+            self._drawn[node] = block_heat(self._writes[node], self.max_heat, self.result.inputs[node])
+        self._stale.clear()
+
+        return [n for n in self.result.inputs if n in self._writes]
+
+    def heatmap(self, out: Optional[str] = None) -> HeatMap:
+        """
+        Draw the heat map resulting from the analysis.
+
+        :param out: the path of a ``.npy`` file into which the heat matrix is directly written, as in
+                    :meth:`HeatMap.save`
+        :return: an heatmap mapping every reachable line to a heat vector
+        """
+
+        drawn = self._draw()
+        lines = np.unique(np.concatenate([self._writes[n].lines for n in drawn] + [np.empty(0, dtype=np.int64)]))
+        shape = (len(lines), len(Register))
+        if out is None:
+            matrix = np.zeros(shape, dtype=heat_dtype(self.max_heat))
         else:
-            # Requeue node
-            cycle_nodes.append(curr)
+            heat_path, lines_path = HeatMap._paths(out)
+            matrix = open_memmap(heat_path, mode='w+', dtype=heat_dtype(self.max_heat), shape=shape)
+            np.save(lines_path, lines)
+
+        for node in drawn:
+            matrix[np.searchsorted(lines, self._writes[node].lines)] = self._drawn[node]
+
+        if out is not None:
+            matrix.flush()
+
+        return HeatMap(lines, matrix)
 
+    def summary(self) -> HeatSummary:
+        """
+        Summarize the heat resulting from the analysis.
 
-# TODO this code is still working on the assumption that node IDs are integers
-def register_heatmap(cfg: DiGraph, max_heat: int) -> Mapping[int, List[int]]:
+        :return: the compact summary of the heat of every reachable line
+        """
+
+        drawn = [n for n in self.result.inputs if n in self._writes]
+        return HeatSummary(self.max_heat, ((self._writes[n], self.result.inputs[n]) for n in drawn))
+
+
+def register_heatmap(cfg: Union[LocalGraph, DiGraph],
+                     max_heat: int,
+                     entries: Optional[Iterable[Hashable]] = None,
+                     widening_delay: int = 2,
+                     out: Optional[str] = None,
+                     summarize: bool = False) -> Union[HeatMap, HeatSummary]:
     """
     Calculate the register heatmap of the program.
 
     Given the program's representation as a CFG, an heatmap laid over all the reachable nodes is drawn.
     When a node on which multiple execution paths converge is found, its portion of heatmap is calculated starting from
-    the mean heat levels of all the incoming arcs.
+    the mean heat levels of all the incoming arcs. Lines belonging to multiple nodes, as may happen in execution graphs,
+    are mapped according to the last node that is drawn.
+
+    Heat levels are propagated through a forward data-flow analysis, so loops are iterated until the heat entering
+    their nodes stabilizes. Since the mean heat is not a proper lattice meet, the iteration is forced to converge by
+    letting the entering heat only decrease after a node has been visited `widening_delay` times.
+
+    Execution starts with a cold register file from the entry-points. If none is given, the entry-points of a local
+    graph are used, as well as its external calls' confluence points, since the heat left by external code is unknown.
+    Internal calls of a local graph are treated in the same pessimistic way. For digraphs, node 1 is used when node 0
+    represents the calling environment, as in the CFGs built by earlier versions of this library; otherwise, the nodes
+    without incoming edges are used.
 
-    For the sake of simplicity, loops are pessimistically ignored (i.e. as if all looping conditions are false before
-    entering the first iteration).
+    Use a :class:`HeatAnalysis` directly to keep the heatmap up to date while editing the code.
 
     :arg cfg: the program's representation as a CFG
     :arg max_heat: the maximum heat level a register can reach
+    :arg entries: the nodes from which execution starts
+    :arg widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :arg out: the path of a ``.npy`` file into which the heat matrix is directly written, as in :meth:`HeatMap.save`
+    :arg summarize: whether a compact :class:`HeatSummary` should be returned, instead of a dense map
     :return: an heatmap mapping every reachable line to a heat vector
+    :raise ValueError: when a summary is requested along with an output file
+    """
+
+    if summarize and out is not None:
+        raise ValueError("Summaries cannot be written to memory-mapped files")
+
+    analysis = HeatAnalysis(cfg, max_heat, entries, widening_delay)
+    return analysis.summary() if summarize else analysis.heatmap(out)
+
+
+def _mean_heat(heat: List[np.ndarray]) -> np.ndarray:
+    # The same as mediate_heat(), for heat vectors or matrices stored as arrays
+    return np.sum(heat, axis=0) // len(heat)
+
+
+class ProcedureSummaries:
+    """
+    Memoized heat summaries of the procedures contained in a local graph.
+
+    Since instructions affect each register independently, and heat vectors are combined register by register, the heat
+    of a register when leaving a procedure only depends on its heat when entering it. The summary of a procedure
+    tabulates this dependency for every register and heat level, so that it can be applied at every call site without
+    analyzing the procedure again. All the levels are analyzed at once, by propagating matrices having a row per level.
+
+    Procedures are identified by their entry-points, and comprise all the nodes reachable from there, including the
+    confluence points of the external calls they perform. Internal calls are accounted for through the callees'
+    summaries, which are computed bottom-up when first needed. Calls whose summary is still being computed, as happens
+    with recursion, pessimistically cool down the whole register file, as do external calls and procedures that never
+    return. When a procedure returns through multiple terminal nodes, the mean heat is taken.
+
+    :ivar cfg: the local graph containing the procedures
+    :ivar max_heat: the maximum heat level a register can reach
+    """
+
+    cfg: LocalGraph
+    max_heat: int
+
+    def __init__(self, cfg: LocalGraph, max_heat: int, widening_delay: int = 2):
+        """
+        Prepare the summaries of the procedures of a local graph.
+
+        :param cfg: a local graph with internal calls
+        :param max_heat: the maximum heat level a register can reach
+        :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+        """
+
+        self.cfg = cfg
+        self.max_heat = max_heat
+        self._widening_delay = widening_delay
+        self._symbols = cfg.get_symbol_table()
+        self._terminals = frozenset(cfg.terminal_nodes_ids)
+        self._confluences: Dict[Hashable, List[Hashable]] = {}
+        for call in cfg.external_calls:
+            self._confluences.setdefault(call.caller, []).append(call.confluence_point)
+
+        self._writes: Dict[Hashable, BlockWrites] = {}
+        self._bodies: Dict[Hashable, FrozenSet[Hashable]] = {}
+        self._tables: Dict[Hashable, np.ndarray] = {}
+
+    def procedure(self, entry_point: Union[str, Hashable]) -> Hashable:
+        """
+        Return the ID of a procedure's entry-point.
+
+        :param entry_point: the procedure's entry-point, either as a node ID or as a symbolic label
+        :return: the node ID of the entry-point
+        :raise KeyError: when no such procedure exists
+        """
+
+        return entry_point if entry_point in self.cfg.entry_point_ids else self._symbols[entry_point]
+
+    def body(self, procedure: Hashable) -> FrozenSet[Hashable]:
+        """
+        Return the nodes belonging to a procedure.
+
+        :param procedure: the procedure's entry-point ID
+        :return: the nodes reachable from the entry-point, external calls' confluence points included
+        """
+
+        if procedure not in self._bodies:
+            body = {procedure}
+            stack = [procedure]
+            while len(stack) > 0:
+                node = stack.pop()
+                for succ in chain(self.cfg.graph.adj[node], self._confluences.get(node, ())):
+                    if succ not in body:
+                        body.add(succ)
+                        stack.append(succ)
+            self._bodies[procedure] = frozenset(body)
+
+        return self._bodies[procedure]
+
+    def calls(self, procedure: Hashable) -> Iterator[Tuple[Hashable, Hashable]]:
+        """
+        Iterate over the internal calls performed by a procedure.
+
+        :param procedure: the procedure's entry-point ID
+        :return: an iterator over pairs made of calling node and called procedure's entry-point ID
+        """
+
+        graph = self.cfg.graph
+        for caller in self.body(procedure):
+            for succ, kind in graph.adj[caller].items():
+                if kind['kind'] == Transition.CALL:
+                    yield caller, self._symbols[kind['callee']]
+
+    def writes(self, node: Hashable) -> Optional[BlockWrites]:
+        """
+        Return the register writes performed by a node, scanning its block only once.
+
+        :param node: a node of the local graph
+        :return: the node's writes, or None if the node represents external code
+        """
+
+        if self.cfg.graph.nodes[node].get('external', False):
+            return None
+        if node not in self._writes:
+            self._writes[node] = block_writes(self.cfg.graph.nodes[node])
+
+        return self._writes[node]
+
+    def _transfer(self, node: Hashable, heat: np.ndarray) -> np.ndarray:
+        writes = self.writes(node)
+        return np.zeros_like(heat) if writes is None else _exit_heat(writes, self.max_heat, heat)
+
+    def _call_transfer(self, pred: Hashable, succ: Hashable, heat: np.ndarray) -> np.ndarray:
+        data = self.cfg.graph.edges[pred, succ]
+        if data['kind'] != Transition.CALL:
+            return heat
+
+        table = self._tables.get(self._symbols[data['callee']])
+        return np.zeros_like(heat) if table is None else table[heat, np.arange(len(Register))]
+
+    def solve(self, procedure: Hashable, init: np.ndarray) -> DataflowResult:
+        """
+        Propagate heat through a procedure, given its entering heat.
+
+        The summaries of the called procedures must have already been computed, or their calls are treated as cooling
+        down the whole register file.
+
+        :param procedure: the procedure's entry-point ID
+        :param init: the heat entering the procedure, either as a vector or as a matrix having a vector per row
+        :return: the fixpoint of the heat propagation
+        """
+
+        body = self.body(procedure)
+        boundary = {procedure: init}
+        boundary.update((c, np.zeros_like(init)) for n in body for c in self._confluences.get(n, ()))
+
+        return forward_dataflow(self.cfg.graph,
+                                boundary,
+                                self._transfer,
+                                _mean_heat,
+                                self._call_transfer,
+                                np.minimum,
+                                self._widening_delay,
+                                equal=np.array_equal)
+
+    def table(self, procedure: Hashable) -> np.ndarray:
+        """
+        Return the summary of a procedure, computing it if needed.
+
+        :param procedure: the procedure's entry-point ID
+        :return: a matrix holding, at row `h` and column `r`, the heat of register `r` when leaving the procedure after
+                 having entered it with heat level `h`
+        """
+
+        if procedure in self._tables:
+            return self._tables[procedure]
+
+        # Visit the call graph depth-first, summarizing callees before their callers. Procedures still on the stack
+        # when called again have no summary yet.
+        levels = np.repeat(np.arange(self.max_heat + 1)[:, np.newaxis], len(Register), axis=1)
+        visited = {procedure}
+        stack = [(procedure, self.calls(procedure))]
+        while len(stack) > 0:
+            current, calls = stack[-1]
+            callee = next(calls, (None, None))[1]
+            if callee is None:
+                stack.pop()
+                result = self.solve(current, levels)
+                exits = [result.outputs[t] for t in self.body(current).intersection(self._terminals)
+                         if t in result.outputs]
+                self._tables[current] = _mean_heat(exits) if len(exits) > 0 else np.zeros_like(levels)
+            elif callee not in visited and callee not in self._tables:
+                visited.add(callee)
+                stack.append((callee, self.calls(callee)))
+
+        return self._tables[procedure]
+
+    def apply(self, procedure: Hashable, heat: Sequence[int]) -> List[int]:
+        """
+        Compute the heat leaving a procedure through its summary.
+
+        :param procedure: the procedure's entry-point ID
+        :param heat: the heat entering the procedure
+        :return: the heat leaving the procedure
+        """
+
+        return self.table(procedure)[np.asarray(heat), np.arange(len(Register))].tolist()
+
+
+def interprocedural_heatmap(cfg: LocalGraph,
+                            max_heat: int,
+                            entry_point: Union[str, Hashable],
+                            k: int = 0,
+                            widening_delay: int = 2) -> HeatMap:
     """
+    Calculate the register heatmap of a program made of multiple procedures, without expanding their calls.
+
+    The heat leaving a call is computed through the summary of the called procedure (see :class:`ProcedureSummaries`),
+    which is analyzed only once. Each procedure is then drawn starting from the mean heat of its call sites. By default,
+    the analysis is context-insensitive: each procedure is drawn once, merging all of its call sites. A positive `k`
+    distinguishes the calls by their last `k` call sites, drawing each procedure once per calling context; lines drawn
+    in multiple contexts are mapped to their mean heat.
 
-    # Clean the CFG from all loop arcs that are not part of simple paths
-    noloop_cfg = restricted_view(cfg, loop_back_nodes(cfg), [])
-
-    paths = list(all_simple_paths(noloop_cfg, 1, 0))
-    # All nodes on which more than one execution flow converge
-    merges = merge_points(noloop_cfg)
-    # A collection of paths that cannot be completed because we still miss the initialization vector, indexed by node ID
-    waiting_paths: MutableMapping[int, List[List[int]]] = {}
-    # The scratchpad in which node heatmaps and final heat vectors are stored
-    node_heatmaps: MutableMapping[int, Tuple[Mapping[int, List[int]], List[int]]] = {0: ({}, [0] * len(Register))}
-
-    while len(paths) > 0:
-        lin_path = paths.pop()
-
-        # Don't recalculate heatmaps for already-visited nodes
-        for node in filter(lambda n: n not in node_heatmaps, lin_path):
-            if node in merges:
-                if node not in waiting_paths:
-                    # Multiple paths converge on this node and we miss the initialization vector: initialize the waiting
-                    # paths list for this node and store the path's stump
-                    del lin_path[:lin_path.index(node)]
-                    waiting_paths[node] = [lin_path]
-                    break
-                elif frozenset(noloop_cfg.predecessors(node)).issubset(node_heatmaps):
-                    # The initialization vector can finally be calculated: requeue all incomplete paths
-                    paths.extend(waiting_paths[node])
-                    del waiting_paths[node]
-                    # Calculate this node's heatmap, mediating the incoming heat vectors
-                    node_heatmaps[node] = node_register_heat(noloop_cfg.nodes[node],
-                                                             max_heat,
-                                                             mediate_heat([node_heatmaps[n][1] for n in
-                                                                           noloop_cfg.predecessors(node)]))
-                else:
-                    # Multiple paths converge on this node and we miss the initialization vector: store the path's stump
-                    del lin_path[:lin_path.index(node)]
-                    waiting_paths[node].append(lin_path)
-                    break
+    Procedures are drawn in reverse post-order of the calling contexts' graph, so that heat entering a procedure through
+    recursive calls is ignored. Only the procedures reachable from the entry-point are drawn.
+
+    :param cfg: a local graph with internal calls
+    :param max_heat: the maximum heat level a register can reach
+    :param entry_point: the entry-point from which execution starts, either as a node ID or as a symbolic label
+    :param k: the number of call sites distinguishing calling contexts
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :return: an heatmap mapping every reachable line to a heat vector
+    """
+
+    summaries = ProcedureSummaries(cfg, max_heat, widening_delay)
+
+    # Discover the calling contexts, identified by procedure and last k call sites
+    root = summaries.procedure(entry_point), ()
+    contexts = DiGraph()
+    contexts.add_node(root)
+    stack = [root]
+    while len(stack) > 0:
+        context = stack.pop()
+        procedure, sites = context
+        for caller, callee in summaries.calls(procedure):
+            called = callee, (sites + (caller,))[-k:] if k > 0 else ()
+            if called not in contexts:
+                stack.append(called)
+            contexts.add_edge(context, called)
+            contexts.edges[context, called].setdefault('sites', []).append(caller)
+
+    cold = np.zeros(len(Register), dtype=np.int64)
+    entering: Dict[Tuple[Hashable, Tuple], List[np.ndarray]] = {root: [cold]}
+    drawn: Dict[Hashable, List[np.ndarray]] = {}
+    for context in reverse_postorder(contexts, [root]):
+        procedure, _ = context
+        summaries.table(procedure)
+        result = summaries.solve(procedure, _mean_heat(entering.get(context, [cold])))
+
+        for node, heat in result.inputs.items():
+            writes = summaries.writes(node)
+            if writes is not None:
+                drawn.setdefault(node, []).append(block_heat(writes, max_heat, heat))
+
+        for called, sites in contexts.adj[context].items():
+            entering.setdefault(called, []).extend(result.outputs[c] for c in sites['sites'] if c in result.outputs)
+
+    lines = np.unique(np.concatenate([summaries.writes(n).lines for n in drawn] + [np.empty(0, dtype=np.int64)]))
+    matrix = np.zeros((len(lines), len(Register)), dtype=heat_dtype(max_heat))
+    for node, heat in drawn.items():
+        matrix[np.searchsorted(lines, summaries.writes(node).lines)] = _mean_heat(heat)
+
+    return HeatMap(lines, matrix)
+
+
+def stream_block_heat(cfg: Union[LocalGraph, DiGraph],
+                      max_heat: int,
+                      entries: Optional[Iterable[Hashable]] = None,
+                      widening_delay: int = 2,
+                      layout_order: bool = False) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Generate the register heatmap of a program block by block, as soon as each block's heat is final.
+
+    The CFG is split into its strongly connected components, which are analyzed one at a time in topological order:
+    when a component is reached, the heat leaving all of its predecessors is already known, so the heat of its blocks
+    can be drawn and yielded right away. Only the heat leaving the nodes whose successors have not been analyzed yet is
+    retained, so that memory usage is bounded by the frontier of the analysis instead of the size of the program. Heat
+    is propagated as in :func:`register_heatmap`, although the propagation order may let heat stabilize on slightly
+    different levels inside loops.
+
+    If `layout_order` is set, blocks are yielded in the order in which they appear in the code, buffering those that
+    are finalized ahead of their turn.
+
+    :param cfg: the program's representation as a CFG
+    :param max_heat: the maximum heat level a register can reach
+    :param entries: the nodes from which execution starts
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :param layout_order: whether blocks should be yielded in layout order, instead of topological order
+    :return: an iterator over pairs made of the line numbers of a block's instructions and their heat matrix
+    """
+
+    graph, entries, cooling_calls = _heat_problem(cfg, entries)
+    entries = frozenset(entries)
+    cold = [0] * len(Register)
+
+    def edge_transfer(pred: Hashable, succ: Hashable, heat: List[int]) -> List[int]:
+        return cold if graph.edges[pred, succ]['kind'] == Transition.CALL else heat
+
+    reachable = graph.subgraph(reverse_postorder(graph, entries))
+    components = condensation(reachable)
+
+    # Heat leaving the analyzed nodes, kept as long as some of their successors have not been analyzed
+    outputs: Dict[Hashable, List[int]] = {}
+    pending: Dict[Hashable, int] = {}
+
+    # In layout order, blocks are released following the sorted list of their beginnings
+    if layout_order:
+        beginnings = sorted(reachable.nodes[n]['block'].begin for n in reachable.nodes
+                            if not reachable.nodes[n].get('external', False))
+        released = 0
+        # Buffered blocks are sorted by beginning, and then by arrival
+        buffer: List[Tuple[int, int, np.ndarray, np.ndarray]] = []
+        arrivals = count()
+
+    for component in topological_sort(components):
+        members = components.nodes[component]['members']
+        # Predecessors outside the component are pinned to their final heat
+        pinned = {p for n in members for p in reachable.pred[n] if p not in members}
+        writes: Dict[Hashable, BlockWrites] = {}
+
+        def transfer(node: Hashable, heat: List[int]) -> List[int]:
+            if node in pinned:
+                return outputs[node]
+            if reachable.nodes[node].get('external', False):
+                return cold
+            if node not in writes:
+                writes[node] = block_writes(reachable.nodes[node])
+            return final_heat(writes[node], max_heat, heat)
+
+        boundary = {p: outputs[p] for p in pinned}
+        boundary.update((n, cold) for n in members if n in entries)
+        result = forward_dataflow(reachable.subgraph(members.union(pinned)),
+                                  boundary,
+                                  transfer,
+                                  mediate_heat,
+                                  edge_transfer if cooling_calls else None,
+                                  lambda old, new: list(map(min, old, new)),
+                                  widening_delay)
+
+        # Retain the heat leaving the component, and forget the one of the predecessors that is no longer needed
+        for node in members:
+            outputs[node] = result.outputs[node]
+            pending[node] = sum(1 for succ in reachable.adj[node] if succ not in members)
+        for node in chain(members, pinned):
+            if node in pinned:
+                pending[node] -= sum(1 for succ in reachable.adj[node] if succ in members)
+            if pending[node] == 0:
+                del outputs[node]
+                del pending[node]
+
+        for node in (n for n in result.order if n in writes):
+            lines, heat = writes[node].lines, block_heat(writes[node], max_heat, result.inputs[node])
+            if not layout_order:
+                if len(lines) > 0:
+                    yield lines, heat
             else:
-                # This node is part of a linear path: calculate its heatmap using the predecessor's final heat vector
-                node_heatmaps[node] = node_register_heat(noloop_cfg.nodes[node],
-                                                         max_heat,
-                                                         node_heatmaps[next(noloop_cfg.predecessors(node))][1])
-
-    heatmap = {}
-    # Remove the initialization heat vector from the scratchpad
-    del node_heatmaps[0]
-    # Extend heatmaps onto cycle-only loops
-    close_cycles(cfg, node_heatmaps, max_heat)
-    # Collapse the scratchpad into the resulting global heatmap
-    for nhm in node_heatmaps.values():
-        heatmap.update(nhm[0])
-
-    return heatmap
+                # Blocks without instructions are buffered as well, since they still have to take their turn
+                heappush(buffer, (reachable.nodes[node]['block'].begin, next(arrivals), lines, heat))
+
+        while layout_order and len(buffer) > 0 and buffer[0][0] == beginnings[released]:
+            _, _, lines, heat = heappop(buffer)
+            released += 1
+            if len(lines) > 0:
+                yield lines, heat
+
+
+def stream_heatmap(cfg: Union[LocalGraph, DiGraph],
+                   max_heat: int,
+                   entries: Optional[Iterable[Hashable]] = None,
+                   widening_delay: int = 2,
+                   layout_order: bool = False) -> Iterator[Tuple[int, List[int]]]:
+    """
+    Generate the register heatmap of a program line by line, without building the whole map.
+
+    See :func:`stream_block_heat` for the details about ordering and memory usage.
+
+    :param cfg: the program's representation as a CFG
+    :param max_heat: the maximum heat level a register can reach
+    :param entries: the nodes from which execution starts
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :param layout_order: whether lines should be yielded in layout order, instead of topological order
+    :return: an iterator over pairs made of line numbers and heat vectors
+    """
+
+    for lines, heat in stream_block_heat(cfg, max_heat, entries, widening_delay, layout_order):
+        yield from zip(lines.tolist(), heat.tolist())
+
+
+class HeatReducer(ABC):
+    """
+    An aggregate computed over a stream of heat, one block at a time.
+    """
+
+    @abstractmethod
+    def update(self, lines: np.ndarray, heat: np.ndarray) -> None:
+        """
+        Account for the heat of a group of lines.
+
+        :param lines: the line numbers
+        :param heat: the heat matrix of the lines, with a heat vector per row
+        """
+
+        pass
+
+    @abstractmethod
+    def result(self) -> Any:
+        """
+        Return the aggregate of the heat seen so far.
+
+        :return: the aggregate value
+        """
+
+        pass
+
+
+class HeatHistogram(HeatReducer):
+    """
+    Count how many lines see each register at each heat level.
+
+    The result is a matrix holding, at row `h` and column `r`, the number of lines in which register `r` has heat `h`.
+    """
+
+    def __init__(self, max_heat: int):
+        self._counts = np.zeros((max_heat + 1, len(Register)), dtype=np.int64)
+
+    def update(self, lines: np.ndarray, heat: np.ndarray) -> None:
+        levels = len(self._counts)
+        # Offset each register's levels, so that a single count covers the whole matrix
+        keys = heat.astype(np.int64) + np.arange(len(Register)) * levels
+        self._counts += np.bincount(keys.ravel(), minlength=levels * len(Register)).reshape(len(Register), levels).T
+
+    def result(self) -> np.ndarray:
+        return self._counts
+
+
+class MeanHeat(HeatReducer):
+    """
+    Compute the mean heat of each register over all the lines.
+
+    The result is the vector of the mean heat levels, or None if no line has been seen.
+    """
+
+    def __init__(self):
+        self._sums = np.zeros(len(Register), dtype=np.int64)
+        self._count = 0
+
+    def update(self, lines: np.ndarray, heat: np.ndarray) -> None:
+        self._sums += heat.sum(axis=0, dtype=np.int64)
+        self._count += len(lines)
+
+    def result(self) -> Optional[np.ndarray]:
+        return self._sums / self._count if self._count > 0 else None
+
+
+class GroupedMeanHeat(HeatReducer):
+    """
+    Compute the mean heat of each register over some groups of lines, such as the ones of each procedure.
+
+    Groups are specified as non-overlapping ranges of lines, with the ending line excluded. Lines outside of all the
+    ranges are ignored. The result maps every group having at least a line to its mean heat vector.
+    """
+
+    def __init__(self, ranges: Mapping[Hashable, Tuple[int, int]]):
+        ordered = sorted(ranges.items(), key=lambda item: item[1])
+        self._groups = [group for group, _ in ordered]
+        self._begins = np.array([begin for _, (begin, _) in ordered], dtype=np.int64)
+        self._ends = np.array([end for _, (_, end) in ordered], dtype=np.int64)
+        self._sums = np.zeros((len(ordered), len(Register)), dtype=np.int64)
+        self._counts = np.zeros(len(ordered), dtype=np.int64)
+
+    def update(self, lines: np.ndarray, heat: np.ndarray) -> None:
+        groups = np.searchsorted(self._begins, lines, side='right') - 1
+        inside = (groups >= 0) & (lines < self._ends[np.maximum(groups, 0)])
+        np.add.at(self._sums, groups[inside], heat[inside].astype(np.int64))
+        self._counts += np.bincount(groups[inside], minlength=len(self._groups))
+
+    def result(self) -> Mapping[Hashable, np.ndarray]:
+        return {g: self._sums[i] / self._counts[i] for i, g in enumerate(self._groups) if self._counts[i] > 0}
+
+
+def reduce_heat(blocks: Iterable[Tuple[np.ndarray, np.ndarray]], *reducers: HeatReducer) -> List[Any]:
+    """
+    Feed a stream of block heat to some reducers, and collect their results.
+
+    :param blocks: an iterator over pairs of line numbers and heat matrices, as produced by :func:`stream_block_heat`
+    :param reducers: the reducers to be updated
+    :return: the results of the reducers, in the same order
+    """
+
+    for lines, heat in blocks:
+        for reducer in reducers:
+            reducer.update(lines, heat)
+
+    return [reducer.result() for reducer in reducers]
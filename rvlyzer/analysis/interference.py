@@ -0,0 +1,234 @@
+"""
+This module provides register pressure profiles and register interference graphs, derived from liveness.
+
+Two registers interfere if they are live at the same time at some point of the program, i.e. if their values must be
+kept apart. Interference among the 32 registers is represented as a bit-matrix: a vector of 32 integers, the i-th of
+which holds the set of registers interfering with register i. A matrix is computed for each region of the program (by
+default, each basic block), and matrices for arbitrary ranges of lines are computed on demand.
+
+The pressure at a line is the number of registers live right before or right after it. Range queries over pressure and
+over the set of occupied registers are backed by sparse tables, which answer them without visiting the range's lines,
+so that searching for a register that is free throughout a stretch of code does not require scanning it.
+"""
+
+from __future__ import annotations
+
+from typing import Union, Optional, Mapping, Hashable, Tuple, Dict, Callable
+
+import numpy as np
+from networkx import DiGraph, Graph
+
+from rep.base import Register
+from analysis.graphs import LocalGraph
+from analysis.liveness import Liveness
+
+_VALID = ~(1 << Register.ZERO.value) & 0xFFFFFFFF
+
+
+def _popcount(sets: np.ndarray) -> np.ndarray:
+    # Count the registers in each set
+    bits = np.unpackbits(sets.astype('<u4').view(np.uint8).reshape(-1, 4), axis=1)
+    return bits.sum(axis=1, dtype=np.uint8)
+
+
+def _bit_matrix(sets: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # Compute the interference matrix of each [start, end) range of sets, which must not be empty: row r of a range's
+    # matrix is the union of the range's sets containing r
+    padded = np.append(sets, np.uint32(0))
+    bounds = np.stack((starts, ends), axis=1).ravel()
+    matrices = np.empty((len(starts), len(Register)), dtype=np.uint32)
+    for r in range(len(Register)):
+        holding = np.where(padded >> np.uint32(r) & np.uint32(1), padded, np.uint32(0))
+        matrices[:, r] = np.bitwise_or.reduceat(holding, bounds)[::2]
+
+    return matrices
+
+
+class _SparseTable:
+    # Answers range queries for an idempotent operation in constant time, by precomputing the result over all the ranges
+    # whose length is a power of two
+
+    def __init__(self, values: np.ndarray, operation: Callable[[np.ndarray, np.ndarray], np.ndarray]):
+        self._operation = operation
+        self._levels = [values]
+        width = 1
+        while 2 * width <= len(values):
+            previous = self._levels[-1]
+            self._levels.append(operation(previous[:len(previous) - width], previous[width:]))
+            width *= 2
+
+    def query(self, low: int, high: int, empty: int) -> Union[np.generic, int]:
+        if low >= high:
+            return empty
+
+        level = (high - low).bit_length() - 1
+        values = self._levels[level]
+        return self._operation(values[low], values[high - (1 << level)])
+
+
+class RegisterPressure:
+    """
+    The register pressure profile and the interference matrices of a CFG.
+
+    The `zero` register never takes part in either of them.
+
+    :ivar liveness: the liveness analysis on which the profile is based
+    :ivar lines: the sorted array of the line numbers of the analyzed instructions
+    :ivar occupied: the set of registers live right before or right after each line
+    :ivar pressure: the number of registers live right before or right after each line, whichever is greater
+    :ivar regions: the range of lines, with the ending one excluded, spanned by each region
+    """
+
+    liveness: Liveness
+    lines: np.ndarray
+    occupied: np.ndarray
+    pressure: np.ndarray
+    regions: Mapping[Hashable, Tuple[int, int]]
+
+    def __init__(self,
+                 cfg: Union[LocalGraph, DiGraph],
+                 regions: Optional[Mapping[Hashable, Tuple[int, int]]] = None,
+                 liveness: Optional[Liveness] = None):
+        """
+        Build the pressure profile and the interference matrices of a CFG.
+
+        If no region is specified, each node holding a block is a region, spanning the block's lines.
+
+        :param cfg: a local graph, a legacy CFG or an execution graph
+        :param regions: a mapping from some identifiers to ranges of lines, with the ending line excluded
+        :param liveness: the liveness analysis of the CFG, if already available
+        """
+
+        self.liveness = Liveness(cfg) if liveness is None else liveness
+        self.lines = self.liveness.lines
+        before = self.liveness.before & np.uint32(_VALID)
+        after = self.liveness.after & np.uint32(_VALID)
+        self.occupied = before | after
+        self.pressure = np.maximum(_popcount(before), _popcount(after))
+
+        # Interference is computed over the program points before and after each line, interleaved
+        self._points = np.stack((before, after), axis=1).ravel()
+
+        if regions is None:
+            graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+            blocks = ((n, graph.nodes[n].get('block')) for n in graph if not graph.nodes[n].get('external', False))
+            regions = {n: (b.begin, b.end) for n, b in blocks if b is not None}
+        self.regions = {}
+        self._matrices: Dict[Hashable, np.ndarray] = {}
+
+        identifiers, starts, ends = [], [], []
+        for identifier, (begin, end) in regions.items():
+            self.regions[identifier] = begin, end
+            low, high = self._rows(begin, end)
+            if low < high:
+                identifiers.append(identifier)
+                starts.append(2 * low)
+                ends.append(2 * high)
+        if len(identifiers) > 0:
+            matrices = _bit_matrix(self._points, np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+            self._matrices = dict(zip(identifiers, matrices))
+
+        self._max_pressure = _SparseTable(self.pressure, np.maximum)
+        self._occupied = _SparseTable(self.occupied, np.bitwise_or)
+
+    def _rows(self, begin: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        low = 0 if begin is None else int(np.searchsorted(self.lines, begin))
+        high = len(self.lines) if end is None else int(np.searchsorted(self.lines, end))
+        return low, high
+
+    def max_pressure(self, begin: Optional[int] = None, end: Optional[int] = None) -> int:
+        """
+        Compute the maximum register pressure over a range of lines.
+
+        :param begin: the first line of the range, or None to start from the first line
+        :param end: the line ending the range, excluded, or None to reach the last line
+        :return: the maximum pressure, or 0 if the range holds no analyzed instruction
+        """
+
+        return int(self._max_pressure.query(*self._rows(begin, end), 0))
+
+    def occupied_registers(self, begin: Optional[int] = None, end: Optional[int] = None) -> int:
+        """
+        Compute the set of the registers that are live at some point of a range of lines.
+
+        :param begin: the first line of the range, or None to start from the first line
+        :param end: the line ending the range, excluded, or None to reach the last line
+        :return: the set of the occupied registers, as an integer
+        """
+
+        return int(self._occupied.query(*self._rows(begin, end), 0))
+
+    def free_registers(self, begin: Optional[int] = None, end: Optional[int] = None) -> int:
+        """
+        Compute the set of the registers that are dead throughout a range of lines.
+
+        These registers can be freely overwritten right before the range's first line, and up to the range's last line.
+
+        :param begin: the first line of the range, or None to start from the first line
+        :param end: the line ending the range, excluded, or None to reach the last line
+        :return: the set of the free registers, `zero` excluded, as an integer
+        """
+
+        return ~self.occupied_registers(begin, end) & _VALID
+
+    def region_interference(self, region: Hashable) -> np.ndarray:
+        """
+        Return the interference matrix of a region.
+
+        :param region: the identifier of a region
+        :return: a vector holding, for each register, the set of registers interfering with it, as integers
+        :raise KeyError: when the region does not exist
+        """
+
+        if region not in self.regions:
+            raise KeyError(region)
+
+        return self._matrices.get(region, np.zeros(len(Register), dtype=np.uint32))
+
+    def interference(self, begin: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """
+        Compute the interference matrix of a range of lines.
+
+        :param begin: the first line of the range, or None to start from the first line
+        :param end: the line ending the range, excluded, or None to reach the last line
+        :return: a vector holding, for each register, the set of registers interfering with it, as integers
+        """
+
+        low, high = self._rows(begin, end)
+        if low >= high:
+            return np.zeros(len(Register), dtype=np.uint32)
+
+        return _bit_matrix(self._points, np.array([2 * low]), np.array([2 * high]))[0]
+
+
+def interferes(matrix: np.ndarray, a: Register, b: Register) -> bool:
+    """
+    Check whether two registers interfere, according to an interference matrix.
+
+    :param matrix: an interference matrix
+    :param a: a register
+    :param b: another register
+    :return: True if the registers are live at the same time somewhere, False otherwise
+    """
+
+    return a is not b and bool(int(matrix[a.value]) >> b.value & 1)
+
+
+def interference_graph(matrix: np.ndarray) -> Graph:
+    """
+    Convert an interference matrix into an undirected NetworkX graph.
+
+    Nodes are the registers that are live somewhere, and edges connect the interfering ones.
+
+    :param matrix: an interference matrix
+    :return: the interference graph
+    """
+
+    graph = Graph()
+    for r in Register:
+        row = int(matrix[r.value])
+        if row >> r.value & 1:
+            graph.add_node(r)
+        graph.add_edges_from((r, s) for s in Register if s.value > r.value and row >> s.value & 1)
+
+    return graph
@@ -0,0 +1,235 @@
+"""
+This module provides the linking of many compilation units into a whole program.
+
+Linking works on a global symbol index, built with a single pass over each unit: the unit is split into procedures, and
+the symbolic destinations of the calls found in each of them are recorded. Procedures declared as global symbols are
+visible from every unit, while the others are only visible from their own unit, where they shadow global symbols with
+the same name, as static functions do.
+
+The call graph of the whole program is built out of the index alone. Procedure CFGs are only built when asked for, from
+units that are loaded on demand: units given as JSON files or encoded sources are not kept in memory after indexing,
+but for a bounded number of recently used ones.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import NamedTuple, List, Tuple, Dict, Optional, Union, Sequence, Iterator
+
+from networkx import DiGraph
+
+from rep.base import Instruction, to_line_iterator
+from rep.fragments import Source, FragmentView
+from analysis.batch import Unit, load_unit
+from analysis.graphs import InvalidCodeError, LocalGraph, ProcedureCall, Transition, jump_ops, basic_blocks, local_cfg
+from analysis.procedures import Procedure, procedure_ranges
+
+
+class Symbol(NamedTuple):
+    """
+    A procedure defined by a compilation unit.
+
+    :var unit: the index of the unit defining the procedure
+    :var procedure: the procedure
+    """
+
+    unit: int
+    procedure: Procedure
+
+    @property
+    def name(self) -> str:
+        return self.procedure.name
+
+
+class CallSite(NamedTuple):
+    """
+    A call performed by a procedure.
+
+    :var line: the line of the calling instruction
+    :var callee: the symbolic name of the called procedure
+    """
+
+    line: int
+    callee: str
+
+
+class Program:
+    """
+    A program made of many compilation units, linked through a global symbol index.
+
+    :ivar units: the compilation units
+    :ivar symbols: the procedures defined by each unit, in order of appearance
+    :ivar call_sites: the calls performed by each procedure
+    """
+
+    units: List[Unit]
+    symbols: List[List[Symbol]]
+    call_sites: Dict[Symbol, List[CallSite]]
+
+    def __init__(self, units: Sequence[Unit], max_loaded: int = 16, max_cached: int = 1024):
+        """
+        Index the procedures of a collection of compilation units.
+
+        :param units: the compilation units
+        :param max_loaded: the maximum number of units kept in memory after being loaded, among those that are not
+               sources already
+        :param max_cached: the maximum number of procedure CFGs kept in memory after being built
+        :raise InvalidCodeError: when the same global symbol is defined by more than one unit
+        """
+
+        self.units = list(units)
+        self.symbols = []
+        self.call_sites = {}
+        self._globals: Dict[str, Symbol] = {}
+        self._locals: List[Dict[str, Symbol]] = []
+        self._max_loaded = max_loaded
+        self._loaded: OrderedDict[int, Source] = OrderedDict()
+        self._max_cached = max_cached
+        self._cached: OrderedDict[Symbol, LocalGraph] = OrderedDict()
+
+        for index, unit in enumerate(self.units):
+            source = self.source(index)
+            symbols = [Symbol(index, p) for p in procedure_ranges(source)]
+            self.symbols.append(symbols)
+            self._locals.append({})
+
+            for symbol in symbols:
+                if symbol.procedure.exported:
+                    if symbol.name in self._globals:
+                        raise InvalidCodeError("Symbol " + symbol.name + " defined by units " +
+                                               str(self._globals[symbol.name].unit) + " and " + str(index))
+                    self._globals[symbol.name] = symbol
+                else:
+                    self._locals[index][symbol.name] = symbol
+                self.call_sites[symbol] = []
+
+            # Procedures do not overlap and appear in order, so their calls are collected in a single pass
+            k = 0
+            for number, statement in to_line_iterator(iter(source), source.begin):
+                while k < len(symbols) and symbols[k].procedure.end <= number:
+                    k += 1
+                if k == len(symbols):
+                    break
+                if symbols[k].procedure.begin <= number and isinstance(statement, Instruction) \
+                        and jump_ops.get(statement.opcode) is Transition.CALL \
+                        and statement.immediate is not None and statement.immediate.symbol is not None:
+                    self.call_sites[symbols[k]].append(CallSite(number, statement.immediate.symbol))
+
+    def source(self, unit: int) -> Source:
+        """
+        Return the source of a unit, loading it if needed.
+
+        :param unit: the index of the unit
+        :return: the unit's source
+        """
+
+        if isinstance(self.units[unit], Source):
+            return self.units[unit]
+
+        source = self._loaded.get(unit)
+        if source is None:
+            source = load_unit(self.units[unit])
+            self._loaded[unit] = source
+            if len(self._loaded) > self._max_loaded:
+                self._loaded.popitem(last=False)
+        else:
+            self._loaded.move_to_end(unit)
+
+        return source
+
+    def lookup(self, name: str, unit: Optional[int] = None) -> Optional[Symbol]:
+        """
+        Find the procedure a symbol refers to.
+
+        :param name: the symbol's name
+        :param unit: the index of the unit referring to the symbol, whose local symbols take precedence over global
+               ones, or None to only look for global symbols
+        :return: the procedure, or None if the symbol is undefined
+        """
+
+        if unit is not None:
+            symbol = self._locals[unit].get(name)
+            if symbol is not None:
+                return symbol
+
+        return self._globals.get(name)
+
+    def resolve(self, caller: Symbol, call: Union[CallSite, ProcedureCall]) -> Optional[Symbol]:
+        """
+        Find the procedure called by a call performed by a procedure.
+
+        :param caller: the calling procedure
+        :param call: a call site of the procedure, or an external call of its CFG
+        :return: the called procedure, or None if it is undefined
+        """
+
+        return self.lookup(call.callee, caller.unit)
+
+    def __iter__(self) -> Iterator[Symbol]:
+        for symbols in self.symbols:
+            yield from symbols
+
+    def __len__(self) -> int:
+        return sum(len(symbols) for symbols in self.symbols)
+
+    def cfg(self, symbol: Symbol) -> LocalGraph:
+        """
+        Return the local graph of a procedure, building it if needed.
+
+        The graph's blocks are views on the source of the procedure's unit.
+
+        :param symbol: the procedure
+        :return: the procedure's local graph
+        :raise InvalidCodeError: when the procedure cannot be split into basic blocks
+        """
+
+        cfg = self._cached.get(symbol)
+        if cfg is None:
+            procedure = symbol.procedure
+            code = FragmentView(self.source(symbol.unit), procedure.begin, procedure.end, procedure.begin)
+            cfg = local_cfg(basic_blocks(code))
+            self._cached[symbol] = cfg
+            if len(self._cached) > self._max_cached:
+                self._cached.popitem(last=False)
+        else:
+            self._cached.move_to_end(symbol)
+
+        return cfg
+
+    def resolve_calls(self, symbol: Symbol) -> List[Tuple[ProcedureCall, Optional[Symbol]]]:
+        """
+        Resolve the external calls of a procedure's local graph.
+
+        :param symbol: the procedure
+        :return: each external call of the procedure's local graph, paired with the called procedure, or None if the
+                 callee is undefined
+        :raise InvalidCodeError: when the procedure cannot be split into basic blocks
+        """
+
+        return [(call, self.resolve(symbol, call)) for call in self.cfg(symbol).external_calls]
+
+    def call_graph(self) -> DiGraph:
+        """
+        Build the call graph of the program.
+
+        Nodes are procedures, identified by their symbols, and undefined callees, identified by their names and marked
+        by an `external` attribute set to True. Each edge carries a `sites` attribute, holding the lines of the calls
+        it represents.
+
+        :return: the call graph
+        """
+
+        graph = DiGraph()
+        graph.add_nodes_from(self, external=False)
+        for caller, sites in self.call_sites.items():
+            for site in sites:
+                callee = self.resolve(caller, site)
+                if callee is None:
+                    graph.add_node(site.callee, external=True)
+                    callee = site.callee
+                if graph.has_edge(caller, callee):
+                    graph.edges[caller, callee]['sites'].append(site.line)
+                else:
+                    graph.add_edge(caller, callee, sites=[site.line])
+
+        return graph
@@ -0,0 +1,481 @@
+"""
+This module provides the liveness and reaching definitions analyses of registers.
+
+Sets of registers are packed into integers, with bit `i` representing the register whose value is `i`, so that unions,
+intersections and differences boil down to a single bitwise operation. Both analyses summarize every basic block once,
+and then propagate their values block by block through the engine of :mod:`analysis.dataflow`; per-line results are
+derived from the block-level ones only at the end.
+
+The registers defined and used by an instruction are derived from its operands, according to `rep.base.opcodes`.
+Procedure calls and returns are handled according to the standard RISC-V calling convention: calls use the argument
+registers and clobber all the caller-saved ones, while returns use the return value registers and the callee-saved ones.
+The `zero` register is never considered to be defined or used.
+"""
+
+from __future__ import annotations
+
+from functools import reduce
+from itertools import chain
+from operator import or_
+from typing import NamedTuple, Iterable, FrozenSet, Tuple, Union, Dict, List, Hashable, Optional
+
+import numpy as np
+from networkx import DiGraph
+
+from rep.base import Instruction, Register, opcodes, to_line_iterator
+from rep.fragments import CodeFragment
+from analysis.dataflow import forward_dataflow, DataflowResult
+from analysis.graphs import LocalGraph, Transition, jump_ops
+
+
+def register_set(registers: Iterable[Register]) -> int:
+    """
+    Pack some registers into a set.
+
+    :param registers: the registers to be packed
+    :return: the set of the registers, as an integer
+    """
+
+    return reduce(or_, (1 << r.value for r in registers), 0)
+
+
+def registers_of(bits: int) -> FrozenSet[Register]:
+    """
+    Unpack a set of registers.
+
+    :param bits: the set of registers, as an integer
+    :return: the registers belonging to the set
+    """
+
+    return frozenset(r for r in Register if bits >> r.value & 1)
+
+
+CALL_USES: int = register_set([Register.SP, Register.A0, Register.A1, Register.A2, Register.A3, Register.A4,
+                               Register.A5, Register.A6, Register.A7])
+"""The registers used by a procedure call: the argument registers and the stack pointer."""
+
+CALL_DEFS: int = register_set([Register.RA, Register.T0, Register.T1, Register.T2, Register.T3, Register.T4,
+                               Register.T5, Register.T6, Register.A0, Register.A1, Register.A2, Register.A3,
+                               Register.A4, Register.A5, Register.A6, Register.A7])
+"""The registers defined by a procedure call: the return address and all the caller-saved registers."""
+
+RETURN_USES: int = register_set([Register.SP, Register.A0, Register.A1, Register.S0, Register.S1, Register.S2,
+                                 Register.S3, Register.S4, Register.S5, Register.S6, Register.S7, Register.S8,
+                                 Register.S9, Register.S10, Register.S11])
+"""The registers used by a procedure return, besides the one holding the return address: the return value registers,
+the stack pointer and the callee-saved registers."""
+
+_VALID = ~(1 << Register.ZERO.value) & 0xFFFFFFFF
+
+
+def register_effects(inst: Instruction) -> Tuple[int, int]:
+    """
+    Determine the registers defined and used by an instruction.
+
+    :param inst: the instruction to be inspected
+    :return: a tuple made of the set of defined registers and the set of used registers
+    """
+
+    nregs, writes = opcodes[inst.opcode]
+    operands = (inst.r1, inst.r2, inst.r3)[:nregs]
+    defs, uses = 0, 0
+    if writes and nregs > 0 and inst.r1 is not None:
+        defs = 1 << inst.r1.value
+        operands = operands[1:]
+    for r in operands:
+        if r is not None:
+            uses |= 1 << r.value
+
+    transition = jump_ops.get(inst.opcode)
+    if transition is Transition.CALL:
+        defs |= CALL_DEFS
+        uses |= CALL_USES
+    elif transition is Transition.RETURN:
+        uses |= RETURN_USES
+
+    return defs & _VALID, uses & _VALID
+
+
+class BlockEffects(NamedTuple):
+    """
+    The registers defined and used by a basic block's instructions.
+
+    :var lines: the line numbers of the block's instructions
+    :var defs: the set of registers defined by each instruction
+    :var uses: the set of registers used by each instruction
+    """
+
+    lines: np.ndarray
+    defs: np.ndarray
+    uses: np.ndarray
+
+
+def block_effects(node: dict) -> BlockEffects:
+    """
+    Collect the registers defined and used by the instructions of a CFG node.
+
+    External nodes, and nodes without a block such as the calling environment of legacy CFGs, are treated as empty
+    blocks.
+
+    :param node: the CFG node to be inspected
+    :return: the effects of the node's block
+    """
+
+    lines, defs, uses = [], [], []
+    if not node.get('external', False) and 'block' in node:
+        block: CodeFragment = node['block']
+        for line in to_line_iterator(iter(block), block.begin):
+            if isinstance(line.statement, Instruction):
+                d, u = register_effects(line.statement)
+                lines.append(line.number)
+                defs.append(d)
+                uses.append(u)
+
+    return BlockEffects(np.array(lines, dtype=np.int64), np.array(defs, dtype=np.uint32),
+                        np.array(uses, dtype=np.uint32))
+
+
+def flow_graph(cfg: Union[LocalGraph, DiGraph], reverse: bool = False) -> Tuple[DiGraph, DiGraph, List[Hashable]]:
+    """
+    Extract the bare structure of the control flow of a CFG, as needed by register analyses.
+
+    Execution resumes at the confluence point of external calls, so these are linked to their callers. The calling
+    environment of legacy CFGs is left out. The entry-points are those of a local graph, node 1 of a legacy CFG, or the
+    nodes without incoming edges of other digraphs.
+
+    :param cfg: a local graph, a legacy CFG or an execution graph
+    :param reverse: whether the edges of the control flow should be reversed
+    :return: a tuple made of a new digraph holding the control flow, the graph holding the nodes' attributes and the
+             list of the entry-points
+    """
+
+    if isinstance(cfg, LocalGraph):
+        graph = cfg.graph
+        nodes = graph.nodes
+        edges = chain(graph.edges, ((c.caller, c.confluence_point) for c in cfg.external_calls))
+    else:
+        graph = cfg
+        legacy = 0 in cfg and 'block' not in cfg.nodes[0]
+        nodes = (n for n in graph if not legacy or n != 0)
+        edges = (e for e in graph.edges if not legacy or 0 not in e)
+
+    flow = DiGraph()
+    flow.add_nodes_from(nodes)
+    flow.add_edges_from(((v, u) for u, v in edges) if reverse else edges)
+
+    if isinstance(cfg, LocalGraph):
+        entries = list(cfg.entry_point_ids)
+    elif legacy:
+        entries = [1]
+    else:
+        entries = [n for n in flow if (flow.out_degree(n) if reverse else flow.in_degree(n)) == 0]
+
+    return flow, graph, entries
+
+
+class _LineIndex:
+    # A dense index from line numbers to rows, for constant-time lookups
+
+    def __init__(self, lines: np.ndarray):
+        self.lines = np.unique(lines)
+        self._first = int(self.lines[0]) if len(self.lines) > 0 else 0
+        self._rows = np.full(int(self.lines[-1]) - self._first + 1 if len(self.lines) > 0 else 0, -1, dtype=np.int64)
+        self._rows[self.lines - self._first] = np.arange(len(self.lines))
+
+    def rows(self, lines: np.ndarray) -> np.ndarray:
+        return self._rows[lines - self._first]
+
+    def row(self, line: int) -> int:
+        offset = line - self._first
+        row = int(self._rows[offset]) if 0 <= offset < len(self._rows) else -1
+        if row < 0:
+            raise KeyError(line)
+        return row
+
+
+class Liveness:
+    """
+    The register liveness analysis of a CFG.
+
+    A register is live at a point of the program if its current value may be used by some instruction before being
+    redefined. Liveness is a backward problem: the registers live at the end of a block are those live at the beginning
+    of its successors, and those live at the beginning of a block are the ones it uses before defining them (its GEN
+    set) along with the ones live at its end that it does not define (those outside its KILL set).
+
+    Per-line results are stored in two arrays indexed through a dense table, so that queries take constant time. Lines
+    belonging to multiple nodes, as happens in execution graphs, are live whenever they are live in any of them.
+
+    :ivar graph: the analyzed control flow, reversed, with external calls linked to their confluence points
+    :ivar result: the fixpoint reached by the analysis over the reversed control flow: the input of a node is the set
+                  of registers live at its end, its output the set of registers live at its beginning
+    :ivar lines: the sorted array of the line numbers of the analyzed instructions
+    :ivar before: the set of registers live before each line
+    :ivar after: the set of registers live after each line
+    """
+
+    graph: DiGraph
+    result: DataflowResult
+    lines: np.ndarray
+    before: np.ndarray
+    after: np.ndarray
+
+    def __init__(self, cfg: Union[LocalGraph, DiGraph]):
+        """
+        Carry out the liveness analysis of a CFG.
+
+        All nodes are analyzed, even those from which no exit can be reached. No register is considered to be live
+        after an exit, apart from those used by return instructions.
+
+        :param cfg: a local graph, a legacy CFG or an execution graph
+        """
+
+        self.graph, attributes, _ = flow_graph(cfg, reverse=True)
+        effects = {n: block_effects(attributes.nodes[n]) for n in self.graph}
+
+        gen: Dict[Hashable, int] = {}
+        kill: Dict[Hashable, int] = {}
+        for node, block in effects.items():
+            g, k = 0, 0
+            for d, u in zip(reversed(block.defs.tolist()), reversed(block.uses.tolist())):
+                g = u | (g & ~d)
+                k |= d
+            gen[node], kill[node] = g, k
+
+        # Every node starts with nothing live at its end; exits come first, so that they drive the visiting order
+        exits = (n for n in self.graph if self.graph.in_degree(n) == 0)
+        boundary = dict.fromkeys(chain(exits, self.graph), 0)
+
+        self.result = forward_dataflow(self.graph,
+                                       boundary,
+                                       lambda n, live: gen[n] | (live & ~kill[n]),
+                                       lambda values: reduce(or_, values))
+
+        # Draw the live sets of every line, scanning each block backwards from its end
+        all_lines, all_before, all_after = [], [], []
+        for node, block in effects.items():
+            live = self.result.inputs[node]
+            before, after = [], []
+            for d, u in zip(reversed(block.defs.tolist()), reversed(block.uses.tolist())):
+                after.append(live)
+                live = u | (live & ~d)
+                before.append(live)
+            before.reverse()
+            after.reverse()
+            all_lines.append(block.lines)
+            all_before.append(before)
+            all_after.append(after)
+
+        lines = np.concatenate(all_lines) if len(all_lines) > 0 else np.empty(0, dtype=np.int64)
+        self._index = _LineIndex(lines)
+        self.lines = self._index.lines
+        rows = self._index.rows(lines)
+        self.before = np.zeros(len(self.lines), dtype=np.uint32)
+        self.after = np.zeros(len(self.lines), dtype=np.uint32)
+        np.bitwise_or.at(self.before, rows, np.fromiter((b for bs in all_before for b in bs), np.uint32, len(lines)))
+        np.bitwise_or.at(self.after, rows, np.fromiter((a for af in all_after for a in af), np.uint32, len(lines)))
+
+    def live_in(self, node: Hashable) -> int:
+        """
+        Return the set of registers live at the beginning of a node.
+
+        :param node: a node of the CFG
+        :return: the set of live registers, as an integer
+        """
+
+        return self.result.outputs[node]
+
+    def live_out(self, node: Hashable) -> int:
+        """
+        Return the set of registers live at the end of a node.
+
+        :param node: a node of the CFG
+        :return: the set of live registers, as an integer
+        """
+
+        return self.result.inputs[node]
+
+    def live_before(self, line: int) -> int:
+        """
+        Return the set of registers live right before a line is executed.
+
+        :param line: the line number of an instruction
+        :return: the set of live registers, as an integer
+        :raise KeyError: when the line does not hold an analyzed instruction
+        """
+
+        return int(self.before[self._index.row(line)])
+
+    def live_after(self, line: int) -> int:
+        """
+        Return the set of registers live right after a line is executed.
+
+        :param line: the line number of an instruction
+        :return: the set of live registers, as an integer
+        :raise KeyError: when the line does not hold an analyzed instruction
+        """
+
+        return int(self.after[self._index.row(line)])
+
+    def is_live(self, line: int, register: Register) -> bool:
+        """
+        Check whether a register is live right before a line is executed.
+
+        :param line: the line number of an instruction
+        :param register: the register to be checked
+        :return: True if the register is live, False otherwise
+        :raise KeyError: when the line does not hold an analyzed instruction
+        """
+
+        return bool(self.live_before(line) >> register.value & 1)
+
+
+ENTRY_DEFINITION: int = -1
+"""The line number standing for the definitions made by the caller, which reach the entry-points."""
+
+Definitions = Tuple[FrozenSet[int], ...]
+"""The definitions reaching a point of the program: for every register, the set of the lines defining it."""
+
+
+def _merge_definitions(values: List[Definitions]) -> Definitions:
+    if len(values) == 1:
+        return values[0]
+
+    return tuple(column[0].union(*column[1:]) for column in zip(*values))
+
+
+class ReachingDefinitions:
+    """
+    The reaching definitions analysis of a CFG.
+
+    A definition of a register reaches a point of the program if some execution path leads from the definition to the
+    point without redefining the register. Definitions are identified by the line number of the defining instruction,
+    with :data:`ENTRY_DEFINITION` standing for the values the registers hold on entering the CFG.
+
+    The definitions reaching each node are stored per register, and those reaching each line are derived on demand by
+    scanning the line's block. Def-use chains, linking every definition to the lines that may use it, are computed on
+    their first request.
+
+    :ivar graph: the analyzed control flow, with external calls linked to their confluence points
+    :ivar result: the fixpoint reached by the analysis
+    """
+
+    graph: DiGraph
+    result: DataflowResult
+
+    def __init__(self, cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]] = None):
+        """
+        Carry out the reaching definitions analysis of a CFG.
+
+        If no entry-point is given, the entry-points of a local graph, node 1 of a legacy CFG, or the nodes without
+        incoming edges of other digraphs are used.
+
+        :param cfg: a local graph, a legacy CFG or an execution graph
+        :param entries: the nodes from which execution starts
+        """
+
+        self.graph, attributes, default_entries = flow_graph(cfg)
+        self._effects = {n: block_effects(attributes.nodes[n]) for n in self.graph}
+        self._chains: Optional[Dict[Tuple[int, int], FrozenSet[int]]] = None
+
+        # Line of the last definition of each register, for every block
+        self._last: Dict[Hashable, Dict[int, int]] = {}
+        self._blocks: Dict[int, List[Tuple[Hashable, int]]] = {}
+        for node, block in self._effects.items():
+            last = {}
+            for position, (line, d) in enumerate(zip(block.lines.tolist(), block.defs.tolist())):
+                self._blocks.setdefault(line, []).append((node, position))
+                while d:
+                    r = (d & -d).bit_length() - 1
+                    last[r] = line
+                    d &= d - 1
+            self._last[node] = last
+
+        def transfer(node: Hashable, reaching: Definitions) -> Definitions:
+            last = self._last[node]
+            if len(last) == 0:
+                return reaching
+
+            reaching = list(reaching)
+            for r, line in last.items():
+                reaching[r] = frozenset((line,))
+            return tuple(reaching)
+
+        entry = frozenset((ENTRY_DEFINITION,))
+        boundary = {n: (entry,) * len(Register) for n in (default_entries if entries is None else entries)}
+        self.result = forward_dataflow(self.graph, boundary, transfer, _merge_definitions)
+
+    def reaching_in(self, node: Hashable) -> Definitions:
+        """
+        Return the definitions reaching the beginning of a node.
+
+        :param node: a node reachable from the entry-points
+        :return: the set of the definitions of each register, indexed by the register's value
+        """
+
+        return self.result.inputs[node]
+
+    def definitions(self, line: int, register: Register) -> FrozenSet[int]:
+        """
+        Return the definitions of a register reaching a line, right before it is executed.
+
+        :param line: the line number of a reachable instruction
+        :param register: the register whose definitions are requested
+        :return: the set of the lines defining the register
+        :raise KeyError: when the line does not hold a reachable instruction
+        """
+
+        result = set()
+        found = False
+        for node, position in self._blocks[line]:
+            if node not in self.result.inputs:
+                continue
+
+            found = True
+            defs = self._effects[node].defs
+            lines = self._effects[node].lines
+            mask = 1 << register.value
+            # Look for the last definition preceding the line in its block, falling back on those entering the block
+            for i in range(position - 1, -1, -1):
+                if int(defs[i]) & mask:
+                    result.add(int(lines[i]))
+                    break
+            else:
+                result.update(self.result.inputs[node][register.value])
+
+        if not found:
+            raise KeyError(line)
+
+        return frozenset(result)
+
+    def uses(self, line: int, register: Register) -> FrozenSet[int]:
+        """
+        Return the lines that may use the value of a register defined at a line.
+
+        :param line: the line number of a defining instruction, or :data:`ENTRY_DEFINITION`
+        :param register: the defined register
+        :return: the set of the lines using the definition
+        """
+
+        if self._chains is None:
+            self._chains = self._def_use_chains()
+
+        return self._chains.get((line, register.value), frozenset())
+
+    def _def_use_chains(self) -> Dict[Tuple[int, int], FrozenSet[int]]:
+        # Walk each reachable block forward, keeping track of the definitions of every register
+        chains: Dict[Tuple[int, int], set] = {}
+        for node, reaching in self.result.inputs.items():
+            current = list(reaching)
+            block = self._effects[node]
+            for line, d, u in zip(block.lines.tolist(), block.defs.tolist(), block.uses.tolist()):
+                while u:
+                    r = (u & -u).bit_length() - 1
+                    for definition in current[r]:
+                        chains.setdefault((definition, r), set()).add(line)
+                    u &= u - 1
+                while d:
+                    r = (d & -d).bit_length() - 1
+                    current[r] = frozenset((line,))
+                    d &= d - 1
+
+        return {key: frozenset(lines) for key, lines in chains.items()}
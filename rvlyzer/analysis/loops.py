@@ -0,0 +1,261 @@
+"""
+This module provides the structural analysis of loops inside CFGs.
+
+Loops are identified through their back edges, i.e. those edges whose destination dominates their origin. Each loop is
+characterized by its header (the destination of its back edges), its body and the edges through which execution can
+leave it. Loops sharing the same header are merged, so that natural loops always form a nesting forest.
+
+Retreating edges whose destination does not dominate their origin make a CFG irreducible. Such edges do not form any
+natural loop, and are reported separately.
+"""
+
+from __future__ import annotations
+
+from typing import Hashable, List, Optional, FrozenSet, Tuple, Iterable, Union, Dict, Iterator
+
+from networkx import DiGraph, strongly_connected_components
+
+from analysis.dominance import dominator_tree
+from analysis.graphs import LocalGraph, retreating_edges, simple_path_nodes
+
+Edge = Tuple[Hashable, Hashable]
+
+
+class Loop:
+    """
+    A natural loop.
+
+    :ivar header: the node through which execution enters the loop
+    :ivar body: the nodes belonging to the loop, header and nested loops included
+    :ivar back_edges: the edges closing the loop on its header
+    :ivar exits: the edges through which execution leaves the loop
+    :ivar parent: the innermost loop enclosing this one, if any
+    :ivar children: the loops immediately nested inside this one
+    """
+
+    header: Hashable
+    body: FrozenSet[Hashable]
+    back_edges: List[Edge]
+    exits: FrozenSet[Edge]
+    parent: Optional[Loop]
+    children: List[Loop]
+
+    def __init__(self, header: Hashable, body: FrozenSet[Hashable], back_edges: List[Edge], exits: FrozenSet[Edge]):
+        self.header = header
+        self.body = body
+        self.back_edges = back_edges
+        self.exits = exits
+        self.parent = None
+        self.children = []
+
+    @property
+    def depth(self) -> int:
+        """The nesting depth of this loop, with outermost loops having depth 1."""
+
+        depth = 1
+        loop = self.parent
+        while loop is not None:
+            depth += 1
+            loop = loop.parent
+
+        return depth
+
+    def __contains__(self, node: Hashable) -> bool:
+        return node in self.body
+
+    def __repr__(self):
+        return "Loop(header=" + repr(self.header) + ", size=" + repr(len(self.body)) + ")"
+
+
+class LoopForest:
+    """
+    The loop nesting forest of a CFG.
+
+    :ivar loops: all the natural loops, ordered from the outermost to the innermost
+    :ivar retreating_edges: the edges pointing backwards in a depth-first visit of the CFG
+    :ivar irreducible_edges: the retreating edges that are not back edges, i.e. the witnesses of irreducibility
+    """
+
+    loops: List[Loop]
+    retreating_edges: FrozenSet[Edge]
+    irreducible_edges: FrozenSet[Edge]
+
+    def __init__(self,
+                 loops: List[Loop],
+                 innermost: Dict[Hashable, Loop],
+                 retreating_edges: FrozenSet[Edge],
+                 irreducible_edges: FrozenSet[Edge]):
+        self.loops = loops
+        self.retreating_edges = retreating_edges
+        self.irreducible_edges = irreducible_edges
+        self._innermost = innermost
+
+    @property
+    def roots(self) -> List[Loop]:
+        """The outermost loops."""
+
+        return [lp for lp in self.loops if lp.parent is None]
+
+    @property
+    def headers(self) -> FrozenSet[Hashable]:
+        return frozenset(lp.header for lp in self.loops)
+
+    @property
+    def back_edges(self) -> FrozenSet[Edge]:
+        return self.retreating_edges.difference(self.irreducible_edges)
+
+    def loop_of(self, node: Hashable) -> Optional[Loop]:
+        """
+        Return the innermost loop containing a node.
+
+        :param node: a node of the CFG
+        :return: the innermost loop containing the node, or None if the node is not part of any loop
+        """
+
+        return self._innermost.get(node)
+
+    def depth(self, node: Hashable) -> int:
+        """
+        Return the loop nesting depth of a node.
+
+        :param node: a node of the CFG
+        :return: the number of loops containing the node
+        """
+
+        loop = self._innermost.get(node)
+        return 0 if loop is None else loop.depth
+
+    def loop_nodes(self) -> FrozenSet[Hashable]:
+        """
+        Return all the nodes that are part of some natural loop.
+
+        :return: a frozen set of nodes
+        """
+
+        return frozenset(self._innermost)
+
+    def __iter__(self) -> Iterator[Loop]:
+        return iter(self.loops)
+
+    def __len__(self) -> int:
+        return len(self.loops)
+
+
+def loop_forest(cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]] = None) -> LoopForest:
+    """
+    Compute the loop nesting forest of a CFG.
+
+    Entry-points are chosen as in :func:`analysis.dominance.dominator_tree`. The cost of the analysis is linear in the
+    size of the CFG multiplied by the maximum loop nesting depth.
+
+    :param cfg: a local graph or a NetworkX CFG
+    :param entries: the nodes from which execution starts
+    :return: the loop nesting forest of the CFG
+    """
+
+    graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+    domtree = dominator_tree(cfg, entries)
+    roots = [domtree.root] if domtree.root in graph else domtree.children(domtree.root)
+
+    retreating = retreating_edges(graph, roots)
+    back_edges: Dict[Hashable, List[Edge]] = {}
+    for latch, header in retreating:
+        if domtree.dominates(header, latch):
+            back_edges.setdefault(header, []).append((latch, header))
+
+    loops = []
+    for header, edges in back_edges.items():
+        # Collect the body by walking backwards from the latches, without crossing the header
+        body = {header}
+        stack = [latch for latch, _ in edges if latch != header]
+        body.update(stack)
+        while len(stack) > 0:
+            for pred in graph.pred[stack.pop()]:
+                if pred not in body and pred in domtree:
+                    body.add(pred)
+                    stack.append(pred)
+
+        exits = frozenset((u, v) for u in body for v in graph.adj[u] if v not in body)
+        loops.append(Loop(header, frozenset(body), edges, exits))
+
+    # Natural loops with distinct headers are either disjoint or nested: processing them from the smallest to the
+    # largest, each node gets assigned to its innermost loop and every loop gets attached to its parent.
+    loops.sort(key=lambda lp: len(lp.body))
+    innermost: Dict[Hashable, Loop] = {}
+    for loop in loops:
+        for node in loop.body:
+            inner = innermost.get(node)
+            if inner is None:
+                innermost[node] = loop
+                continue
+
+            while inner.parent is not None:
+                inner = inner.parent
+            if inner is not loop:
+                inner.parent = loop
+                loop.children.append(inner)
+
+    loops.reverse()
+    irreducible = frozenset(retreating.difference(e for edges in back_edges.values() for e in edges))
+
+    return LoopForest(loops, innermost, frozenset(retreating), irreducible)
+
+
+def _components_of(graph: DiGraph, edges: Iterable[Edge]) -> FrozenSet[Hashable]:
+    # Return the nodes belonging to the same strongly connected components as the given edges
+    edge_nodes = {n for e in edges for n in e}
+    return frozenset(n for component in strongly_connected_components(graph) if not edge_nodes.isdisjoint(component)
+                     for n in component)
+
+
+def loop_exclusive_nodes(cfg: Union[LocalGraph, DiGraph],
+                         entries: Iterable[Hashable],
+                         exits: Iterable[Hashable]) -> FrozenSet[Hashable]:
+    """
+    Find the nodes that can be reached only by traversing a loop's back edge.
+
+    A node is loop-exclusive if it belongs to a loop, but not to any acyclic path leading from an entry-point to an
+    exit. Nodes belonging to irreducible cycles are treated as loop nodes, while nodes that cannot be reached from the
+    entry-points are ignored.
+
+    In reducible CFGs, nodes on acyclic paths are those that can reach an exit without following any back edge, so
+    that the cost of the analysis is close to that of :func:`loop_forest`. Irreducible CFGs break this property, and the
+    acyclic paths going from the entry-points to the exits are searched by :func:`analysis.graphs.simple_path_nodes`
+    instead, in exponential time in the worst case.
+
+    :param cfg: a local graph or a NetworkX CFG
+    :param entries: the nodes from which execution starts
+    :param exits: the nodes through which execution leaves the CFG
+    :return: a frozen set of all the loop-exclusive nodes
+    """
+
+    graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+    entries = list(entries)
+    forest = loop_forest(graph, entries)
+
+    cyclic = set(forest.loop_nodes())
+    if len(forest.irreducible_edges) > 0:
+        cyclic.update(_components_of(graph, forest.irreducible_edges))
+
+    exits = set(exits)
+    if len(forest.irreducible_edges) == 0:
+        # Nodes on acyclic paths are those that can reach an exit without following retreating edges
+        on_paths = set(exits)
+        stack = list(on_paths)
+        while len(stack) > 0:
+            node = stack.pop()
+            for pred in graph.pred[node]:
+                if pred not in on_paths and (pred, node) not in forest.retreating_edges:
+                    on_paths.add(pred)
+                    stack.append(pred)
+    else:
+        # Look for simple paths going from a virtual source, preceding every entry-point, to a virtual sink, following
+        # every exit
+        source, sink = object(), object()
+        paths = DiGraph(graph.edges)
+        paths.add_edges_from((source, e) for e in entries if e in graph)
+        paths.add_edges_from((e, sink) for e in exits if e in graph)
+        paths.add_nodes_from((source, sink))
+        on_paths = simple_path_nodes(paths, source, sink, cyclic)
+
+    return frozenset(cyclic.difference(on_paths))
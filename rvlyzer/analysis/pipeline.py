@@ -0,0 +1,325 @@
+"""
+This module provides composable analysis pipelines, streaming work items through a sequence of stages.
+
+A stage is a function transforming an item into another one or, for expanding stages, into any number of items: a
+source is split into procedures, each procedure is turned into a CFG, each CFG into a heatmap, and so on. Pipelines are
+built by chaining stages with the `|` operator, and are evaluated lazily: every item produced by an expanding stage is
+carried through all the following stages before the next one is produced, so that results start flowing right away and
+no stage's output is ever materialized as a whole.
+
+Consecutive non-expanding stages are fused into a single call per item. Their outputs can be memoized in a cache keyed
+by the content digest of the item entering the fused chain, so that items already seen skip the whole chain up to the
+last cached stage. Finally, the items fed to a pipeline can be processed in parallel by a pool of threads or processes.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from functools import partial
+from hashlib import blake2b
+from json import load
+from typing import Generic, TypeVar, Callable, Iterable, Iterator, Any, Optional, MutableMapping, Tuple, List, Union, \
+    Deque, Dict, Hashable
+
+from networkx import DiGraph
+
+from rep.fragments import Source, CodeFragment, FragmentView, load_src_from_maps
+from analysis.graphs import LocalGraph, basic_blocks, local_cfg, exec_graph, internalize_calls
+from analysis.heatmaps import HeatMap, register_heatmap
+from analysis.procedures import Procedure, procedure_views
+from analysis.reachability import prune_unreachable
+
+_I = TypeVar('_I')
+_O = TypeVar('_O')
+
+_MISSING = object()
+
+
+def _feed_graph(digest: blake2b, graph: DiGraph) -> Dict[Hashable, int]:
+    # Feed the structure of a graph to a hash function, identifying nodes by their position, and return the positions
+    position = {n: i for i, n in enumerate(graph)}
+    digest.update(b'N' + str(len(position)).encode() + b':')
+    for _, data in graph.nodes(data=True):
+        _feed(digest, (list(data.get('labels', ())), data.get('block'), bool(data.get('external', False))))
+    for u, v, data in graph.edges(data=True):
+        kind = data.get('kind')
+        _feed(digest, (position[u], position[v], None if kind is None else kind.name, data.get('callee')))
+    digest.update(b';')
+    return position
+
+
+def _feed(digest: blake2b, obj: Any) -> None:
+    # Feed an unambiguous serialization of an object to a hash function
+    if isinstance(obj, LocalGraph):
+        digest.update(b'L')
+        position = _feed_graph(digest, obj.graph)
+        _feed(digest, [position[n] for n in obj.entry_point_ids])
+        _feed(digest, [(position[c.caller], c.callee, position[c.confluence_point]) for c in obj.external_calls])
+        _feed(digest, [position[n] for n in obj.terminal_nodes_ids])
+    elif isinstance(obj, DiGraph):
+        digest.update(b'G')
+        _feed_graph(digest, obj)
+    elif isinstance(obj, CodeFragment):
+        digest.update(b'F' + str(obj.begin).encode() + b':')
+        for statement in obj:
+            digest.update(repr(statement).encode() + b'\n')
+        digest.update(b';')
+    elif isinstance(obj, (tuple, list)):
+        digest.update(b'(')
+        for element in obj:
+            _feed(digest, element)
+        digest.update(b')')
+    elif isinstance(obj, str):
+        encoded = obj.encode()
+        digest.update(b'S' + str(len(encoded)).encode() + b':' + encoded)
+    elif isinstance(obj, bytes):
+        digest.update(b'B' + str(len(obj)).encode() + b':' + obj)
+    elif obj is None or isinstance(obj, (bool, int, float)):
+        digest.update(b'V' + repr(obj).encode() + b';')
+    else:
+        raise TypeError("Cannot compute the digest of an object of type " + type(obj).__name__)
+
+
+def content_digest(obj: Any) -> str:
+    """
+    Compute a digest of the content of an object.
+
+    Code fragments are digested along with the line at which they begin, so that fragments holding the same code at
+    different positions, and hence producing results with different line numbers, get different digests. Local graphs
+    and digraphs are digested through their structure: the labels, code blocks and `external` flags of their nodes,
+    and the kinds and callees of their edges. Node identifiers are left out, and nodes are rather identified by their
+    position in the graph, so that graphs built in the same way out of the same code get the same digest. Tuples,
+    lists, strings, bytes, numbers and None are supported as well.
+
+    :param obj: the object to be digested
+    :return: the hexadecimal digest of the object
+    :raise TypeError: when the object, or one of its elements, is not supported
+    """
+
+    digest = blake2b(digest_size=16)
+    _feed(digest, obj)
+    return digest.hexdigest()
+
+
+class Stage(Generic[_I, _O]):
+    """
+    A stage of a pipeline.
+
+    The function of a stage must be picklable, e.g. a module-level function or a partial application of one, for the
+    stage to be run by worker processes.
+
+    :ivar name: the stage's name, which identifies its outputs in a cache and must thus reflect its parameters
+    :ivar function: the function transforming an input item into an output item, or into an iterable of output items
+    :ivar expand: whether the function produces multiple items
+    :ivar memoize: whether the stage's outputs should be cached
+    """
+
+    name: str
+    function: Callable[[_I], Union[_O, Iterable[_O]]]
+    expand: bool
+    memoize: bool
+
+    def __init__(self, name: str, function: Callable[[_I], Union[_O, Iterable[_O]]], expand: bool = False,
+                 memoize: bool = False):
+        """
+        Define a new stage.
+
+        :param name: the stage's name
+        :param function: the function applied by the stage
+        :param expand: whether the function produces an iterable of items, instead of a single one
+        :param memoize: whether the stage's outputs should be cached, which is not supported for expanding stages
+        :raise ValueError: when memoization is requested for an expanding stage
+        """
+
+        if expand and memoize:
+            raise ValueError("Expanding stages cannot be memoized")
+
+        self.name = name
+        self.function = function
+        self.expand = expand
+        self.memoize = memoize
+
+    def __or__(self, other: Union[Stage, Pipeline]) -> Pipeline:
+        return Pipeline(self) | other
+
+    def __repr__(self):
+        return "Stage(" + repr(self.name) + ")"
+
+
+class Pipeline:
+    """
+    A sequence of stages through which items are streamed.
+
+    :ivar stages: the stages of the pipeline, in order of application
+    :ivar cache: the mapping from keys to stage outputs used for memoization, if any
+    """
+
+    stages: Tuple[Stage, ...]
+    cache: Optional[MutableMapping[str, Any]]
+
+    def __init__(self, *stages: Stage, cache: Optional[MutableMapping[str, Any]] = None):
+        """
+        Build a pipeline out of a sequence of stages.
+
+        :param stages: the stages of the pipeline
+        :param cache: a mapping in which memoized outputs are stored, or None to disable memoization
+        """
+
+        self.stages = tuple(stages)
+        self.cache = cache
+
+        # Split the stages into segments, each made of an optional expanding stage followed by a fused chain of
+        # non-expanding ones
+        self._segments: List[Tuple[Optional[Stage], List[Stage]]] = []
+        for stage in self.stages:
+            if stage.expand or len(self._segments) == 0:
+                self._segments.append((stage if stage.expand else None, []))
+            if not stage.expand:
+                self._segments[-1][1].append(stage)
+
+    def __or__(self, other: Union[Stage, Pipeline]) -> Pipeline:
+        return Pipeline(*self.stages, *(other.stages if isinstance(other, Pipeline) else [other]), cache=self.cache)
+
+    def with_cache(self, cache: Optional[MutableMapping[str, Any]]) -> Pipeline:
+        """
+        Return a copy of this pipeline, using a different cache.
+
+        :param cache: the new cache, or None to disable memoization
+        :return: the new pipeline
+        """
+
+        return Pipeline(*self.stages, cache=cache)
+
+    def _chain(self, stages: List[Stage], item: Any) -> Any:
+        # Apply a fused chain of stages, resuming from the last memoized output available
+        memoized = [k for k, s in enumerate(stages) if s.memoize] if self.cache is not None else []
+        if len(memoized) == 0:
+            for stage in stages:
+                item = stage.function(item)
+            return item
+
+        base = content_digest(item)
+        keys = {k: content_digest((base, [s.name for s in stages[:k + 1]])) for k in memoized}
+        start = 0
+        for k in reversed(memoized):
+            cached = self.cache.get(keys[k], _MISSING)
+            if cached is not _MISSING:
+                item = cached
+                start = k + 1
+                break
+
+        for k in range(start, len(stages)):
+            item = stages[k].function(item)
+            if k in keys:
+                self.cache[keys[k]] = item
+
+        return item
+
+    def _process(self, item: Any, segment: int = 0) -> Iterator[Any]:
+        # Lazily carry an item through the segments, starting from the given one
+        if segment == len(self._segments):
+            yield item
+            return
+
+        expanding, chain = self._segments[segment]
+        for sub in (expanding.function(item) if expanding is not None else [item]):
+            yield from self._process(self._chain(chain, sub), segment + 1)
+
+    def run(self, items: Iterable[Any], workers: int = 0, processes: bool = False) -> Iterator[Any]:
+        """
+        Stream some items through the pipeline.
+
+        Without workers, items are processed lazily, one at a time. Otherwise, the items are carried through the whole
+        pipeline by a pool of workers, a few per worker at a time, and their outputs are yielded in the same order in
+        which they are fed. Items are sent to worker processes, and their outputs back, by pickling them, so processes
+        pay off when items are compact, such as file paths. Note that each worker process operates on its own copy of
+        the cache, unless the cache is shared among processes by design.
+
+        :param items: the items to be processed
+        :param workers: the number of workers, or 0 to process the items in the calling thread
+        :param processes: whether workers should be processes instead of threads
+        :return: an iterator over the outputs of the last stage
+        """
+
+        if workers <= 0:
+            for item in items:
+                yield from self._process(item)
+            return
+
+        with (ProcessPoolExecutor if processes else ThreadPoolExecutor)(workers) as executor:
+            pending: Deque[Future] = deque()
+            for item in items:
+                pending.append(executor.submit(_collect, self, item))
+                if len(pending) >= 4 * workers:
+                    yield from pending.popleft().result()
+
+            while len(pending) > 0:
+                yield from pending.popleft().result()
+
+
+def _collect(pipeline: Pipeline, item: Any) -> List[Any]:
+    # Carry an item through a pipeline inside a worker, collecting its outputs
+    return list(pipeline._process(item))
+
+
+def _parse(path: str) -> Source:
+    with open(path) as file:
+        return load_src_from_maps(load(file))
+
+
+def _split(code: Union[Source, CodeFragment]) -> Iterator[Tuple[Procedure, FragmentView]]:
+    return procedure_views(code)
+
+
+def _cfg(item: Tuple[Procedure, CodeFragment]) -> Tuple[Procedure, LocalGraph]:
+    procedure, code = item
+    return procedure, local_cfg(basic_blocks(code))
+
+
+def _exec(item: Tuple[Procedure, LocalGraph]) -> Tuple[Procedure, DiGraph]:
+    procedure, cfg = item
+    return procedure, exec_graph(internalize_calls(cfg), procedure.name)
+
+
+def _prune(item: Tuple[Procedure, LocalGraph]) -> Tuple[Procedure, LocalGraph]:
+    procedure, cfg = item
+    return procedure, prune_unreachable(cfg)
+
+
+def _heat(max_heat: int, widening_delay: int, item: Tuple[Procedure, Union[LocalGraph, DiGraph]]) \
+        -> Tuple[Procedure, HeatMap]:
+    procedure, cfg = item
+    return procedure, register_heatmap(cfg, max_heat, widening_delay=widening_delay)
+
+
+parse: Stage[str, Source] = Stage('parse', _parse)
+"""Load a source from a JSON file, holding the statement descriptions accepted by `load_src_from_maps()`."""
+
+split: Stage[Union[Source, CodeFragment], Tuple[Procedure, FragmentView]] = Stage('split', _split, expand=True)
+"""Split a source, or a code fragment, into its procedures, along with views on their code."""
+
+cfg: Stage[Tuple[Procedure, CodeFragment], Tuple[Procedure, LocalGraph]] = Stage('cfg', _cfg)
+"""Build the local graph of a procedure."""
+
+prune: Stage[Tuple[Procedure, LocalGraph], Tuple[Procedure, LocalGraph]] = Stage('prune', _prune)
+"""Remove the blocks of the local graph of a procedure that cannot be reached from the procedure's entry-point."""
+
+execution: Stage[Tuple[Procedure, LocalGraph], Tuple[Procedure, DiGraph]] = Stage('exec', _exec)
+"""Expand the local graph of a procedure into its execution graph, starting from the procedure's name. Calls to other
+procedures are not expanded: each callee becomes a symbolic node, marked by an `external` attribute set to True, and
+execution resumes after the call."""
+
+
+def heat(max_heat: int, widening_delay: int = 2) -> Stage[Tuple[Procedure, Union[LocalGraph, DiGraph]],
+                                                          Tuple[Procedure, HeatMap]]:
+    """
+    Define a memoized stage drawing the register heatmap of a procedure.
+
+    :param max_heat: the maximum heat level a register can reach
+    :param widening_delay: the number of visits to a node after which its entering heat can only decrease
+    :return: the new stage
+    """
+
+    return Stage('heat(' + str(max_heat) + ',' + str(widening_delay) + ')', partial(_heat, max_heat, widening_delay),
+                 memoize=True)
@@ -0,0 +1,130 @@
+"""
+This module provides the automatic partitioning of code sections into procedures.
+
+Procedures are found in a single pass over the statements of each `.text` section, and are reported as soon as their
+end is found, so that later analysis stages can process the first procedures of a source while the following ones are
+still to be scanned.
+
+A labeled statement starts a new procedure when one of its labels:
+
+- has been declared as a function by a `.type` directive, or as a global symbol by a `.globl` directive;
+- has already been the destination of a procedure call;
+- is not a local label (i.e. it does not start with a dot), and the previous instruction was a return.
+
+A statement labeled in any way also starts a new procedure when the previous one has been closed, or none has been
+opened yet. A procedure ends where the next one starts, at the `.size` directive referring to it, or at the end of its
+section. Procedures without any instruction are discarded.
+"""
+
+from typing import NamedTuple, Iterator, Union, Set, Optional, Tuple, List
+
+from rep.base import Directive, Instruction, to_line_iterator
+from rep.fragments import Source, CodeFragment, FragmentView
+from analysis.graphs import Transition, jump_ops
+
+
+class Procedure(NamedTuple):
+    """
+    The range of lines spanned by a procedure.
+
+    :var name: the procedure's name, i.e. the label that started it
+    :var begin: the first line of the procedure, holding the statement marked by its label
+    :var end: the line ending the procedure, excluded
+    :var exported: whether the procedure has been declared as a global symbol
+    """
+
+    name: str
+    begin: int
+    end: int
+    exported: bool
+
+
+def _arguments(directive: Directive) -> List[str]:
+    # Directive arguments may or may not have been split at commas by the parser
+    return [arg.strip() for args in directive.args for arg in args.split(',') if arg.strip() != '']
+
+
+def _text_sections(code: Union[Source, CodeFragment]) -> Iterator[CodeFragment]:
+    if isinstance(code, Source):
+        return (s.scope for s in code.get_sections() if s.identifier == '.text' or s.identifier.startswith('.text.'))
+    else:
+        return iter([code])
+
+
+def procedure_ranges(code: Union[Source, CodeFragment]) -> Iterator[Procedure]:
+    """
+    Find the procedures contained in a source's `.text` sections, or in a code fragment.
+
+    :param code: a source, or a fragment holding code
+    :return: an iterator over the procedures, in the order in which they appear
+    """
+
+    for section in _text_sections(code):
+        functions: Set[str] = set()
+        exported: Set[str] = set()
+        called: Set[str] = set()
+
+        current: Optional[Tuple[str, int]] = None
+        has_code = False
+        returned = False
+
+        def close(end: int) -> Optional[Procedure]:
+            name, begin = current
+            return Procedure(name, begin, end, name in exported) if has_code else None
+
+        for number, statement in to_line_iterator(iter(section), section.begin):
+            starting = None
+            for label in statement.labels:
+                if current is None or label in functions or label in exported or label in called or \
+                        (returned and not label.startswith('.')):
+                    starting = label
+                    break
+
+            if starting is not None:
+                if current is not None:
+                    procedure = close(number)
+                    if procedure is not None:
+                        yield procedure
+                current, has_code, returned = (starting, number), False, False
+
+            if isinstance(statement, Instruction):
+                if current is not None:
+                    has_code = True
+                transition, destination = jump_ops.get(statement.opcode), None
+                if transition is Transition.CALL and statement.immediate is not None:
+                    destination = statement.immediate.symbol
+                if destination is not None:
+                    called.add(destination)
+                returned = transition is Transition.RETURN
+            elif isinstance(statement, Directive):
+                args = _arguments(statement)
+                if statement.name in ('.globl', '.global'):
+                    exported.update(args)
+                elif statement.name == '.type' and '@function' in args[1:]:
+                    functions.add(args[0])
+                elif statement.name == '.size' and current is not None and len(args) > 0 and args[0] == current[0]:
+                    procedure = close(number)
+                    if procedure is not None:
+                        yield procedure
+                    current = None
+
+        if current is not None:
+            procedure = close(section.end)
+            if procedure is not None:
+                yield procedure
+
+
+def procedure_views(code: Union[Source, CodeFragment]) -> Iterator[Tuple[Procedure, FragmentView]]:
+    """
+    Split a source's `.text` sections, or a code fragment, into views on their procedures.
+
+    The returned views start with the procedure's label, and can be directly fed to
+    :func:`analysis.graphs.basic_blocks`.
+
+    :param code: a source, or a fragment holding code
+    :return: an iterator over pairs made of a procedure and a view on its code, in the order in which they appear
+    """
+
+    for section in _text_sections(code):
+        for procedure in procedure_ranges(section):
+            yield procedure, section[procedure.begin:procedure.end]
@@ -0,0 +1,217 @@
+"""
+This module provides the detection and the elimination of unreachable code.
+
+Reachability is computed from a set of entry-points at once: every node gets a bitset, as an integer, whose i-th bit
+tells whether the node can be reached from the i-th entry-point. Bitsets are propagated along the control flow with a
+worklist, and a node is visited again only when its bitset grows, so that the cost of the analysis is close to that of
+a single visit of the graph. Execution is assumed to resume after every call, and internal calls also lead to the
+called procedure.
+
+Unreachable nodes can then be marked, or pruned from a CFG before running more expensive analyses on it. Unreachable
+code can also be stripped from the code fragment holding it. Keep in mind that jumps through registers, other than
+returns, are not represented in CFGs: code reached only by such jumps, e.g. through jump tables, is reported as dead.
+"""
+
+from typing import Union, Optional, Iterable, Hashable, List, Dict, Set, Tuple
+
+from networkx import DiGraph
+
+from rep.base import Instruction, Statement
+from rep.fragments import CodeFragment
+from analysis.graphs import LocalGraph, Transition
+from analysis.liveness import flow_graph
+
+
+def _is_legacy(cfg: Union[LocalGraph, DiGraph]) -> bool:
+    return not isinstance(cfg, LocalGraph) and 0 in cfg and 'block' not in cfg.nodes[0]
+
+
+class Reachability:
+    """
+    The reachability of the nodes of a CFG from a set of entry-points.
+
+    :ivar entries: the entry-points
+    :ivar masks: the set of the entry-points reaching each node, as an integer whose i-th bit stands for the i-th
+          entry-point
+    """
+
+    entries: List[Hashable]
+    masks: Dict[Hashable, int]
+
+    def __init__(self, cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]] = None):
+        """
+        Compute the reachability of the nodes of a CFG.
+
+        Entry-points can be specified by node identifier or by label. By default, they are those of a local graph,
+        node 1 of a legacy CFG, or the nodes without incoming edges of other digraphs.
+
+        :param cfg: a local graph, a legacy CFG or an execution graph
+        :param entries: the entry-points, or None to use the default ones
+        :raise KeyError: when an entry-point is neither a node nor a label of the CFG
+        """
+
+        flow, graph, default_entries = flow_graph(cfg)
+
+        # Internal calls lead to the called procedure, besides returning to their confluence point
+        labels = {label: n for n in flow for label in graph.nodes[n].get('labels', ())}
+        for u, _, attributes in graph.edges(data=True):
+            if attributes.get('kind') is Transition.CALL and attributes.get('callee') in labels and u in flow:
+                flow.add_edge(u, labels[attributes['callee']])
+
+        self.entries = []
+        for entry in (default_entries if entries is None else entries):
+            if entry in flow:
+                self.entries.append(entry)
+            elif entry in labels:
+                self.entries.append(labels[entry])
+            else:
+                raise KeyError(entry)
+
+        self.masks = dict.fromkeys(flow, 0)
+        for i, entry in enumerate(self.entries):
+            self.masks[entry] |= 1 << i
+
+        masks = self.masks
+        successors = flow.succ
+        stack = list(self.entries)
+        while len(stack) > 0:
+            node = stack.pop()
+            mask = masks[node]
+            for s in successors[node]:
+                if masks[s] | mask != masks[s]:
+                    masks[s] |= mask
+                    stack.append(s)
+
+    def is_reachable(self, node: Hashable, entry: Optional[int] = None) -> bool:
+        """
+        Check whether a node is reachable.
+
+        :param node: a node of the CFG
+        :param entry: the index of the entry-point from which the node should be reachable, or None for any of them
+        :return: True if the node is reachable, False otherwise
+        """
+
+        mask = self.masks[node]
+        return mask != 0 if entry is None else bool(mask >> entry & 1)
+
+    def reachable(self, entry: Optional[int] = None) -> Set[Hashable]:
+        """
+        Return the reachable nodes.
+
+        :param entry: the index of the entry-point from which the nodes should be reachable, or None for any of them
+        :return: the set of the reachable nodes
+        """
+
+        bit = -1 if entry is None else 1 << entry
+        return {n for n, mask in self.masks.items() if mask & bit}
+
+    def unreachable(self) -> Set[Hashable]:
+        """
+        Return the nodes that cannot be reached from any entry-point.
+
+        :return: the set of the unreachable nodes
+        """
+
+        return {n for n, mask in self.masks.items() if mask == 0}
+
+
+def mark_unreachable(cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]] = None) -> Set[Hashable]:
+    """
+    Mark the nodes of a CFG with their reachability.
+
+    Every node, but the calling environment of legacy CFGs, is given a `reachable` attribute.
+
+    :param cfg: a local graph, a legacy CFG or an execution graph
+    :param entries: the entry-points, as accepted by :class:`Reachability`
+    :return: the set of the unreachable nodes
+    """
+
+    reachability = Reachability(cfg, entries)
+    graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+    for n, mask in reachability.masks.items():
+        graph.nodes[n]['reachable'] = mask != 0
+
+    return reachability.unreachable()
+
+
+def prune_unreachable(cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]] = None) \
+        -> Union[LocalGraph, DiGraph]:
+    """
+    Remove the unreachable nodes of a CFG.
+
+    The original CFG is left untouched, while the new one shares its node and edge attributes, code fragments
+    included.
+
+    :param cfg: a local graph, a legacy CFG or an execution graph
+    :param entries: the entry-points, as accepted by :class:`Reachability`
+    :return: a new CFG of the same kind, holding the reachable nodes only
+    """
+
+    reachable = Reachability(cfg, entries).reachable()
+    if not isinstance(cfg, LocalGraph):
+        if _is_legacy(cfg):
+            reachable.add(0)
+        return cfg.subgraph(reachable).copy()
+
+    return LocalGraph([n for n in cfg.entry_point_ids if n in reachable],
+                      cfg.graph.subgraph(reachable).copy(),
+                      [c for c in cfg.external_calls if c.caller in reachable],
+                      [n for n in cfg.terminal_nodes_ids if n in reachable])
+
+
+def strip_dead_code(code: CodeFragment,
+                    cfg: Union[LocalGraph, DiGraph],
+                    entries: Optional[Iterable[Hashable]] = None) -> int:
+    """
+    Delete the instructions of the unreachable blocks of a CFG from the code holding them.
+
+    All deletions are performed through a single slice assignment, spanning from the first to the last unreachable
+    block. Directives found inside unreachable blocks are kept, and the labels of the deleted instructions are moved to
+    the statements following them, so that symbols keep being defined. The CFG is not updated, and should be rebuilt.
+
+    :param code: the code fragment holding the CFG's blocks
+    :param cfg: a local graph, a legacy CFG or an execution graph
+    :param entries: the entry-points, as accepted by :class:`Reachability`
+    :return: the number of deleted instructions
+    """
+
+    # Execution graphs may hold many copies of the same block, which is dead only if all of them are unreachable
+    graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+    live: Set[Tuple[int, int]] = set()
+    unreachable: Set[Tuple[int, int]] = set()
+    for n, mask in Reachability(cfg, entries).masks.items():
+        block = graph.nodes[n].get('block')
+        if block is not None and code.begin <= block.begin and block.end <= code.end:
+            (live if mask != 0 else unreachable).add((block.begin, block.end))
+    ranges = sorted(unreachable - live)
+    if len(ranges) == 0:
+        return 0
+
+    low, high = ranges[0][0], max(end for _, end in ranges)
+    dead = set()
+    for begin, end in ranges:
+        dead.update(range(begin, end))
+
+    kept: List[Statement] = []
+    labels: List[str] = []
+    last_deleted: Optional[Statement] = None
+    for number, statement in zip(range(low, high), code[low:high]):
+        if number in dead and isinstance(statement, Instruction):
+            labels.extend(statement.labels)
+            last_deleted = statement
+        else:
+            if len(labels) > 0:
+                statement.labels = labels + list(statement.labels)
+                labels = []
+            kept.append(statement)
+
+    if len(labels) > 0:
+        if high < code.end:
+            code[high].labels = labels + list(code[high].labels)
+        else:
+            # Nothing follows the deleted instructions to take their labels, so the last one stays
+            last_deleted.labels = labels
+            kept.append(last_deleted)
+
+    code[low:high] = kept
+    return high - low - len(kept)
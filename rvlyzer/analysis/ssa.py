@@ -0,0 +1,342 @@
+"""
+This module provides the static single assignment (SSA) form of register definitions.
+
+In SSA form every definition of a register gets its own name, and every use of a register refers to exactly one
+definition. Where multiple definitions of a register reach a join point, a phi-function is placed, defining a new name
+that merges them. Phi-functions are placed on the iterated dominance frontiers of the blocks defining each register, as
+in the algorithm by Cytron et al., but only for the registers that some block uses before defining (the so-called
+semi-pruned form). Names are then assigned through a walk of the dominator tree.
+
+Definitions are identified by consecutive integers, and everything about them is stored in flat NumPy arrays. Def-use
+chains are kept in compressed sparse row form, so that sparse analyses can follow them without going through the code.
+
+Like dominator trees, SSA forms can be cached on the graph they have been built for, through :func:`ssa_form`. The
+cache must be explicitly invalidated through :func:`invalidate_ssa` after altering the graph or its code.
+"""
+
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Hashable, List, Optional, Iterable, Union, Dict, Tuple, MutableMapping
+from weakref import WeakKeyDictionary
+
+import numpy as np
+from networkx import DiGraph
+
+from rep.base import Register
+from analysis.dominance import dominator_tree, VIRTUAL_ROOT, DominatorTree
+from analysis.graphs import LocalGraph
+from analysis.liveness import block_effects, flow_graph
+
+
+class DefinitionKind(IntEnum):
+    """The kind of a register definition."""
+
+    ENTRY = 0
+    """The value held by a register when execution enters the CFG."""
+
+    INSTRUCTION = 1
+    """A value written by an instruction."""
+
+    PHI = 2
+    """The merge of the values reaching a join point."""
+
+
+def _bits(registers: int) -> Iterable[int]:
+    # Iterate over the values of the registers in a set, from the lowest one
+    while registers:
+        yield (registers & -registers).bit_length() - 1
+        registers &= registers - 1
+
+
+def _csr(owners: np.ndarray, values: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Group the values by their owner, returning the offsets of each owner's group and the grouped values
+    order = np.argsort(owners, kind='stable')
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners, minlength=size), out=offsets[1:])
+    return offsets, values[order]
+
+
+class RegisterSSA:
+    """
+    The SSA form of the register definitions of a CFG.
+
+    Only the nodes reachable from the entry-points are taken into account. The entry definitions of all the registers
+    but `zero` come first, followed by the phi-functions and by the definitions of the instructions.
+
+    Uses are identified by their line and register. In execution graphs, where lines may belong to multiple nodes, the
+    same use can refer to different definitions: lookups return any of them.
+
+    :ivar graph: the analyzed control flow, with a `VIRTUAL_ROOT` node leading to the entry-points
+    :ivar dominators: the dominator tree of the control flow
+    :ivar kinds: the kind of each definition
+    :ivar registers: the register written by each definition
+    :ivar nodes: the node containing each definition, or None for entry definitions
+    :ivar lines: the line of each instruction definition, or -1 for the other kinds
+    :ivar use_lines: the line of each use made by an instruction, sorted along with the used registers
+    :ivar use_registers: the register read by each use
+    :ivar use_definitions: the definition read by each use
+    """
+
+    graph: DiGraph
+    dominators: DominatorTree
+    kinds: np.ndarray
+    registers: np.ndarray
+    nodes: List[Optional[Hashable]]
+    lines: np.ndarray
+    use_lines: np.ndarray
+    use_registers: np.ndarray
+    use_definitions: np.ndarray
+
+    def __init__(self, cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]] = None):
+        """
+        Build the SSA form of a CFG.
+
+        If no entry-point is given, the entry-points of a local graph, node 1 of a legacy CFG, or the nodes without
+        incoming edges of other digraphs are used.
+
+        :param cfg: a local graph, a legacy CFG or an execution graph
+        :param entries: the nodes from which execution starts
+        """
+
+        self.graph, attributes, default_entries = flow_graph(cfg)
+        self.graph.add_edges_from((VIRTUAL_ROOT, e) for e in (default_entries if entries is None else entries))
+        self.dominators = dominator_tree(self.graph, [VIRTUAL_ROOT], cache=False)
+        reachable = [n for n in self.dominators.idom if n is not VIRTUAL_ROOT]
+        effects = {n: block_effects(attributes.nodes[n]) for n in reachable}
+
+        kinds: List[int] = []
+        registers: List[int] = []
+        nodes: List[Optional[Hashable]] = []
+        lines: List[int] = []
+
+        def define(kind: DefinitionKind, register: int, node: Optional[Hashable], line: int) -> int:
+            kinds.append(kind)
+            registers.append(register)
+            nodes.append(node)
+            lines.append(line)
+            return len(kinds) - 1
+
+        entry = {r.value: define(DefinitionKind.ENTRY, r.value, None, -1) for r in Register if r is not Register.ZERO}
+
+        # Summarize the blocks, finding the registers used before being defined and the blocks defining each register
+        exposed = 0
+        sites: Dict[int, List[Hashable]] = {r: [VIRTUAL_ROOT] for r in entry}
+        for node, block in effects.items():
+            defined = 0
+            for d, u in zip(block.defs.tolist(), block.uses.tolist()):
+                exposed |= u & ~defined
+                defined |= d
+            for r in _bits(defined):
+                sites[r].append(node)
+
+        # Place the phi-functions on the iterated dominance frontiers, allotting a slot for each reachable predecessor
+        phis: Dict[Hashable, List[int]] = {}
+        operands: List[int] = []
+        phi_offsets = [0]
+        for r in _bits(exposed):
+            placed = set()
+            worklist = list(sites[r])
+            queued = set(worklist)
+            while len(worklist) > 0:
+                for frontier in self.dominators.frontier(worklist.pop()):
+                    if frontier in placed:
+                        continue
+
+                    placed.add(frontier)
+                    phis.setdefault(frontier, []).append(define(DefinitionKind.PHI, r, frontier, -1))
+                    operands.extend(-1 for p in self.graph.pred[frontier] if p in self.dominators)
+                    phi_offsets.append(len(operands))
+                    if frontier not in queued:
+                        queued.add(frontier)
+                        worklist.append(frontier)
+        first_phi = len(entry)
+        slots = {n: {p: i for i, p in enumerate(p for p in self.graph.pred[n] if p in self.dominators)} for n in phis}
+
+        # Rename through a depth-first walk of the dominator tree, keeping a stack of the current names of each register
+        use_lines: List[int] = []
+        use_registers: List[int] = []
+        use_definitions: List[int] = []
+        names: List[List[int]] = [[entry[r]] if r in entry else [] for r in range(len(Register))]
+
+        def enter(node: Hashable) -> List[int]:
+            pushed = []
+            for phi in phis.get(node, ()):
+                names[registers[phi]].append(phi)
+                pushed.append(registers[phi])
+
+            if node in effects:
+                block = effects[node]
+                for line, d, u in zip(block.lines.tolist(), block.defs.tolist(), block.uses.tolist()):
+                    for r in _bits(u):
+                        use_lines.append(line)
+                        use_registers.append(r)
+                        use_definitions.append(names[r][-1])
+                    for r in _bits(d):
+                        names[r].append(define(DefinitionKind.INSTRUCTION, r, node, line))
+                        pushed.append(r)
+
+            for succ in self.graph.adj[node]:
+                for phi in phis.get(succ, ()):
+                    operands[phi_offsets[phi - first_phi] + slots[succ][node]] = names[registers[phi]][-1]
+
+            return pushed
+
+        stack = [(VIRTUAL_ROOT, iter(self.dominators.children(VIRTUAL_ROOT)), enter(VIRTUAL_ROOT))]
+        while len(stack) > 0:
+            node, children, pushed = stack[-1]
+            child = next(children, None)
+            if child is None:
+                for r in pushed:
+                    names[r].pop()
+                stack.pop()
+            else:
+                stack.append((child, iter(self.dominators.children(child)), enter(child)))
+
+        self.kinds = np.array(kinds, dtype=np.uint8)
+        self.registers = np.array(registers, dtype=np.int8)
+        self.nodes = nodes
+        self.lines = np.array(lines, dtype=np.int64)
+
+        order = np.lexsort((np.array(use_registers, dtype=np.int8), np.array(use_lines, dtype=np.int64)))
+        self.use_lines = np.array(use_lines, dtype=np.int64)[order]
+        self.use_registers = np.array(use_registers, dtype=np.int8)[order]
+        self.use_definitions = np.array(use_definitions, dtype=np.int64)[order]
+
+        self._first_phi = first_phi
+        self._phis = {n: np.array(ds, dtype=np.int64) for n, ds in phis.items()}
+        self._phi_offsets = np.array(phi_offsets, dtype=np.int64)
+        self._operands = np.array(operands, dtype=np.int64)
+        self._slots = {n: list(s) for n, s in slots.items()}
+
+        # Keys of uses and instruction definitions, for binary searches by line and register
+        self._use_keys = self.use_lines * len(Register) + self.use_registers
+        instructions = np.flatnonzero(self.kinds == DefinitionKind.INSTRUCTION)
+        def_keys = self.lines[instructions] * len(Register) + self.registers[instructions]
+        def_order = np.argsort(def_keys, kind='stable')
+        self._def_keys = def_keys[def_order]
+        self._def_ids = instructions[def_order]
+
+        # Def-use chains, towards both instructions and phi-functions
+        self._user_offsets, self._user_lines = _csr(self.use_definitions, self.use_lines, len(self))
+        owners = np.repeat(np.arange(first_phi, first_phi + len(phi_offsets) - 1), np.diff(self._phi_offsets))
+        used = self._operands >= 0
+        self._phi_user_offsets, self._phi_users = _csr(self._operands[used], owners[used], len(self))
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def phis(self, node: Hashable) -> np.ndarray:
+        """
+        Return the phi-functions placed at the beginning of a node.
+
+        :param node: a node of the CFG
+        :return: the array of the phi-functions' definitions
+        """
+
+        return self._phis.get(node, np.empty(0, dtype=np.int64))
+
+    def phi_operands(self, definition: int) -> List[Tuple[Hashable, int]]:
+        """
+        Return the operands of a phi-function.
+
+        :param definition: the phi-function's definition
+        :return: a list of pairs made of a predecessor of the phi-function's node and the definition flowing from it
+        :raise ValueError: when the definition is not a phi-function
+        """
+
+        if self.kinds[definition] != DefinitionKind.PHI:
+            raise ValueError("Definition " + str(definition) + " is not a phi-function")
+
+        index = definition - self._first_phi
+        begin, end = self._phi_offsets[index], self._phi_offsets[index + 1]
+        return list(zip(self._slots[self.nodes[definition]], self._operands[begin:end].tolist()))
+
+    def reaching(self, line: int, register: Register) -> int:
+        """
+        Return the definition read by a line when using a register.
+
+        :param line: the line of an instruction
+        :param register: a register used by the instruction
+        :return: the definition reaching the use
+        :raise KeyError: when the instruction does not use the register, or is not reachable
+        """
+
+        key = line * len(Register) + register.value
+        i = np.searchsorted(self._use_keys, key)
+        if i == len(self._use_keys) or self._use_keys[i] != key:
+            raise KeyError((line, register))
+
+        return int(self.use_definitions[i])
+
+    def defined(self, line: int, register: Register) -> int:
+        """
+        Return the definition of a register made by a line.
+
+        :param line: the line of an instruction
+        :param register: a register defined by the instruction
+        :return: the instruction's definition
+        :raise KeyError: when the instruction does not define the register, or is not reachable
+        """
+
+        key = line * len(Register) + register.value
+        i = np.searchsorted(self._def_keys, key)
+        if i == len(self._def_keys) or self._def_keys[i] != key:
+            raise KeyError((line, register))
+
+        return int(self._def_ids[i])
+
+    def users(self, definition: int) -> np.ndarray:
+        """
+        Return the lines of the instructions reading a definition.
+
+        :param definition: a definition
+        :return: the array of the lines, with repetitions for instructions reading the same definition multiple times
+        """
+
+        return self._user_lines[self._user_offsets[definition]:self._user_offsets[definition + 1]]
+
+    def phi_users(self, definition: int) -> np.ndarray:
+        """
+        Return the phi-functions merging a definition.
+
+        :param definition: a definition
+        :return: the array of the phi-functions' definitions
+        """
+
+        return self._phi_users[self._phi_user_offsets[definition]:self._phi_user_offsets[definition + 1]]
+
+
+_ssa_cache: MutableMapping[DiGraph, Dict[Optional[Tuple[Hashable, ...]], RegisterSSA]] = WeakKeyDictionary()
+
+
+def ssa_form(cfg: Union[LocalGraph, DiGraph], entries: Optional[Iterable[Hashable]] = None) -> RegisterSSA:
+    """
+    Build (or retrieve from the cache) the SSA form of a CFG.
+
+    :param cfg: a local graph, a legacy CFG or an execution graph
+    :param entries: the nodes from which execution starts
+    :return: the SSA form of the CFG
+    """
+
+    graph = cfg.graph if isinstance(cfg, LocalGraph) else cfg
+    cache = _ssa_cache.setdefault(graph, {})
+    key = None if entries is None else tuple(entries)
+
+    if key not in cache:
+        cache[key] = RegisterSSA(cfg, key)
+
+    return cache[key]
+
+
+def invalidate_ssa(cfg: Union[LocalGraph, DiGraph]) -> None:
+    """
+    Discard the cached SSA forms of a CFG.
+
+    This function must be called after modifying the structure of a graph, or the code of its blocks, whose SSA form
+    has already been built.
+
+    :param cfg: a local graph or a NetworkX CFG
+    """
+
+    _ssa_cache.pop(cfg.graph if isinstance(cfg, LocalGraph) else cfg, None)
@@ -96,6 +96,7 @@ class Instruction(Statement):
 
         _symbol: Optional[str]
         _value: Optional[BitVector]
+        _int_val: Optional[int]
         _size: int
 
         def __init__(self, size, symbol: str = None, value: int = None):
@@ -116,18 +117,18 @@ class Instruction(Statement):
 
             if value is not None:
 
-                # Prepare the mask for cutting the supplied value's bit representation to the specified size
-                mask = 0
-                for f in range(0, size):
-                    mask += 2 ** f
-
-                value = value & mask
+                # Cut the supplied value's bit representation to the specified size
+                value = value & ((1 << size) - 1)
                 self._value = BitVector(intVal=value, size=size)
 
                 # Sizes must be coherent
                 assert self._size == len(self._value)
+
+                # Keep the signed integer representation at hand, since extracting it from the bit vector is costly
+                self._int_val = value - (1 << size) if value >> (size - 1) & 1 else value
             else:
                 self._value = None
+                self._int_val = None
 
         @property
         def symbol(self) -> str:
@@ -139,8 +140,7 @@ class Instruction(Statement):
 
         @property
         def int_val(self) -> int:
-            # Return the constant's integer representation, preserving its sign through an overly complicated procedure
-            return -((~self._value).int_val() + 1) if self._value[0] == 1 else self._value.int_val()
+            return self._int_val
 
         @property
         def size(self):
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules are imported as top-level packages, as when running from this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rep.fragments import Source, load_src_from_maps  # noqa: E402
+
+
+def instruction(opcode, family, r1='unused', r2='unused', r3='unused', imm=None):
+    statement = {"role": "instruction", "opcode": opcode, "family": family, "r1": r1, "r2": r2, "r3": r3}
+    if imm is not None:
+        statement["immediate"] = imm
+    return statement
+
+
+def label(name):
+    return {"role": "label", "name": name}
+
+
+def directive(name, *args):
+    return {"role": "directive", "name": name, "args": list(args)}
+
+
+@pytest.fixture
+def source() -> Source:
+    """A unit made of two procedures: main, holding a loop that calls helper, and helper, calling an external one."""
+
+    return load_src_from_maps([
+        directive(".file", "x.c"),
+        directive(".text"),
+        directive(".globl", "main"), directive(".type", "main", "@function"),
+        label("main"),
+        instruction("addi", "i", "sp", "sp", imm=-16),
+        instruction("li", "li", "a0", imm=0),
+        instruction("li", "li", "t0", imm=10),
+        label(".L1"),
+        instruction("addi", "i", "a0", "a0", imm=1),
+        instruction("call", "j", imm="helper"),
+        instruction("blt", "b", "a0", "t0", imm=".L1"),
+        instruction("beqz", "bz", "a0", imm=".L3"),
+        instruction("mv", "_2arg", "a1", "a0"),
+        label(".L3"),
+        instruction("addi", "i", "sp", "sp", imm=16),
+        instruction("jr", "jr", "ra"),
+        directive(".size", "main", ".-main"),
+        directive(".globl", "helper"), directive(".type", "helper", "@function"),
+        label("helper"),
+        instruction("addi", "i", "a2", "a0", imm=3),
+        instruction("beqz", "bz", "a2", imm=".L5"),
+        instruction("call", "j", imm="ext"),
+        instruction("addi", "i", "a3", "a2", imm=1),
+        label(".L5"),
+        instruction("jr", "jr", "ra"),
+        directive(".size", "helper", ".-helper"),
+    ])
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+from networkx import DiGraph, descendants
+
+from analysis import compact, graphs
+from analysis.compact import CompactGraph, CompactLocalGraph
+from analysis.graphs import basic_blocks, local_cfg, internalize_calls
+from analysis.loops import loop_forest
+from analysis.procedures import procedure_views
+
+
+def random_reducible_cfg(seed):
+    # A legacy CFG whose loops are all natural, plus some cycles that cannot be reached from the entry-point
+    rng = random.Random(seed)
+    while True:
+        size = rng.randint(2, 12)
+        cfg = DiGraph([(0, 1)])
+        for n in range(1, size + 1):
+            for _ in range(rng.randint(1, 2)):
+                cfg.add_edge(n, rng.randint(0, size) if rng.random() < 0.85 else 0)
+        reachable = descendants(cfg, 1) | {0, 1}
+        cfg.remove_nodes_from([n for n in list(cfg) if n not in reachable])
+        if len(loop_forest(cfg, [1]).irreducible_edges) == 0:
+            break
+
+    cfg.add_edges_from([(size + 1, size + 2), (size + 2, size + 1), (size + 2, 1), (size + 3, size + 3)])
+    return cfg
+
+
+def test_unreachable_cycles_are_ignored():
+    cfg = DiGraph([(0, 1), (1, 2), (2, 0), (5, 6), (6, 5)])
+    assert compact.loop_back_nodes(CompactGraph.from_networkx(cfg)) == frozenset()
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_loop_back_nodes_agree(seed):
+    cfg = random_reducible_cfg(seed)
+    assert compact.loop_back_nodes(CompactGraph.from_networkx(cfg)) == graphs.loop_back_nodes(cfg)
+
+
+@pytest.mark.parametrize('share', [False, True])
+@pytest.mark.parametrize('limits', [{}, {'max_nodes': 8}, {'max_edges': 10}, {'max_depth': 0}])
+def test_exec_graphs_agree(source, share, limits):
+    (_, main), (_, helper) = procedure_views(source)
+    cfg = internalize_calls(local_cfg(basic_blocks(main)).merge(local_cfg(basic_blocks(helper))))
+    expected = graphs.exec_graph(cfg, 'main', share_subgraphs=share, **limits)
+    result = compact.exec_graph(CompactLocalGraph.from_local_graph(cfg), 'main', share_subgraphs=share, **limits)
+
+    assert result.attributes['expansion'] == expected.graph['expansion']
+    assert len(result) == expected.number_of_nodes()
+    assert result.number_of_edges() == expected.number_of_edges()
+    assert sorted(d['kind'].value for _, _, d in result.to_networkx().edges(data=True)) == \
+        sorted(d['kind'].value for _, _, d in expected.edges(data=True))
@@ -0,0 +1,52 @@
+import numpy as np
+
+from analysis.graphs import basic_blocks, local_cfg
+from analysis.heatmaps import HeatIndex, HeatMap, register_heatmap
+from analysis.procedures import procedure_views
+from rep.base import Register
+
+
+def sample_index():
+    # Every register is hot, except for the zero register, A0 and, on the last line, T0
+    heat = np.full((3, len(Register)), 5, dtype=np.int32)
+    heat[:, Register.ZERO.value] = 0
+    heat[:, Register.A0.value] = [1, 2, 1]
+    heat[2, Register.T0.value] = 0
+    return HeatIndex(HeatMap(np.array([10, 11, 12]), heat))
+
+
+def test_point_queries():
+    index = sample_index()
+    assert index.coldest(10) == Register.A0
+    assert index.coldest(12) == Register.T0
+    assert index.coldest(12, exclude=[Register.T0]) == Register.A0
+    assert index.cold_registers(11, 2) == [Register.A0]
+    assert index.cold_registers(12, 1) == [Register.T0, Register.A0]
+
+
+def test_range_queries():
+    index = sample_index()
+    assert list(index.range_heat(10, 13)[[Register.A0.value, Register.T0.value]]) == [2, 5]
+    assert index.coldest_in_range(None, None) == Register.A0
+    assert index.coldest_in_range(12, None) == Register.T0
+    assert index.cold_in_range(10, 12, 2) == [Register.A0]
+    assert index.cold_in_range(10, 13, 1) == []
+
+
+def test_zero_register_is_always_excluded():
+    index = sample_index()
+    assert index.cold_registers(12, 0, exclude=()) == [Register.T0]
+    assert index.coldest(10, exclude=[Register.A0]) != Register.ZERO
+    assert index.cold_in_range(None, None, 1, exclude=[Register.A0]) == []
+    assert index.coldest_in_range(12, None, exclude=[Register.T0]) == Register.A0
+    assert index.coldest(10, exclude=[r for r in Register if r != Register.ZERO]) is None
+
+
+def test_heatmap_queries(source):
+    for _, view in procedure_views(source):
+        heatmap = register_heatmap(local_cfg(basic_blocks(view)), 4)
+        index = HeatIndex(heatmap)
+        for line in heatmap:
+            assert index.coldest(line) not in (None, Register.ZERO)
+            assert Register.ZERO not in index.cold_registers(line, 4)
+        assert Register.ZERO not in index.cold_in_range(None, None, 4)
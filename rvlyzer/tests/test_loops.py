@@ -0,0 +1,61 @@
+import random
+from itertools import chain
+
+import pytest
+from networkx import DiGraph, all_simple_paths, descendants, restricted_view, simple_cycles
+
+from analysis.graphs import loop_back_nodes, simple_path_nodes
+from analysis.loops import loop_exclusive_nodes, loop_forest
+
+
+def reference_loop_back_nodes(cfg):
+    # The definition, enumerating all cycles and paths
+    cycle_nodes = frozenset(chain.from_iterable(simple_cycles(restricted_view(cfg, [0], []))))
+    return cycle_nodes.difference(chain.from_iterable(path[:-1] for path in all_simple_paths(cfg, 1, 0)))
+
+
+def random_cfg(seed):
+    # A legacy CFG whose nodes are all reachable from node 1, and whose exits lead to node 0
+    rng = random.Random(seed)
+    size = rng.randint(2, 12)
+    cfg = DiGraph([(0, 1)])
+    for n in range(1, size + 1):
+        for _ in range(rng.randint(1, 2)):
+            cfg.add_edge(n, rng.randint(0, size) if rng.random() < 0.85 else 0)
+    reachable = descendants(cfg, 1) | {0, 1}
+    cfg.remove_nodes_from([n for n in list(cfg) if n not in reachable])
+    return cfg
+
+
+def test_reducible_loop():
+    cfg = DiGraph([(0, 1), (1, 2), (2, 3), (3, 2), (3, 4), (4, 0), (2, 5), (5, 2)])
+    assert loop_back_nodes(cfg) == {5}
+    assert len(loop_forest(cfg, [1]).irreducible_edges) == 0
+
+
+def test_irreducible_loop():
+    # Node 3 lies on the simple path 1, 3, 2, 4, 0, but a depth-first visit may reach it through a retreating edge
+    edges = [(0, 1), (1, 2), (1, 3), (3, 2), (2, 4), (4, 3), (4, 0)]
+    for order in (edges, list(reversed(edges))):
+        cfg = DiGraph(order)
+        assert loop_back_nodes(cfg) == frozenset()
+        assert loop_exclusive_nodes(restricted_view(cfg, [0], []), [1], cfg.predecessors(0)) == frozenset()
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_loop_back_nodes_match_definition(seed):
+    cfg = random_cfg(seed)
+    expected = reference_loop_back_nodes(cfg)
+    assert loop_back_nodes(cfg) == expected
+    assert loop_exclusive_nodes(restricted_view(cfg, [0], []), [1], cfg.predecessors(0)) == expected
+
+
+def test_unreachable_cycles_are_ignored():
+    cfg = DiGraph([(0, 1), (1, 2), (2, 0), (5, 6), (6, 5)])
+    assert loop_back_nodes(cfg) == frozenset()
+
+
+def test_simple_path_nodes():
+    cfg = DiGraph([('s', 'a'), ('a', 'b'), ('b', 'a'), ('b', 't'), ('a', 'c'), ('c', 'a')])
+    assert simple_path_nodes(cfg, 's', 't', ['a', 'b', 'c']) == {'a', 'b'}
+    assert simple_path_nodes(cfg, 't', 's', ['a']) == frozenset()
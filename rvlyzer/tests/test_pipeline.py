@@ -0,0 +1,39 @@
+from networkx import DiGraph
+
+from analysis.graphs import basic_blocks, local_cfg
+from analysis.heatmaps import register_heatmap
+from analysis.pipeline import Pipeline, content_digest, cfg, heat, prune, split
+from analysis.procedures import procedure_views
+
+
+def test_pipeline_matches_direct_analysis(source):
+    expected = [(p, dict(register_heatmap(local_cfg(basic_blocks(v)), 8))) for p, v in procedure_views(source)]
+    result = [(p, dict(hm)) for p, hm in (split | cfg | heat(8)).run([source])]
+    assert result == expected
+
+
+def test_memoized_pipeline_from_graphs(source):
+    items = [(p, local_cfg(basic_blocks(v))) for p, v in procedure_views(source)]
+    expected = [dict(register_heatmap(g, 10)) for _, g in items]
+
+    cache = {}
+    pipeline = Pipeline(prune, heat(10), cache=cache)
+    assert [dict(hm) for _, hm in pipeline.run(items)] == expected
+    stored = len(cache)
+    assert stored == len(items)
+
+    # Equivalent graphs, built anew, hit the cache
+    rebuilt = [(p, local_cfg(basic_blocks(v))) for p, v in procedure_views(source)]
+    assert [dict(hm) for _, hm in pipeline.run(rebuilt)] == expected
+    assert len(cache) == stored
+
+
+def test_graph_digests(source):
+    (_, main), (_, helper) = procedure_views(source)
+    assert content_digest(local_cfg(basic_blocks(main))) == content_digest(local_cfg(basic_blocks(main)))
+    assert content_digest(local_cfg(basic_blocks(main))) != content_digest(local_cfg(basic_blocks(helper)))
+
+    # Node identifiers do not matter, but the structure does
+    chain = DiGraph([('a', 'b'), ('b', 'c')])
+    assert content_digest(chain) == content_digest(DiGraph([('x', 'y'), ('y', 'z')]))
+    assert content_digest(chain) != content_digest(DiGraph([('a', 'b'), ('a', 'c')]))